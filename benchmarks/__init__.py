@@ -0,0 +1,7 @@
+'''
+Performance benchmarks for ``builders``.
+
+Run them from the repository root, e.g.::
+
+  python -m benchmarks.bench_plan
+'''
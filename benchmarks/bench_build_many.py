@@ -0,0 +1,50 @@
+'''
+Compares :py:meth:`builders.builder.Builder.buildMany` throughput with a naive ``Builder(...).withA(...).build()`` loop.
+'''
+import time
+
+from builders.builder import Builder
+from builders.construct import Random, Uid, Unique
+from builders.modifiers import InstanceModifier, NumberOf
+from builders.tests.test_regression import Player, Squad
+
+
+class Address(object):
+    city = Random(pattern='city_%s')
+    zip = Random(10000, 99999)
+
+
+class Account(object):
+    id = Uid()
+    login = Random(pattern='user_%s')
+    address = Unique(Address)
+
+
+def throughput(func, number):
+    started = time.time()
+    func(number)
+    return number / (time.time() - started)
+
+
+def compare(title, clazz, modifiers, number):
+    def naive(number):
+        for _ in xrange(number):
+            Builder(clazz).withA(modifiers).build()
+
+    def many(number):
+        Builder(clazz).withA(modifiers).buildMany(number)
+
+    loop = throughput(naive, number)
+    batch = throughput(many, number)
+    print('%s, %s trees' % (title, number))
+    print('  %-40s %10.0f trees/s' % ('Builder().withA().build() loop', loop))
+    print('  %-40s %10.0f trees/s  x%.2f' % ('Builder().withA().buildMany()', batch, batch / loop))
+
+
+def run():
+    compare('Flat Account', Account, [InstanceModifier(Address).thatSets(city='Moscow')], 20000)
+    compare('Player with 3 squads of 5 units', Player, [NumberOf(Player.squads, 3), NumberOf(Squad.units, 5)], 1000)
+
+
+if __name__ == '__main__':
+    run()
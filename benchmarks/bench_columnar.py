@@ -0,0 +1,27 @@
+'''
+Compares :py:meth:`builders.builder.Builder.buildColumns` with building flat records one by one.
+'''
+from builders.builder import Builder
+from builders.construct import Key, Random, Uid
+
+from benchmarks.common import best_of, report
+
+
+class Record(object):
+    id = Key(Random(1, 10 ** 9))
+    amount = Random(1, 1000)
+    label = Random(pattern='label %s')
+    uid = Uid()
+    kind = 'plain'
+
+
+def run(number=100000):
+    timings = [
+        ('buildMany', best_of(lambda: Builder(Record).withKeyStorage().buildMany(number), 1, repeat=1)),
+        ('buildColumns', best_of(lambda: Builder(Record).withKeyStorage().buildColumns(number), 1, repeat=3)),
+    ]
+    report('%s flat records' % number, timings)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,57 @@
+'''
+Compares the iterative build engine (see :py:func:`builders.builder.run`) with recursive builds on deep chains of models,
+and builds a chain way deeper than the recursion limit allows.
+'''
+import sys
+
+from builders import construct
+from builders.builder import Builder
+from builders.construct import Collection, Random, Uplink
+
+from benchmarks.common import best_of, report
+
+
+def make_chain(depth, uplinked=False):
+    """
+    Returns the root of ``depth`` model classes, each holding a :py:class:`Collection` of the next one,
+    with :py:class:`Uplink`-s back if ``uplinked``.
+    """
+    clazz = type('Level%s' % depth, (object,), {'value': Random()})
+    for level in reversed(range(depth)):
+        parent = type('Level%s' % level, (object,), {'value': Random(), 'children': Collection(clazz)})
+        if uplinked:
+            clazz.parent = Uplink()
+            clazz.parent.linksTo(parent, parent.children)
+        clazz = parent
+    return clazz
+
+
+def run(depth=300, deep=20000):
+    limit = sys.getrecursionlimit()
+    iterative = construct.Construct.iterative
+    for uplinked in [False, True]:
+        root = make_chain(depth, uplinked)
+
+        def build():
+            return Builder(root).build()
+
+        engine = best_of(build, number=5)
+        try:
+            sys.setrecursionlimit(depth * 20)
+            construct.Construct.iterative = property(lambda self: False)
+            recursive = best_of(build, number=5)
+        finally:
+            construct.Construct.iterative = iterative
+            sys.setrecursionlimit(limit)
+
+        report('%s levels%s' % (depth, ' with uplinks' if uplinked else ''),
+               [('recursive builds', recursive),
+                ('iterative engine', engine)])
+
+    root = make_chain(deep)
+    report('%s levels, recursion limit %s' % (deep, limit),
+           [('iterative engine', best_of(lambda: Builder(root).build(), number=1, repeat=1))])
+
+
+if __name__ == '__main__':
+    run()
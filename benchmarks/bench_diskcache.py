@@ -0,0 +1,29 @@
+'''
+Compares building a big tree with loading it from a :py:class:`builders.diskcache.DiskCache`.
+'''
+import shutil
+import tempfile
+
+from builders.builder import Builder
+from builders.modifiers import NumberOf
+from builders.tests.test_regression import Player, Squad
+
+from benchmarks.common import best_of, report
+
+
+def run(squads=50, units=50):
+    modifiers = [NumberOf(Player.squads, squads), NumberOf(Squad.units, units)]
+    directory = tempfile.mkdtemp()
+    try:
+        cached = Builder(Player).withA(modifiers).withDiskCache(directory)
+        cached.build()
+        report('player with %s units' % (squads * units), [
+            ('build', best_of(Builder(Player).withA(modifiers).build, 1)),
+            ('load from disk', best_of(cached.build, 1)),
+        ])
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,52 @@
+'''
+Compares :py:class:`builders.construct.Key` over :py:class:`builders.construct.Random` with the list-backed,
+retrying implementation it replaced.
+'''
+import itertools
+import time
+
+from builders.builder import Builder
+from builders.construct import Construct, Key, Random, KeyStorage
+
+
+class ListKey(Construct):
+    """
+    ``Key`` as it used to be: a list of issued values and up to 1000 random attempts.
+    """
+    storage = {}
+
+    def __init__(self, value_construct):
+        self.value_construct = value_construct
+
+    def doBuild(self, *args, **kwargs):
+        cls = kwargs['instance'].__class__
+        if cls not in self.storage.keys():
+            self.storage[cls] = []
+
+        attempts = (self.value_construct.doBuild() for _ in xrange(1000))
+        value = next(itertools.dropwhile(lambda x: x in self.storage[cls], attempts))
+        self.storage[cls].append(value)
+        return value
+
+
+def keys_per_second(construct, number):
+    model = type('Model', (object,), {'id': construct})
+    builder = Builder(model).withKeyStorage(KeyStorage())
+    started = time.time()
+    builder.buildMany(number)
+    return number / (time.time() - started)
+
+
+def run():
+    for number in (1000, 5000, 20000):
+        print('%s keys out of %s values' % (number, number * 2))
+        print('  %-40s %10.0f keys/s' % ('list with retries', keys_per_second(ListKey(Random(1, number * 2)), number)))
+        print('  %-40s %10.0f keys/s' % ('set with range shuffle', keys_per_second(Key(Random(1, number * 2)), number)))
+
+    number = 100000
+    print('%s keys out of %s values' % (number, number))
+    print('  %-40s %10.0f keys/s' % ('set with range shuffle', keys_per_second(Key(Random(1, number)), number)))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,32 @@
+'''
+Compares building a large tree at once with building it lazily (see :py:mod:`builders.lazy`)
+when a test reads just one of its branches, and when it reads the whole tree.
+'''
+from builders import lazy
+from builders.builder import Builder
+from builders.modifiers import NumberOf
+from builders.tests.test_regression import Player, Squad
+
+from benchmarks.common import best_of, report
+
+
+def run(squads=100, units=50):
+    modifiers = [NumberOf(Player.squads, squads), NumberOf(Squad.units, units)]
+
+    def eager():
+        return Builder(Player).withA(modifiers).build()
+
+    def sparse():
+        return Builder(Player).withLazy().withA(modifiers).build().squads[0].units[0]
+
+    def full():
+        return lazy.materialize(Builder(Player).withLazy().withA(modifiers).build())
+
+    report('%s squads of %s units' % (squads, units),
+           [('built at once', best_of(eager, number=3)),
+            ('lazy, one unit read', best_of(sparse, number=3)),
+            ('lazy, all read', best_of(full, number=3))])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,40 @@
+'''
+Measures what disabled debug logging costs per built node, compared with logging stripped off altogether.
+'''
+import logging
+
+from builders import builder, construct, modifiers as modifiers_module
+from builders.builder import Builder
+from builders.logger import logger
+from builders.modifiers import NumberOf
+from builders.tests.test_regression import Player, Squad
+
+from benchmarks.common import best_of, report
+
+
+def run(squads=10, units=10):
+    modifiers = [NumberOf(Player.squads, squads), NumberOf(Squad.units, units)]
+    nodes = 1 + squads * (2 + units)
+
+    def build():
+        Builder(Player).withA(modifiers).build()
+
+    logger.setLevel(logging.INFO)
+    enabled = best_of(build, number=20, repeat=10)
+
+    debugging = builder.debugging
+    try:
+        logger.debug = lambda *args, **kwargs: None
+        builder.debugging = construct.debugging = modifiers_module.debugging = lambda: False
+        stripped = best_of(build, number=20, repeat=10)
+    finally:
+        del logger.debug
+        builder.debugging = construct.debugging = modifiers_module.debugging = debugging
+
+    report('Player with %s squads of %s units, %s nodes, per node' % (squads, units, nodes),
+           [('logger at INFO', enabled / nodes),
+            ('logging stripped off', stripped / nodes)])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,63 @@
+'''
+Compares indexed :py:class:`builders.modifiers.ConstructModifier` dispatch with the class attribute scan
+it replaces, applying 200 modifiers to a deep tree.
+'''
+from builders.builder import Builder
+from builders.construct import Unique, Random
+from builders.modifiers import ConstructModifier, Given, classvars
+
+from benchmarks.common import best_of, report
+
+
+def make_chain(depth, width):
+    """
+    Returns the root of ``depth`` model classes, each holding ``width`` :py:class:`Random` constructs and linked with :py:class:`Unique`.
+    """
+    clazz = type('Level%s' % depth, (object,), {})
+    for level in reversed(range(depth)):
+        attrs = dict(('field%s' % i, Random()) for i in range(width))
+        attrs['child'] = Unique(clazz)
+        clazz = type('Level%s' % level, (object,), attrs)
+    return clazz
+
+
+def scanning_do(self, clazz):
+    for name, value in classvars(clazz).items():
+        if value == self.construct:
+            self.doApply(value)
+
+
+def modifiers_for(root, count):
+    modifiers = []
+    clazz = root
+    while len(modifiers) < count:
+        fields = [value for name, value in sorted(vars(clazz).items()) if name.startswith('field')]
+        modifiers.extend(Given(field, 1) for field in fields)
+        clazz = clazz.child.type
+    return modifiers[:count]
+
+
+def run(depth=30, width=10, count=200):
+    root = make_chain(depth, width)
+    modifiers = modifiers_for(root, count)
+
+    def build():
+        return Builder(root).withA(modifiers).build()
+
+    indexed = best_of(build, number=10)
+
+    shouldRun, do = ConstructModifier.shouldRun, ConstructModifier.do
+    try:
+        ConstructModifier.shouldRun = lambda self, clazz=None, **kwargs: clazz
+        ConstructModifier.do = scanning_do
+        scanning = best_of(build, number=10)
+    finally:
+        ConstructModifier.shouldRun, ConstructModifier.do = shouldRun, do
+
+    report('%s modifiers over %s levels of %s fields' % (count, depth, width),
+           [('classvars() scan per modifier', scanning),
+            ('construct index dispatch', indexed)])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,34 @@
+'''
+Compares sequential and process pool building of large Player trees.
+'''
+import time
+
+from builders.builder import Builder
+from builders.modifiers import NumberOf, InParallel
+from builders.tests.test_regression import Player, Squad
+
+
+def timed(func):
+    started = time.time()
+    func()
+    return time.time() - started
+
+
+def run(trees=40, squads=50, units=20, workers=4):
+    modifiers = [NumberOf(Player.squads, squads), NumberOf(Squad.units, units)]
+
+    print('%s Players with %s squads of %s units' % (trees, squads, units))
+    sequential = timed(lambda: Builder(Player).withA(modifiers).buildMany(trees))
+    print('  %-40s %8.2f s' % ('sequential', sequential))
+    pooled = timed(lambda: Builder(Player).withA(modifiers).buildMany(trees, workers=workers))
+    print('  %-40s %8.2f s  x%.2f' % ('buildMany(workers=%s)' % workers, pooled, sequential / pooled))
+
+    print('One Player with %s squads of %s units' % (squads * trees, units))
+    sequential = timed(lambda: Builder(Player).withA(modifiers, NumberOf(Player.squads, squads * trees)).build())
+    print('  %-40s %8.2f s' % ('sequential', sequential))
+    pooled = timed(lambda: Builder(Player).withA(modifiers, NumberOf(Player.squads, squads * trees), InParallel(Player.squads, workers)).build())
+    print('  %-40s %8.2f s  x%.2f' % ('InParallel(Player.squads, %s)' % workers, pooled, sequential / pooled))
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,73 @@
+'''
+Compares :py:class:`builders.modifiers.ModifierIndex` selection with polling every modifier on every node,
+building a deep tree under a few hundred :py:class:`builders.modifiers.InstanceModifier` and ``values`` modifiers.
+'''
+from builders.builder import Builder
+from builders.construct import Random, Unique
+from builders.modifiers import InstanceModifier, ModifierIndex, ValuesMixin
+
+from benchmarks.common import best_of, report
+
+
+def make_chain(depth):
+    """
+    Returns the root of ``depth`` :py:class:`builders.modifiers.ValuesMixin` model classes linked with :py:class:`Unique`.
+    """
+    clazz = type('Level%s' % depth, (ValuesMixin,), {'value': Random()})
+    for level in reversed(range(depth)):
+        clazz = type('Level%s' % level, (ValuesMixin,), {'value': Random(), 'child': Unique(clazz)})
+    return clazz
+
+
+def modifiers_for(root, count):
+    """
+    Returns ``count`` modifiers targeting the classes of the chain, half of them ``values`` and half ``thatSets``.
+    """
+    classes = []
+    clazz = root
+    while hasattr(clazz, 'child'):
+        classes.append(clazz)
+        clazz = clazz.child.type
+    modifiers = []
+    for i in range(count):
+        target = classes[i % len(classes)]
+        if i % 2:
+            modifiers.append(target.values(value=i))
+        else:
+            modifiers.append(InstanceModifier(target).thatSets(mark=i))
+    return modifiers
+
+
+def unpartitioned(self, modifiers, base=None):
+    offset = base.size if base is not None else 0
+    self.size = offset + len(modifiers)
+    self.general = (base.general if base is not None else []) + list(enumerate(modifiers, offset))
+    self.byConstruct = {}
+    self.byClass = {}
+    self.classes = {}
+    self.instances = {}
+
+
+def run(depth=50, count=300):
+    root = make_chain(depth)
+    modifiers = modifiers_for(root, count)
+
+    def build():
+        return Builder(root).withA(modifiers).build()
+
+    partitioned = best_of(build, number=10)
+
+    init = ModifierIndex.__init__
+    try:
+        ModifierIndex.__init__ = unpartitioned
+        polling = best_of(build, number=10)
+    finally:
+        ModifierIndex.__init__ = init
+
+    report('%s instance modifiers over %s levels' % (count, depth),
+           [('shouldRun polled on every node', polling),
+            ('modifiers partitioned by class', partitioned)])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,71 @@
+'''
+Compares compiled build plans with the per-instance ``inspect.getmembers`` reflection
+they replace, on the ``test_regression`` Player/Squad/Unit model.
+'''
+from inspect import getmembers
+
+from builders import construct
+from builders.builder import Builder, Result
+from builders.modifiers import NumberOf
+from builders.plan import get_plan
+from builders.tests.test_regression import Player, Squad, Unit, Hero
+
+from benchmarks.common import best_of, report
+
+
+class ReflectingBuilder(Builder):
+    """
+    :py:class:`builders.builder.Builder` as it used to discover constructs -- by reflecting every instance.
+    """
+    def _buildSteps(self, profiler=None, tree=None, link=None, owner=None):
+        [m.apply(clazz=self.clazz) for m in self.modifiers if m.shouldRun(clazz=self.clazz)]
+
+        instance = self.clazz()
+
+        for name, value in getmembers(instance, lambda x: isinstance(x, construct.Construct) and not isinstance(x, construct.Uplink)):
+            setattr(instance, name, value.build(self.modifiers, instance=instance))
+
+        for name, value in getmembers(instance, lambda x: isinstance(x, construct.Uplink)):
+            if link is not None and value.destination is link:
+                value.value = owner
+            setattr(instance, name, value.build(self.modifiers, instance=instance))
+
+        for modifier in self.modifiers:
+            if modifier.shouldRun(instance=instance):
+                modifier.apply(instance=instance)
+
+        yield Result(instance)
+
+
+def reflect(instance):
+    constructs = getmembers(instance, lambda x: isinstance(x, construct.Construct) and not isinstance(x, construct.Uplink))
+    uplinks = getmembers(instance, lambda x: isinstance(x, construct.Uplink))
+    return constructs, uplinks
+
+
+def plan(instance):
+    return get_plan(instance.__class__).forInstance(instance)
+
+
+def run(squads=20, units=20):
+    instances = [Player(), Squad(), Unit(), Hero()]
+    report('Construct discovery for %s' % ', '.join(i.__class__.__name__ for i in instances),
+           [('getmembers() per instance', best_of(lambda: [reflect(i) for i in instances], number=1000)),
+            ('compiled build plans', best_of(lambda: [plan(i) for i in instances], number=1000))])
+
+    modifiers = [NumberOf(Player.squads, squads), NumberOf(Squad.units, units)]
+    original = construct.builder.Builder
+    try:
+        construct.builder.Builder = ReflectingBuilder
+        reflecting = best_of(lambda: ReflectingBuilder(Player).withA(modifiers).build(), number=3)
+    finally:
+        construct.builder.Builder = original
+    planned = best_of(lambda: Builder(Player).withA(modifiers).build(), number=3)
+
+    report('Player with %s squads of %s units' % (squads, units),
+           [('getmembers() per instance', reflecting),
+            ('compiled build plans', planned)])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,45 @@
+'''
+Compares cloning a :py:class:`builders.prototype.Prototype` with building the same tree anew.
+'''
+from builders.builder import Builder
+from builders.construct import Collection, Key, Lambda, Predefined, Random, Uid, Unique, Uplink
+from builders.modifiers import Given, NumberOf
+
+from benchmarks.common import best_of, report
+
+
+class Address(object):
+    city = Predefined('Moscow')
+    street = Random(pattern='street %s')
+    building = Random(1, 200)
+
+
+class Item(object):
+    sku = Key(Random(1, 10 ** 9))
+    price = Random(1, 10000)
+    title = Lambda(lambda item: 'item %s' % item.price)
+    order = Uplink()
+
+
+class Order(object):
+    id = Key(Random(1, 10 ** 9))
+    uid = Uid()
+    status = Predefined('new')
+    address = Unique(Address)
+    items = Collection(Item)
+
+
+Item.order.linksTo(Order, Order.items)
+
+
+def run(number=2000):
+    builder = Builder(Order).withKeyStorage().withA(NumberOf(Order.items, 10), Given(Order.status, 'paid'))
+    prototype = builder.prototype()
+    report('%s orders of 10 items' % number, [
+        ('build', best_of(lambda: [builder.build() for _ in xrange(number)], 1)),
+        ('clone', best_of(lambda: prototype.cloneMany(number), 1)),
+    ])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,38 @@
+'''
+Compares drawing :py:class:`builders.construct.Random` values from the global :py:mod:`random`
+with a per-build :py:class:`builders.rng.RandomSource`.
+'''
+import random
+
+from builders.builder import Builder
+from builders.construct import Key, Random
+from builders.rng import RandomSource
+
+from benchmarks.common import best_of, report
+
+
+class Flat(object):
+    id = Key(Random(1, 10 ** 7))
+    a = Random()
+    b = Random(1, 6)
+    c = Random(pattern='c%s')
+    d = Random()
+    e = Random(1, 1000)
+    f = Random()
+    g = Random(pattern='g%s')
+
+
+def run(draws=100000, trees=5000):
+    source = RandomSource(1)
+    report('%s draws' % draws, [
+        ('random.randint', best_of(lambda: [random.randint(1, 100500) for _ in xrange(draws)], 1)),
+        ('RandomSource.randint', best_of(lambda: [source.randint(1, 100500) for _ in xrange(draws)], 1)),
+    ])
+    report('%s random-heavy trees' % trees, [
+        ('global random', best_of(lambda: Builder(Flat).withKeyStorage().buildMany(trees), 1)),
+        ('RandomSource', best_of(lambda: Builder(Flat).withKeyStorage().withRandom(1).buildMany(trees), 1)),
+    ])
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,45 @@
+'''
+Compares :py:class:`builders.sink.SQLiteSink` with hand-written row by row inserts and with itself not batching.
+
+In-memory ``sqlite3`` makes a single insert as cheap as it gets, so that is the least favourable case for batching;
+against a database over the network the per-statement round trip dominates instead.
+'''
+import sqlite3
+
+from builders.builder import Builder
+from builders.modifiers import NumberOf
+from builders.sink import SQLiteSink
+from builders.tests.test_sink import Team
+
+from benchmarks.common import best_of, report
+
+
+def row_by_row(trees):
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE Team (id, title)')
+    connection.execute('CREATE TABLE Player (id, number, team_id, uid)')
+    for team in trees:
+        connection.execute('INSERT INTO Team (id, title) VALUES (?, ?)', (team.id, team.title))
+        for number, player in enumerate(team.players):
+            connection.execute('INSERT INTO Player (id, number, team_id, uid) VALUES (?, ?, ?, ?)',
+                               (number, player.number, team.id, player.uid))
+
+
+def sink(batch_size):
+    def write(trees):
+        with SQLiteSink(sqlite3.connect(':memory:'), batch_size=batch_size) as sink:
+            sink.consume(trees)
+    return write
+
+
+def run(teams=200, players=50):
+    trees = Builder(Team).withA(NumberOf(Team.players, players)).buildMany(teams)
+    rows = teams * (players + 1)
+
+    writers = [('hand-written row by row', row_by_row), ('SQLiteSink, batch_size=1', sink(1)), ('SQLiteSink', sink(1000))]
+    timings = [(name, best_of(lambda: write(trees), 1)) for name, write in writers]
+    report('%s rows into sqlite' % rows, timings)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,20 @@
+'''
+Compares :py:class:`builders.construct.Uid` forms with plain ``str(uuid.uuid4())`` calls.
+'''
+import uuid
+
+from builders.construct import Uid
+
+from benchmarks.common import best_of, report
+
+
+def run(number=100000):
+    rows = [('str(uuid.uuid4())', best_of(lambda: [str(uuid.uuid4()) for _ in xrange(number)], 1))]
+    for title, uid in [('Uid()', Uid()), ("Uid(form='int')", Uid(form='int')),
+                       ("Uid(form='bytes')", Uid(form='bytes')), ('Uid(ordered=True)', Uid(ordered=True))]:
+        rows.append((title, best_of(lambda: [uid.doBuild() for _ in xrange(number)], 1)))
+    report('%s UUIDs' % number, rows)
+
+
+if __name__ == '__main__':
+    run()
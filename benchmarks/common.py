@@ -0,0 +1,21 @@
+'''
+Helpers shared by the benchmark scripts.
+'''
+import timeit
+
+
+def best_of(func, number, repeat=5):
+    """
+    Runs ``func`` ``number`` times in a row ``repeat`` times and returns the best time of a single call, in seconds.
+    """
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+
+def report(title, rows):
+    """
+    Prints ``rows`` of ``(name, seconds)`` as a table, with the speedup relative to the first row.
+    """
+    print(title)
+    baseline = rows[0][1]
+    for name, seconds in rows:
+        print('  %-40s %10.3f ms  x%.2f' % (name, seconds * 1000, baseline / seconds))
@@ -0,0 +1,168 @@
+'''
+Reproducible benchmark suite for the build hot paths.
+
+Every scenario runs in a fresh interpreter, so that its peak memory is measured in isolation.
+Results can be saved and compared with a previous run to catch regressions::
+
+  python -m benchmarks.suite --save baseline.json
+  python -m benchmarks.suite --compare baseline.json --tolerance 0.2
+
+Comparison fails (exit code 1) if any scenario got slower in nodes/s by more than ``tolerance``.
+'''
+import argparse
+import collections
+import json
+import random
+import resource
+import subprocess
+import sys
+import time
+
+from builders.builder import Builder
+from builders.cache import ReuseCache
+from builders.construct import Collection, Key, Random, Reused, Unique, Uid, KeyStorage
+from builders.modifiers import InstanceModifier, NumberOf
+from builders.tests.test_regression import Player, Squad
+
+from benchmarks.bench_modifiers import make_chain, modifiers_for
+
+
+def count_nodes(trees):
+    """
+    Counts model instances reachable from ``trees`` via instance attributes and lists.
+    """
+    seen = set()
+    pending = list(trees)
+    nodes = 0
+    while pending:
+        node = pending.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if isinstance(node, (list, tuple)):
+            pending.extend(node)
+        elif hasattr(node, '__dict__') and not isinstance(node, type):
+            nodes += 1
+            pending.extend(node.__dict__.values())
+    return nodes
+
+
+def deep_unique(depth=100):
+    root = make_chain(depth, 2)
+    return lambda: [Builder(root).build() for _ in xrange(20)], {}
+
+
+def wide_collection(width=5000):
+    Row = type('Row', (object,), dict(a=Random(), b=Random(pattern='b%s'), c=Uid(), d=0, e=''))
+    Table = type('Table', (object,), dict(rows=Collection(Row)))
+    return lambda: [Builder(Table).withA(NumberOf(Table.rows, width)).build()], {}
+
+
+def uplinks(squads=20, units=20):
+    modifiers = [NumberOf(Player.squads, squads), NumberOf(Squad.units, units)]
+    return lambda: Builder(Player).withA(modifiers).buildMany(5), {}
+
+
+def key_fill(number=20000):
+    Row = type('Row', (object,), dict(id=Key(Random(1, number))))
+    return lambda: Builder(Row).withKeyStorage(KeyStorage()).buildMany(number), {'fill ratio': 1.0}
+
+
+def reused_hits(number=2000, distinct=10):
+    Tenant = type('Tenant', (object,), dict(name='', payload=Unique(make_chain(5, 2))))
+    Account = type('Account', (object,), dict(tenant=Reused(Tenant, keys=['name'], cache=ReuseCache(), keys_first=True)))
+    names = [InstanceModifier(Tenant).thatSets(name='tenant%s' % random.randint(1, distinct)) for _ in xrange(number)]
+    stats = {}
+
+    def build():
+        Account.tenant.instances.clear()
+        trees = [Builder(Account).withA(name).build() for name in names]
+        hits = Account.tenant.instances.stats()
+        stats['hit rate'] = round(float(hits['hits']) / (hits['hits'] + hits['misses']), 3)
+        return trees
+    return build, stats
+
+
+def many_modifiers(depth=30, width=10, count=200):
+    root = make_chain(depth, width)
+    modifiers = modifiers_for(root, count)
+    return lambda: [Builder(root).withA(modifiers).build() for _ in xrange(5)], {}
+
+
+SCENARIOS = collections.OrderedDict((scenario.__name__, scenario) for scenario in [
+    deep_unique, wide_collection, uplinks, key_fill, reused_hits, many_modifiers])
+
+
+def measure(name, repeat=3):
+    """
+    Runs scenario ``name`` in this process and returns its result ``dict``.
+    """
+    random.seed(0)
+    build, extra = SCENARIOS[name]()
+    best = None
+    for _ in xrange(repeat):
+        started = time.time()
+        trees = build()
+        elapsed = time.time() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    nodes = count_nodes(trees)
+    result = dict(name=name, nodes=nodes, seconds=best, nodes_per_second=nodes / best,
+                  peak_mb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0)
+    result.update(extra)
+    return result
+
+
+def run_isolated(name):
+    output = subprocess.check_output([sys.executable, '-m', 'benchmarks.suite', '--measure', name])
+    return json.loads(output.splitlines()[-1])
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns names of the scenarios whose nodes/s dropped by more than ``tolerance`` against ``baseline``.
+    """
+    previous = dict((result['name'], result) for result in baseline)
+    return [result['name'] for result in results
+            if result['name'] in previous and
+            result['nodes_per_second'] < previous[result['name']]['nodes_per_second'] * (1 - tolerance)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('scenarios', nargs='*', help='scenarios to run, all by default: %s' % ', '.join(SCENARIOS))
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    parser.add_argument('--save', help='save results as JSON to that file')
+    parser.add_argument('--compare', help='compare with results saved to that file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed nodes/s drop, 0.2 by default')
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        print(json.dumps(measure(args.measure)))
+        return 0
+
+    results = []
+    print('%-18s %8s %10s %12s %9s  %s' % ('scenario', 'nodes', 'seconds', 'nodes/s', 'peak MB', 'extra'))
+    for name in args.scenarios or SCENARIOS:
+        result = run_isolated(name)
+        results.append(result)
+        extra = dict((k, v) for k, v in result.items() if k not in ('name', 'nodes', 'seconds', 'nodes_per_second', 'peak_mb'))
+        print('%-18s %8d %10.3f %12.0f %9.1f  %s' % (name, result['nodes'], result['seconds'],
+                                                     result['nodes_per_second'], result['peak_mb'],
+                                                     ', '.join('%s=%s' % item for item in sorted(extra.items()))))
+
+    if args.save:
+        with open(args.save, 'w') as output:
+            json.dump(results, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        if regressions:
+            print('Regressions: %s' % ', '.join(regressions))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,9 +1,27 @@
 import construct
 import collections
+import modifiers as modifiers_package
+import itertools
+import lazy as lazy_module
+import sys
 
-from inspect import getmembers
+from builders import columnar, context, diskcache, parallel, profiler as profiler_module, prototype, rng
+from builders.cache import ReuseCache
+from builders.logger import logger, debugging
+from builders.plan import get_plan, compile_graph
 
-from builders.logger import logger
+
+max_depth = 100000
+"""
+Amount of nested build steps :py:func:`run` keeps at most, see :py:class:`BuildTooDeep`.
+"""
+
+
+class BuildTooDeep(RuntimeError):
+    """
+    Raised when nested build steps go deeper than ``max_depth``, that is most likely a cycle of constructs
+    (e.g. an enabled :py:class:`builders.construct.Maybe` of the model holding it).
+    """
 
 
 def flatten(l):
@@ -13,15 +31,99 @@ def flatten(l):
         Generator that flattens iterable infinitely. If an item is iterable, ``flatten`` descends on it.
         If it is callable, it descends on the call result (with no arguments), and it yields the item itself otherwise.
     """
-    if isinstance(l, collections.Iterable) and not isinstance(l, basestring):
-        for el in l:
-            for sub in flatten(el):
-                yield sub
-    elif callable(l):
-        for sub in flatten(l()):
-            yield sub
-    else:
-        yield l
+    pending = [iter([l])]
+    while pending:
+        for item in pending[-1]:
+            if isinstance(item, collections.Iterable) and not isinstance(item, basestring):
+                pending.append(iter(item))
+                break
+            elif callable(item):
+                pending.append(iter([item()]))
+                break
+            else:
+                yield item
+        else:
+            pending.pop()
+
+
+class Result(object):
+    """
+    The last step of build steps, holds the ``value`` they built. See :py:func:`run`.
+    """
+    __slots__ = ['value']
+
+    def __init__(self, value):
+        self.value = value
+
+
+def done(value):
+    """
+    Build steps of an already known ``value``.
+    """
+    yield Result(value)
+
+
+def run(steps):
+    """
+        :arg steps: generator of build steps
+
+        Runs ``steps`` to the end and returns the value of their :py:class:`Result`.
+
+        Steps yield generators of nested steps to get their results sent back, and a :py:class:`Result` last.
+        Functions that would only yield nested steps and pass their result on return the nested steps as is instead
+        (like :py:meth:`Builder.steps` and :py:meth:`builders.construct.Unique.doSteps`), which saves a generator per model.
+        Nested steps are kept on a ``list`` rather than on the Python stack, so trees of any depth are built
+        without hitting the recursion limit. Exceptions propagate through the steps just like through calls.
+
+        Steps deeper than ``max_depth`` raise :py:class:`BuildTooDeep` in the steps that yield them, like calls
+        deeper than the recursion limit do.
+    """
+    pending = [steps]
+    push, pop = pending.append, pending.pop
+    send = steps.send
+    value = error = None
+    limit = max_depth
+    while True:
+        try:
+            if error is None:
+                step = send(value)
+            else:
+                thrown, error = error, None
+                step = pending[-1].throw(*thrown)
+        except StopIteration:
+            step = Result(None)
+        except BaseException:
+            error = sys.exc_info()
+            pop()
+            if not pending:
+                raise error[0], error[1], error[2]
+            send = pending[-1].send
+            continue
+        if type(step) is Result:
+            pop()
+            if not pending:
+                return step.value
+            value = step.value
+            send = pending[-1].send
+        elif len(pending) < limit:
+            push(step)
+            send = step.send
+            value = None
+        else:
+            step.close()
+            error = (BuildTooDeep, BuildTooDeep('Build is deeper than %s steps: %s' % (limit, _chain(pending))), None)
+
+
+def _chain(pending, shown=10):
+    """
+    Returns the last ``shown`` model attributes being built by ``pending`` steps.
+    """
+    chain = []
+    for steps in pending:
+        frame = getattr(steps, 'gi_frame', None)
+        if frame is not None and frame.f_code is Builder._buildSteps.im_func.func_code and 'name' in frame.f_locals:
+            chain.append('%s.%s' % (frame.f_locals['self'].clazz.__name__, frame.f_locals['name']))
+    return ' -> '.join((['...'] if len(chain) > shown else []) + chain[-shown:])
 
 
 class Builder:
@@ -49,39 +151,286 @@ class Builder:
         '''
 
         self.clazz = clazzToBuild
-        self.modifiers = []
-        logger.debug("New builder for clazz <%s>" % self.clazz)
+        self.modifiers = modifiers_package.ModifierChain()
+        self.keyStorage = None
+        self.reuseCache = None
+        self.profiler = None
+        self.randomSource = None
+        self.diskCache = None
+        self.lazy = None
+        if debugging():
+            logger.debug("New builder for clazz <%s>", self.clazz)
+
+    def _buildclazz(self, clazzToBuild, profiler=None, tree=None, link=None, owner=None):
+        return run(self._buildSteps(profiler, tree, link, owner))
 
-    def _buildclazz(self, clazzToBuild):
-        [m.apply(clazz=self.clazz) for m in self.modifiers if m.shouldRun(clazz=self.clazz)]
+    def _buildSteps(self, profiler=None, tree=None, link=None, owner=None):
+        index = self.modifiers.index
+        build_plan = get_plan(self.clazz)
+        modifiers = index.forClass(build_plan)
+        if profiler is None:
+            [m.apply(clazz=self.clazz) for m in modifiers if m.shouldRun(clazz=self.clazz)]
+        else:
+            profiler.applyModifiers(modifiers, clazz=self.clazz)
 
+        debug = debugging()
         instance = self.clazz()
-        logger.debug('Created new instance %s of clazz %s' % (instance, self.clazz))
+        if debug:
+            logger.debug('Created new instance %s of clazz %s', instance, self.clazz)
 
-        def make_construct(name, construct):
-            logger.debug('Constructing <%s.%s>' % (self.clazz, name))
-            setattr(instance, name, construct.build(self.modifiers, instance=instance))
+        constructs, uplinks = build_plan.forInstance(instance)
+        build_context = context.current()
+        lazy = build_context.lazy
+        backrefs = build_plan.backrefs.get(link) if link is not None else None
 
-        logger.debug('Creating nested constructst of %s' % instance)
-        for name, value in getmembers(instance, lambda x: isinstance(x, construct.Construct) and not isinstance(x, construct.Uplink)):
-            make_construct(name, value)
+        for kind, members in (('nested constructs', constructs), ('uplinks', uplinks)):
+            if debug:
+                logger.debug('Creating %s of %s', kind, instance)
+            for name, value in members:
+                if debug:
+                    logger.debug('Constructing <%s.%s>', self.clazz, name)
+                if backrefs is not None and name in backrefs and value.destination is link:
+                    if profiler is not None:
+                        if not value.value:
+                            value.value = owner
+                        setattr(instance, name, profiler.construct(self.clazz, name, value, self.modifiers, instance=instance))
+                        continue
+                    preset = value.value
+                    if preset:
+                        value.value = None
+                    setattr(instance, name, preset or owner)
+                    continue
+                if tree is not None:
+                    build_context.random = tree.child(name)
+                if lazy is not None and lazy.defer(instance, name, value, build_plan, self.modifiers, build_context):
+                    continue
+                if profiler is not None:
+                    setattr(instance, name, profiler.construct(self.clazz, name, value, self.modifiers, instance=instance))
+                elif value.iterative:
+                    setattr(instance, name, (yield value.steps(self.modifiers, instance=instance)))
+                else:
+                    setattr(instance, name, value.build(self.modifiers, instance=instance))
 
-        logger.debug('Creating uplinks of %s' % instance)
-        for name, value in getmembers(instance, lambda x: isinstance(x, construct.Uplink)):
-            make_construct(name, value)
+        if tree is not None:
+            build_context.random = tree
 
         # instance level modifier application
-        for modifier in self.modifiers:
-            if modifier.shouldRun(instance=instance):
-                modifier.apply(instance=instance)
+        modifiers = index.forInstance(instance.__class__)
+        if profiler is None:
+            for modifier in modifiers:
+                if modifier.shouldRun(instance=instance):
+                    modifier.apply(instance=instance)
+        else:
+            profiler.applyModifiers(modifiers, instance=instance)
 
-        return instance
+        yield Result(instance)
 
-    def build(self):
+    def build(self, seed=None):
         """
+            :arg seed: integer seed or :py:class:`builders.rng.TreeSource` to build a reproducible tree from
+
             Build the resulting instance with the respect of all of the previously applied modifiers.
+
+            Per-build state is kept in a :py:class:`builders.context.BuildContext`, so concurrent builds are safe.
+
+            With a ``seed`` every construct draws its random values (:py:class:`builders.construct.Random`,
+            :py:class:`builders.construct.Uid`, :py:class:`builders.construct.Key`) from a source derived from the seed
+            and its position in the tree, e.g. ``TreeSource(seed).child('bars', 2, 'name')`` for ``tree.bars[2].name``.
+            So the same seed and modifiers give the same tree, and ``Builder(Bar).build(seed=TreeSource(seed).child('bars', 2))``
+            rebuilds just that item. Keys of a seeded build are kept in a new :py:class:`builders.construct.KeyStorage`
+            unless the builder has one, so that they do not depend on the builds made before.
+
+            With a disk cache (see :py:meth:`withDiskCache`) top-level unseeded trees are loaded from it when possible.
+
+            Nested models are built by :py:func:`run`, without recursion, so models of any depth can be built.
+            Constructs overriding ``doBuild`` and profiled builds (see :py:meth:`withProfiler`) still recurse.
+
+            With :py:meth:`withLazy` some attributes are built on their first read instead.
+        """
+        if self.diskCache is not None and seed is None and context.current() is None:
+            return self.diskCache.build(self)
+
+        with context.building() as build_context:
+            if seed is not None:
+                return self._buildSeeded(build_context, rng.TreeSource.of(seed))
+            tree = self._prepare(build_context)
+            if build_context.profiler is not None:
+                return build_context.profiler.instance(self.clazz, self._buildclazz, self.clazz, build_context.profiler, tree)
+            return run(self._buildSteps(None, tree))
+
+    def _prepare(self, build_context):
+        if self.keyStorage is not None and build_context.keys is None:
+            build_context.keys = self.keyStorage
+        if self.reuseCache is not None and build_context.reused is None:
+            build_context.reused = self.reuseCache
+        if self.randomSource is not None and build_context.random is None:
+            build_context.random = self.randomSource
+        if self.profiler is not None and build_context.profiler is None:
+            build_context.profiler = self.profiler
+        if self.lazy is not None and build_context.lazy is None:
+            build_context.lazy = self.lazy
+        return build_context.random if type(build_context.random) is rng.TreeSource else None
+
+    def _buildSeeded(self, build_context, tree):
+        previous = build_context.random, build_context.keys
+        build_context.random = tree
+        if build_context.keys is None and self.keyStorage is None:
+            build_context.keys = construct.KeyStorage()
+        try:
+            return self.build()
+        finally:
+            build_context.random, build_context.keys = previous
+
+    def steps(self, link=None, owner=None):
+        """
+            :arg link: construct of ``owner`` building this model, if any
+            :arg owner: instance to set the uplinks linked to ``link`` to
+
+            Returns generator of :py:meth:`build` steps, see :py:func:`run`.
+            Uplinks linked to ``link`` are set to ``owner`` directly (see ``backrefs`` of :py:class:`builders.plan.BuildPlan`)
+            unless they have a value given already.
+        """
+        build_context = context.current()
+        if build_context is not None and build_context.profiler is None and self.keyStorage is None \
+                and self.reuseCache is None and self.randomSource is None and self.profiler is None and self.lazy is None:
+            # a nested builder of a running build has nothing to set up
+            random = build_context.random
+            return self._buildSteps(None, random if type(random) is rng.TreeSource else None, link, owner)
+        return self._contextSteps(link, owner)
+
+    def _contextSteps(self, link, owner):
+        with context.building() as build_context:
+            tree = self._prepare(build_context)
+            if build_context.profiler is not None:
+                result = build_context.profiler.instance(self.clazz, self._buildclazz, self.clazz, build_context.profiler, tree, link, owner)
+            else:
+                result = yield self._buildSteps(None, tree, link, owner)
+        yield Result(result)
+
+    def iterBuild(self, number=None):
+        """
+            :arg number: amount of trees to build, unlimited if not given
+
+            Generator of independent result trees, each one built like with :py:meth:`build`.
+
+            Modifiers and the build plans of all the model classes reachable from ``clazzToBuild``
+            are prepared once, before the first tree, rather than for each tree of a ``Builder(...).withA(...).build()`` loop.
+            That pays off for small trees only (see ``benchmarks/bench_build_many.py``), larger ones take their time building nodes.
+            Modifiers added with :py:meth:`withA` after the generator is started do not affect it.
+        """
+        compile_graph(self.clazz)
+        prepared = self._prepared()
+
+        for _ in (xrange(number) if number is not None else itertools.count()):
+            yield prepared.build()
+
+    def _prepared(self):
+        prepared = Builder(self.clazz)
+        prepared.modifiers = self.modifiers
+        prepared.keyStorage = self.keyStorage
+        prepared.reuseCache = self.reuseCache
+        prepared.profiler = self.profiler
+        prepared.randomSource = self.randomSource
+        prepared.lazy = self.lazy
+        return prepared
+
+    def buildMany(self, number, workers=None):
+        """
+            :arg number: amount of trees to build
+            :arg workers: build trees in a pool of that much processes, see :py:mod:`builders.parallel`
+
+            Returns a ``list`` of ``number`` independent result trees, see :py:meth:`iterBuild`.
+        """
+        if workers and not parallel.in_worker():
+            return parallel.build_trees(self.clazz, self.modifiers, number, workers, self.randomSource, self.keyStorage)
+        return list(self.iterBuild(number))
+
+    def buildColumns(self, number, structured=False):
+        """
+            :arg number: amount of records to build
+            :arg structured: return a ``numpy`` record array instead of a ``dict``
+
+            Builds ``number`` flat records as ``{attribute name: numpy array}``, generating whole columns at once where possible.
+            Requires ``numpy``, see :py:mod:`builders.columnar` for the details.
+        """
+        return columnar.build_columns(self, number, structured)
+
+    def prototype(self):
+        """
+            Builds a template tree right away and returns :py:class:`builders.prototype.Prototype` making copies of it.
+
+            Cloning is way cheaper than building, but only :py:class:`builders.construct.Key`, :py:class:`builders.construct.Uid`
+            and :py:class:`builders.construct.Random` values are built anew for every copy, see :py:mod:`builders.prototype`::
+
+              accounts = Builder(Account).withA(NumberOf(Account.cards, 3)).prototype()
+              fixtures = [accounts.clone(name=name) for name in names]
+        """
+        return prototype.Prototype(self)
+
+    def withKeyStorage(self, storage=None):
+        """
+            :arg storage: :py:class:`builders.construct.KeyStorage` to use, a new one if not given
+
+            Makes :py:class:`builders.construct.Key` values of the trees built by this builder
+            unique within the given ``storage`` rather than within the global one.
+        """
+        self.keyStorage = storage if storage is not None else construct.KeyStorage()
+        return self
+
+    def withReuseCache(self, cache=None):
+        """
+            :arg cache: :py:class:`builders.cache.ReuseCache` to use, a new unbounded one if not given
+
+            Makes :py:class:`builders.construct.Reused` constructs with global cache keep instances
+            of the trees built by this builder in the given ``cache`` instead.
         """
-        return self._buildclazz(self.clazz)
+        self.reuseCache = cache if cache is not None else ReuseCache()
+        return self
+
+    def withRandom(self, source=None):
+        """
+            :arg source: :py:class:`builders.rng.RandomSource` or an integer seed for a new one, a randomly seeded one if not given
+
+            Makes the builds of this builder draw random values from ``source`` rather than from the global :py:mod:`random`.
+            The seed in use is available as ``builder.randomSource.seed``.
+        """
+        if source is None or isinstance(source, (int, long)):
+            source = rng.RandomSource(source)
+        self.randomSource = source
+        return self
+
+    def withDiskCache(self, cache=None):
+        """
+            :arg cache: :py:class:`builders.diskcache.DiskCache` or a directory for a new one, a default one if not given
+
+            Makes :py:meth:`build` load the tree from the ``cache`` if it was built with the same models and modifiers before,
+            and store it there otherwise, see :py:mod:`builders.diskcache`. Handy for expensive test fixtures.
+        """
+        self.diskCache = cache if isinstance(cache, diskcache.DiskCache) else diskcache.DiskCache(cache)
+        return self
+
+    def withLazy(self, *constructs):
+        """
+            :arg constructs: constructs to defer, all the nested model ones if not given
+
+            Makes the builds of this builder defer the ``constructs`` until their attributes are read,
+            so that the parts of the tree that are never read are never built. See :py:mod:`builders.lazy`::
+
+              player = Builder(Player).withLazy(Player.squads).build()
+              player.squads  # built right now, with the modifiers of the builder
+        """
+        self.lazy = lazy_module.Laziness(constructs)
+        return self
+
+    def withProfiler(self, profiler=None):
+        """
+            :arg profiler: :py:class:`builders.profiler.BuildProfiler` to use, a new one if not given
+
+            Makes the builds of this builder report per-class, per-construct and per-modifier timings to ``profiler``,
+            available as ``builder.profiler`` afterwards.
+        """
+        self.profiler = profiler if profiler is not None else profiler_module.BuildProfiler()
+        return self
 
     def withA(self, *modifiers):
         """
@@ -90,13 +439,8 @@ class Builder:
             Apply a number of modifiers to this builder.
             Each modifier can be either a single :py:class:`builders.modifiers.Modifier` or a nested list structure of them.
 
-            Modifiers are stored in the builder and executed on the ``build`` call.
+            Modifiers are stored in the builder (as an immutable :py:class:`builders.modifiers.ModifierChain`)
+            and executed on the ``build`` call.
         """
-
-        modifiers = flatten(modifiers)
-        for mod in modifiers:
-            try:
-                self.modifiers += list(mod)
-            except:
-                self.modifiers.append(mod)
+        self.modifiers = self.modifiers.extend(*modifiers)
         return self
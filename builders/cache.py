@@ -0,0 +1,146 @@
+'''
+Caches for :py:class:`builders.construct.Reused` instances.
+
+All the caches count ``hits``, ``misses`` and ``evictions`` to help tuning them, see :py:meth:`ReuseCache.stats`.
+'''
+
+import collections
+import threading
+import weakref
+
+
+class ReuseCache(object):
+    """
+    Unbounded cache, keeps everything put into it until :py:meth:`clear`-ed.
+    """
+    def __init__(self):
+        self.data = self.createStorage()
+        self.lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def createStorage(self):
+        return {}
+
+    def get(self, key, default=None):
+        """
+        Returns cached value for ``key`` or ``default``. Counts a hit or a miss.
+        """
+        with self.lock:
+            value = self.fetch(key)
+            if value is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def add(self, key, value):
+        """
+        Caches ``value`` for ``key`` unless there is a cached one already. Counts a hit or a miss.
+
+        Returns the cached value.
+        """
+        with self.lock:
+            cached = self.fetch(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+            self.store(key, value)
+            return value
+
+    def getOrBuild(self, key, build):
+        """
+        Returns cached value for ``key``, calling ``build`` with no arguments to make one on a miss. Counts a hit or a miss.
+        """
+        with self.lock:
+            cached = self.fetch(key)
+            if cached is not None:
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        return self.put(key, build())
+
+    def put(self, key, value):
+        """
+        Caches ``value`` for ``key`` unless there is a cached one already, like :py:meth:`add`, but counts nothing.
+
+        Returns the cached value.
+        """
+        with self.lock:
+            cached = self.fetch(key)
+            if cached is not None:
+                return cached
+            self.store(key, value)
+            return value
+
+    def fetch(self, key):
+        return self.data.get(key)
+
+    def store(self, key, value):
+        self.data[key] = value
+
+    def clear(self):
+        """
+        Drops all the cached values and resets the counters.
+        """
+        with self.lock:
+            self.data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def stats(self):
+        """
+        Returns ``dict`` with ``hits``, ``misses``, ``evictions`` and ``size`` of the cache.
+        """
+        return dict(hits=self.hits, misses=self.misses, evictions=self.evictions, size=len(self))
+
+
+class LRUCache(ReuseCache):
+    """
+    :arg maxsize: maximum amount of cached values
+
+    Evicts least recently used values once there are more than ``maxsize`` of them.
+    """
+    def __init__(self, maxsize):
+        ReuseCache.__init__(self)
+        self.maxsize = maxsize
+
+    def createStorage(self):
+        return collections.OrderedDict()
+
+    def fetch(self, key):
+        value = self.data.pop(key, None)
+        if value is not None:
+            self.data[key] = value
+        return value
+
+    def store(self, key, value):
+        self.data[key] = value
+        while len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+            self.evictions += 1
+
+
+class WeakCache(ReuseCache):
+    """
+    Keeps weak references only, so a value is evicted as soon as nothing else refers to it.
+    """
+    def fetch(self, key):
+        reference = self.data.get(key)
+        return reference() if reference is not None else None
+
+    def store(self, key, value):
+        self.data[key] = weakref.ref(value, self._evict(key))
+
+    def _evict(self, key):
+        def evict(reference):
+            with self.lock:
+                if self.data.get(key) is reference:
+                    del self.data[key]
+                    self.evictions += 1
+        return evict
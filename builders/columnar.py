@@ -0,0 +1,269 @@
+'''
+Columnar batch output: lots of flat records as ``numpy`` arrays rather than as model instances.
+
+See :py:meth:`builders.builder.Builder.buildColumns`. Requires ``numpy``, which is an optional dependency.
+
+Columns are generated at once for the attributes that are
+
+* :py:class:`builders.construct.Random` -- a vectorized draw, formatted with the ``pattern`` if any,
+* :py:class:`builders.construct.Uid` strings -- formatted from a single batch of random bytes,
+* :py:class:`builders.construct.Key` over plain :py:class:`builders.construct.Random` -- unique within the key storage,
+* :py:class:`builders.construct.Predefined`, plain class attributes
+  and anything set by :py:class:`builders.modifiers.Given` or ``InstanceModifier(...).thatSets(...)`` -- constants,
+* :py:class:`builders.construct.Lambda` -- called once per record with a bare model instance holding the values
+  of attributes built before it.
+
+Random values are drawn from a ``numpy`` generator seeded from the builder random source (:py:mod:`random` by default),
+so its seed makes them reproducible. So are :py:class:`builders.construct.Uid` values, made of :py:func:`os.urandom`
+bytes only when there is no random source, like the ones built as instances.
+
+Models with other constructs (or modifiers that can not be told in advance, like ``InstanceModifier(...).thatDoes(...)``)
+are built instance by instance and transposed into columns, which is correct but not any faster.
+'''
+
+import binascii
+import itertools
+import os
+
+import construct
+import modifiers as modifiers_package
+import plan
+import rng
+from builders import context
+from builders.logger import logger
+
+
+class Unsupported(Exception):
+    """
+    Raised when a column can not be generated at once.
+    """
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError('Columnar builds require numpy, install it with `pip install numpy`')
+    return numpy
+
+
+def generator(numpy, source):
+    """
+    Returns ``numpy`` random generator seeded from ``source``, see :py:mod:`builders.rng`.
+    """
+    if hasattr(numpy.random, 'default_rng'):
+        return numpy.random.default_rng(source.getrandbits(64))
+    return numpy.random.RandomState(source.getrandbits(32))
+
+
+def integers(state, start, end, size):
+    """
+    Draws ``size`` random integers from ``start`` to ``end`` inclusive.
+    """
+    if hasattr(state, 'integers'):
+        return state.integers(start, end, size=size, endpoint=True)
+    return state.randint(start, end + 1, size=size)
+
+
+def uuids(numpy, number, state=None):
+    """
+    Returns array of ``number`` random (version 4) UUID strings, made of ``state`` random bytes (:py:func:`os.urandom` by default).
+    """
+    raw = state.bytes(16 * number) if state is not None else os.urandom(16 * number)
+    raw = numpy.frombuffer(raw, dtype=numpy.uint8).reshape(number, 16).copy()
+    raw[:, 6] = raw[:, 6] & 0x0f | 0x40
+    raw[:, 8] = raw[:, 8] & 0x3f | 0x80
+    digits = binascii.hexlify(raw.tobytes())
+    return numpy.array(['%s-%s-%s-%s-%s' % (digits[i:i + 8], digits[i + 8:i + 12], digits[i + 12:i + 16],
+                                            digits[i + 16:i + 20], digits[i + 20:i + 32])
+                        for i in xrange(0, 32 * number, 32)], dtype='S36')
+
+
+def keys(numpy, state, storage, clazz, value_construct, number):
+    """
+    Returns array of ``number`` fresh keys of ``clazz`` drawn from ``value_construct`` range, recording them in ``storage``.
+
+    :raises Exception: if the range does not have enough values left.
+    """
+    start, end = storage.bounds(value_construct.start, value_construct.end)
+    pattern = value_construct.pattern
+    size = end - start + 1
+
+    with storage.lock:
+        issued = storage.issued.setdefault(clazz, set())
+        result = []
+        taken = set()
+        for attempt in itertools.count():
+            wanted = number - len(result)
+            exhaustive = size <= 4 * wanted or attempt >= 4
+            if exhaustive:
+                candidates = start + state.permutation(size)
+            else:
+                candidates = integers(state, start, end, int(wanted * 1.1) + 16)
+            if pattern:
+                candidates = numpy.char.mod(pattern, candidates)
+            for value in candidates.tolist():
+                if value not in issued and value not in taken:
+                    taken.add(value)
+                    result.append(value)
+                    if len(result) == number:
+                        break
+            if len(result) == number:
+                break
+            if exhaustive:
+                raise Exception("Can't get unique key value! All the possible values are used.")
+        issued.update(taken)
+    return numpy.array(result)
+
+
+def column_of(numpy, values):
+    """
+    Returns array of ``values``, an ``object`` one unless all of them are numbers or strings.
+    """
+    if values and all(isinstance(value, (basestring, int, long, float, bool)) for value in values):
+        return numpy.array(values)
+    column = numpy.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        column[i] = value
+    return column
+
+
+def constant(numpy, value, number):
+    """
+    Returns array of ``number`` ``value``-s.
+    """
+    if isinstance(value, (basestring, int, long, float, bool)):
+        column = numpy.empty(number, dtype=numpy.asarray(value).dtype)
+    else:
+        column = numpy.empty(number, dtype=object)
+    column.fill(value)
+    return column
+
+
+def _overrides(clazz, modifiers):
+    """
+    Returns ``(given, lambdas, sets)`` -- values set by ``modifiers`` per construct and per attribute name.
+    """
+    given = {}
+    lambdas = {}
+    sets = {}
+    for modifier in modifiers:
+        if isinstance(modifier, modifiers_package.ConstructModifier):
+            if not modifier.shouldRun(clazz=clazz):
+                continue
+            if isinstance(modifier, modifiers_package.Given):
+                if modifier.value:
+                    given[modifier.construct] = modifier.value
+            elif isinstance(modifier, modifiers_package.LambdaModifier):
+                lambdas[modifier.construct] = modifier.value
+            else:
+                raise Unsupported('%s on %s' % (modifier, clazz))
+        elif isinstance(modifier, modifiers_package._ParticularClassModifier):
+            if issubclass(clazz, modifier.classToRunOn):
+                setter = modifier.action
+                if not isinstance(setter, modifiers_package._setter):
+                    raise Unsupported('%s action %s' % (modifier, setter))
+                if setter.careful and not all(hasattr(clazz, name) for name in setter.kwargs):
+                    raise Unsupported('%s sets attributes %s does not have' % (modifier, clazz))
+                sets.update(setter.kwargs)
+        elif not isinstance(modifier, modifiers_package.ClazzModifier) or modifier.shouldRun(clazz=clazz):
+            raise Unsupported('%s on %s' % (modifier, clazz))
+    return given, lambdas, sets
+
+
+def vectorized(clazz, modifiers, number, storage, source=rng.global_random):
+    """
+    Returns ``{name: array}`` of ``number`` ``clazz`` records generated column by column.
+
+    :raises Unsupported: if ``clazz`` or ``modifiers`` do not allow that.
+    """
+    if getattr(getattr(clazz, '__init__', None), 'im_func', None) is not None:
+        raise Unsupported('%s has custom __init__' % clazz)
+
+    numpy = _numpy()
+    state = generator(numpy, source)
+    members = plan.get_plan(clazz).members
+    given, lambdas, sets = _overrides(clazz, modifiers)
+
+    columns = {}
+    keyed = []
+    deferred = []
+    for name in plan.fields_of(clazz):
+        value = members.get(name)
+        if value in given:
+            columns[name] = constant(numpy, given[value], number)
+        elif value is None:
+            columns[name] = constant(numpy, getattr(clazz, name), number)
+        elif type(value) is construct.Random:
+            column = integers(state, value.start, value.end, number)
+            columns[name] = numpy.char.mod(value.pattern, column) if value.pattern else column
+        elif type(value) is construct.Uid and value.form == 'str' and not value.ordered:
+            columns[name] = uuids(numpy, number, state if source is not rng.global_random else None)
+        elif type(value) is construct.Key and type(value.value_construct) is construct.Random:
+            keyed.append((name, value.value_construct))
+        elif type(value) is construct.Predefined:
+            columns[name] = constant(numpy, value.predefined, number)
+        elif type(value) is construct.Lambda:
+            deferred.append((name, lambdas.get(value) or value.default_function))
+        else:
+            raise Unsupported('%s.%s is %s' % (clazz.__name__, name, type(value).__name__))
+
+    # keys are issued once all the columns are known to be generated at once, not to waste them on a fallback
+    for name, value in keyed:
+        columns[name] = keys(numpy, state, storage, clazz, value, number)
+    if deferred:
+        _call_lambdas(numpy, clazz, columns, deferred, number)
+
+    for name, value in sets.items():
+        columns[name] = constant(numpy, value, number)
+    return columns
+
+
+def _call_lambdas(numpy, clazz, columns, deferred, number):
+    built = sorted(plan.get_plan(clazz).members)
+    functions = dict(deferred)
+    values = dict((name, columns[name].tolist()) for name in built if name not in functions)
+    results = dict((name, []) for name in functions)
+    for i in xrange(number):
+        instance = clazz()
+        for name in built:
+            if name in functions:
+                value = functions[name](instance)
+                results[name].append(value)
+            else:
+                value = values[name][i]
+            setattr(instance, name, value)
+
+    for name, column in results.items():
+        columns[name] = column_of(numpy, column)
+
+
+def transposed(builder, number):
+    """
+    Returns ``{name: array}`` of ``number`` records built as instances by ``builder``.
+    """
+    numpy = _numpy()
+    rows = builder.buildMany(number)
+    return dict((name, column_of(numpy, [getattr(row, name) for row in rows])) for name in plan.fields_of(builder.clazz))
+
+
+def build_columns(builder, number, structured=False):
+    """
+    Builds ``number`` records like ``builder.buildMany(number)`` would do, but as ``{name: array}``
+    (or a ``numpy`` record array if ``structured``).
+    """
+    numpy = _numpy()
+    storage = builder.keyStorage
+    if storage is None:
+        storage = getattr(context.current(), 'keys', None) or construct.key_storage
+
+    try:
+        columns = vectorized(builder.clazz, builder.modifiers, number, storage, builder.randomSource or rng.current())
+    except Unsupported as e:
+        logger.info('Building %s records one by one: %s', builder.clazz, e)
+        columns = transposed(builder, number)
+
+    if structured:
+        names = sorted(columns)
+        return numpy.rec.fromarrays([columns[name] for name in names], names=[str(name) for name in names])
+    return columns
@@ -1,30 +1,44 @@
+import binascii
 import builder
+import inspect
+import itertools
 
+import lazy
 import modifiers as modifiers_package
-import itertools
+import parallel
+import plan
 import random
+import rng
+import sys
+import threading
 import uuid
 
 
-from builders.logger import logger
+from builders import context
+from builders.cache import ReuseCache
+from builders.context import transient
+from builders.logger import logger, debugging
 
 
-__all__ = ['Construct', 'Predefined', 'Unique', 'Collection', 'Reused', 'Random', 'Maybe', 'Uplink', 'Uid', 'Key', 'Lambda']
+__all__ = ['Construct', 'Predefined', 'Unique', 'Collection', 'Stream', 'Reused', 'Random', 'Maybe', 'Uplink', 'Uid', 'Key', 'Lambda']
 
 
 class Link(object):
     """
     Connects this :py:class:`Construct` to another. Used mainly with :py:class:`Uplink`.
+
+    ``value`` is transient, i.e. kept in the :py:class:`builders.context.BuildContext` during a build.
     """
     destination = None
-    value = None
+    value = transient('value')
 
     def onBuild(self, *args, **kwargs):
         """
         Called when this object is built. Notifies ``self.destination`` that it now has a value.
         """
         if self.destination and kwargs.get('instance'):
-            logger.debug('Setting value %s for %s' % (kwargs['instance'], self.destination))
+            if debugging():
+                logger.debug('Setting value %s for %s', kwargs['instance'], self.destination)
             if not self.value:
                 self.destination.value = kwargs['instance']
 
@@ -41,10 +55,36 @@ class Link(object):
             pass
 
 
+_iterative = {}
+_stepwise = {}
+
+
+def _defining(clazz, name):
+    for base in inspect.getmro(clazz):
+        if name in vars(base):
+            return base
+    return None
+
+
+def _runs_steps(clazz):
+    try:
+        return _stepwise[clazz]
+    except KeyError:
+        steps = _defining(clazz, 'doSteps')
+        stepwise = _stepwise[clazz] = steps is not None and issubclass(steps, _defining(clazz, 'doBuild'))
+        return stepwise
+
+
 class Construct(Link):
     """
     Base class for build-generated attributes.
     Subclasses should implement `doBuild` method.
+
+    Constructs that build nested models may implement ``doSteps`` returning a generator of build steps instead
+    (see :py:func:`builders.builder.run`), with ``doBuild`` running it, so that deep trees are built without recursion.
+
+    Constructs are shared by all the builds of a model, so attributes changed by modifiers for a particular build
+    should be declared :py:class:`builders.context.transient`.
     """
     def build(self, *args, **kwargs):
         """
@@ -53,44 +93,112 @@ class Construct(Link):
         """
         self.onBuild(**kwargs)
         if self.value:
-            logger.debug('%s returning pre-built value %s' % (self, self.value))
+            if debugging():
+                logger.debug('%s returning pre-built value %s', self, self.value)
             result = self.value
             self.value = None
         else:
             result = self.doBuild(*args, **kwargs)
         return result
 
+    def steps(self, *args, **kwargs):
+        """
+        Counterpart of :py:meth:`build` for :py:attr:`iterative` constructs, returns generator of build steps.
+        """
+        self.onBuild(**kwargs)
+        if self.value:
+            if debugging():
+                logger.debug('%s returning pre-built value %s', self, self.value)
+            result = self.value
+            self.value = None
+            return builder.done(result)
+        return self.doSteps(*args, **kwargs)
+
+    @property
+    def iterative(self):
+        """
+        Tells if the construct builds with ``doSteps``, i.e. it has one and no subclass overrides ``doBuild`` or ``build`` on top of it.
+        """
+        clazz = type(self)
+        try:
+            return _iterative[clazz]
+        except KeyError:
+            iterative = _iterative[clazz] = _runs_steps(clazz) and issubclass(_defining(clazz, 'steps'), _defining(clazz, 'build'))
+            return iterative
+
     def doBuild(self, *args, **kwargs):
         raise NotImplementedError('This is not implemented')
 
+    def __get__(self, instance, owner):
+        """
+        Model attributes not built yet read as the construct itself, unless the build deferred them (see :py:mod:`builders.lazy`).
+        """
+        if instance is None:
+            return self
+        return lazy.resolve(self, instance)
+
+    def __reduce_ex__(self, protocol):
+        """
+        Constructs held by importable model classes are pickled by reference, so that unpickled modifiers
+        still point to the model class attributes (e.g. in :py:mod:`builders.parallel` worker processes).
+        """
+        for clazz, names in plan.owners_of(self).items():
+            module = sys.modules.get(getattr(clazz, '__module__', None))
+            if getattr(module, clazz.__name__, None) is not clazz:
+                continue
+            for name in names:
+                if vars(clazz).get(name) is self:
+                    return getattr, (clazz, name)
+        return object.__reduce_ex__(self, protocol)
+
 
 class Predefined(Construct):
     """
     Builds to a predefined ``value``.
     """
     def __init__(self, value):
-        self.value = value
+        self.predefined = value
 
     def doBuild(self, *args, **kwargs):
-        return self.value
+        return self.predefined
 
 
 class Unique(Construct):
     """
     Builds a new instance of ``type`` with a separate :py:class:`builders.Builder`
     with respect to currently active modifiers.
+
+    :py:class:`Uplink`-s linked to this construct are set to the ``instance`` it is built for right away,
+    see :py:meth:`builders.builder.Builder.steps`.
     """
     def __init__(self, typeToBuild):
         self.type = typeToBuild
 
-    def doBuild(self, modifiers, **kwargs):
-        return builder.Builder(self.type).withA(*modifiers).build()
+    @property
+    def linksDirectly(self):
+        """
+        Tells if the models are built with :py:meth:`doSteps`, so that their uplinks are set directly.
+        Otherwise the owner is passed to the uplinks as their transient value.
+        """
+        return _runs_steps(type(self))
+
+    def onBuild(self, *args, **kwargs):
+        if not self.linksDirectly:
+            Construct.onBuild(self, *args, **kwargs)
+
+    def doBuild(self, *args, **kwargs):
+        return builder.run(self.doSteps(*args, **kwargs))
+
+    def doSteps(self, modifiers, instance=None, link=None, **kwargs):
+        return builder.Builder(self.type).withA(modifiers).steps(link or self, instance)
 
 
 class Lambda(Construct):
     """
     Function, executed during each build with an instance being constructed passed in as parameter
     """
+    alternative_function = transient('alternative_function')
+
     def __init__(self, functionToExecute):
         self.default_function = functionToExecute
         self.alternative_function = None
@@ -109,6 +217,11 @@ class Collection(Unique):
     Builds a ``list`` of new ``typeToBuild`` objects.
     With no modifiers, list will contain ``number`` entries.
     """
+    overrides = transient('overrides')
+    items = transient('items')
+    modifiers = transient('modifiers')
+    workers = transient('workers')
+
     def __init__(self, typeToBuild, number=1):
         Unique.__init__(self, typeToBuild)
         self.number = number
@@ -116,6 +229,7 @@ class Collection(Unique):
         self.items = []
         self.destination = []
         self.modifiers = []
+        self.workers = None
 
     def add(self, something):
         if isinstance(something, (int, long)):
@@ -126,6 +240,9 @@ class Collection(Unique):
     def set(self, amount):
         self.overrides.append(lambda x: amount)
 
+    def parallel(self, workers):
+        self.workers = workers
+
     def build(self, *args, **kwargs):
         result = self.doBuild(*args, **kwargs)
 
@@ -133,9 +250,17 @@ class Collection(Unique):
             self.onBuild(**kwargs)
         return result
 
+    def steps(self, *args, **kwargs):
+        result = yield self.doSteps(*args, **kwargs)
+
+        if result and self.value:
+            self.onBuild(**kwargs)
+        yield builder.Result(result)
+
     def onBuild(self, *args, **kwargs):
         if self.destination and kwargs.get('instance'):
-            logger.debug('Receiving value %s for %s' % (kwargs['instance'], self.destination))
+            if debugging():
+                logger.debug('Receiving value %s for %s', kwargs['instance'], self.destination)
             if not self.value:
                 for destination in self.destination:
                     destination.value = kwargs['instance']
@@ -149,7 +274,7 @@ class Collection(Unique):
         except AttributeError:
             pass
 
-    def doBuild(self, modifiers, **kwargs):
+    def doSteps(self, modifiers, **kwargs):
         total_amount = self.number
         for o in self.overrides:
             total_amount = o(total_amount)
@@ -158,56 +283,166 @@ class Collection(Unique):
         result = list(self.items)
         self.items = []
 
+        workers = self.workers
+        self.workers = None
+
+        debug = debugging()
         if self.destination:
-            logger.debug("Collection %s found destinations %s" % (self, self.destination))
-            saved_value = self.destination[0].value
+            if debug:
+                logger.debug("Collection %s found destinations %s", self, self.destination)
+            owner = self.destination[0].value or kwargs['instance']
         else:
-            saved_value = None
-        while len(result) < total_amount:
-            logger.debug("Collection %s building item of type %s" % (self, self.type))
-            logger.debug("Collection destination is %s, %s" % (self.destination, modifiers_package.classvars(self.destination)))
-            if saved_value:
-                self.destination[0].value = saved_value
-            if not saved_value and self.destination:
-                self.destination[0].value = kwargs['instance']
+            owner = None
+
+        items_modifiers = []
+        while len(result) + len(items_modifiers) < total_amount:
             extra_modifiers = self.modifiers and self.modifiers.pop()
-            item = Unique.doBuild(self, modifiers + extra_modifiers)
-            result.append(item)
+            items_modifiers.append(modifiers + extra_modifiers)
 
-        return result
+        tree = rng.tree()
+        sources = [tree.child(index) for index in xrange(len(result), total_amount)] if tree is not None else None
+
+        if workers and len(items_modifiers) > 1 and not parallel.in_worker():
+            result.extend(parallel.build_items(self, owner, items_modifiers, workers, sources))
+        else:
+            build_context = context.current()
+            for index, item_modifiers in enumerate(items_modifiers):
+                if debug:
+                    logger.debug("Collection %s building item of type %s", self, self.type)
+                    logger.debug("Collection destination is %s, %s", self.destination, modifiers_package.classvars(self.destination))
+                if sources is not None:
+                    build_context.random = sources[index]
+                result.append((yield Unique.doSteps(self, item_modifiers, owner)))
+            if tree is not None:
+                build_context.random = tree
+
+        yield builder.Result(result)
+
+    def buildItem(self, owner, modifiers):
+        """
+        Builds a single collection item, with ``owner`` as a value for the :py:class:`Uplink` pointing to this collection.
+        """
+        return builder.run(Unique.doSteps(self, modifiers, owner))
+
+
+class Stream(Collection):
+    """
+    Like :py:class:`Collection`, but builds to a generator of ``typeToBuild`` objects instead of a ``list``,
+    so that lots of items can be consumed in bounded memory.
+
+    Modifiers are honoured the same way (e.g. :py:class:`builders.modifiers.NumberOf`, :py:class:`builders.modifiers.OneOf`,
+    :py:class:`builders.modifiers.HavingIn` and :py:class:`Uplink`-s to the stream owner), but new items are only built
+    when consumed. Each one is built within a new :py:class:`builders.context.BuildContext` sharing keys, reuse cache
+    and profiler with the original build.
+
+    The generator can be consumed once, it is not picklable and :py:class:`builders.modifiers.InParallel` is ignored.
+    """
+    def doBuild(self, modifiers, **kwargs):
+        total_amount = self.number
+        for o in self.overrides:
+            total_amount = o(total_amount)
+        self.overrides = []
+
+        prebuilt = list(self.items)
+        self.items = []
+        extra_modifiers = list(self.modifiers)
+        self.modifiers = []
+        self.workers = None
+
+        owner = (self.destination[0].value or kwargs['instance']) if self.destination else None
+        build_context = (context.current() or context.BuildContext()).derive()
+
+        return self.produce(prebuilt, max(total_amount - len(prebuilt), 0), modifiers, extra_modifiers, owner, build_context, rng.tree())
+
+    def produce(self, prebuilt, amount, modifiers, extra_modifiers, owner, build_context, tree=None):
+        """
+        Generator yielding ``prebuilt`` items and ``amount`` new ones.
+        """
+        for item in prebuilt:
+            yield item
+
+        for index in xrange(len(prebuilt), len(prebuilt) + amount):
+            extra = extra_modifiers and extra_modifiers.pop()
+            item_context = build_context.derive()
+            if tree is not None:
+                item_context.random = tree.child(index)
+            with context.within(item_context):
+                item = self.buildItem(owner, modifiers + extra)
+            yield item
+
+
+reused_cache = ReuseCache()
 
 
 class Reused(Unique):
     """
     Like :py:class:`Unique`, but with caching.
 
-    Stores all the built instances within a dictionary. If the would-be-new-instance has key equal to some of the objects in cache, cached object is returned.
+    Stores all the built instances within a cache. If the would-be-new-instance has key equal to some of the objects in cache, cached object is returned.
 
     Key is a tuple of ``typeToBuild`` and selected attribute values.
 
     :param local: keep cache in the `Reused` instance. If false, cache is global (eww).
     :param keys: list of attributes that are considered key components along with the `typeToBuild`.
+    :param cache: :py:class:`builders.cache.ReuseCache` to keep instances in, overrides ``local``.
+    :param keys_first: resolve key components from the modifiers before building, so cache hits do not build anything.
+      Falls back to building a candidate when a key component can not be resolved, see :py:func:`builders.modifiers.resolve_attribute`.
 
+    Global cache is ``reused_cache`` unless the builder has its own one, see :py:meth:`builders.builder.Builder.withReuseCache`.
     """
-    __reused_instances = {}
+    __reused_instances = reused_cache
 
-    def __init__(self, typeToBuild, local=False, keys=[]):
+    def __init__(self, typeToBuild, local=False, keys=[], cache=None, keys_first=False):
         Unique.__init__(self, typeToBuild)
         self.key_components = keys
+        self.keys_first = keys_first
+        self.scoped = cache is None and not local
 
-        if local:
-            self.instances = {}
+        if cache is not None:
+            self.instances = cache
+        elif local:
+            self.instances = ReuseCache()
         else:
             self.instances = Reused.__reused_instances
 
-    def doBuild(self, modifiers, **kwargs):
-        candidate = Unique.doBuild(self, modifiers)
+    def cacheInUse(self):
+        """
+        Returns the cache for the current build.
+        """
+        if self.scoped:
+            scoped = getattr(context.current(), 'reused', None)
+            if scoped is not None:
+                return scoped
+        return self.instances
+
+    def resolveKey(self, modifiers):
+        """
+        Returns the key of an instance that would be built with ``modifiers`` or ``None`` if it can not be told without building.
+        """
+        key = [self.type]
+        for component in self.key_components:
+            known, value = modifiers_package.resolve_attribute(self.type, component, modifiers)
+            if not known:
+                return None
+            key.append(value)
+        return tuple(key)
+
+    def doSteps(self, modifiers, **kwargs):
+        if self.keys_first:
+            key = self.resolveKey(modifiers)
+            if key is not None:
+                cache = self.cacheInUse()
+                cached = cache.get(key)
+                if cached is None:
+                    cached = cache.put(key, (yield Unique.doSteps(self, modifiers, **kwargs)))
+                yield builder.Result(cached)
+                return
+
+        candidate = yield Unique.doSteps(self, modifiers, **kwargs)
 
         key = tuple([self.type] + [getattr(candidate, k) for k in self.key_components])
 
-        if not self.instances.get(key):
-            self.instances[key] = candidate
-        return self.instances[key]
+        yield builder.Result(self.cacheInUse().add(key, candidate))
 
 
 class Maybe(Construct):
@@ -216,6 +451,7 @@ class Maybe(Construct):
 
     See :py:class:`builders.modifiers.Enabled` to turn it on.
     """
+    enabled = transient('enabled')
 
     def __init__(self, construct, enabled=False):
         assert isinstance(construct, Unique)
@@ -224,12 +460,31 @@ class Maybe(Construct):
         self.enabled = enabled
         self.default = enabled
 
+    @property
+    def linksDirectly(self):
+        """
+        Like :py:attr:`Unique.linksDirectly`, for the nested ``construct``.
+        """
+        return _runs_steps(type(self)) and self.construct.iterative
+
+    def onBuild(self, *args, **kwargs):
+        if not self.linksDirectly:
+            Construct.onBuild(self, *args, **kwargs)
+
     def doBuild(self, *args, **kwargs):
+        return builder.run(self.doSteps(*args, **kwargs))
+
+    def doSteps(self, *args, **kwargs):
+        result = None
         try:
             if self.enabled:
-                return self.construct.doBuild(*args, **kwargs)
+                if self.construct.iterative:
+                    result = yield self.construct.doSteps(*args, link=self, **kwargs)
+                else:
+                    result = self.construct.doBuild(*args, **kwargs)
         finally:
             self.enabled = self.default
+        yield builder.Result(result)
 
 
 class Uplink(Construct):
@@ -238,39 +493,48 @@ class Uplink(Construct):
 
     Call ``linksTo`` on ``Uplink`` object to set destination.
 
-    Supplying ``reusing_by`` emulates :py:attr:`Reused` behavior with given ``keys``.
+    Models built by the destination construct get their owner as the uplink value directly. An uplink built on its own
+    (i.e. for a model built from the bottom) builds a new owner holding the model, see :py:func:`builders.plan.link`.
+
+    Supplying ``reusing_by`` emulates :py:attr:`Reused` behavior with given ``keys``, instances are kept in a local ``cache``.
 
     .. warning::
       ``reusing_by`` is not fully operational at the moment, use at your own risk.
       See ``test_uplink.test_reuse`` -- there are commented checks.
     """
 
-    def __init__(self, reusing_by=[]):
+    def __init__(self, reusing_by=[], cache=None):
         if reusing_by:
-            self.reuser = Reused(None, local=True, keys=reusing_by)
+            self.reuser = Reused(None, local=True, keys=reusing_by, cache=cache)
         else:
             self.reuser = None
 
-    def doBuild(self, modifiers, instance=None, **kwargs):
+    def doBuild(self, *args, **kwargs):
+        return builder.run(self.doSteps(*args, **kwargs))
+
+    def doSteps(self, modifiers, instance=None, **kwargs):
         if not self.destination:
             raise ValueError('Link %s has no attachment' % self)
 
-        logger.debug('Up-linking instance for %s with Given %s value of %s' %
-                     (self.clazz, self.destination, instance))
+        if debugging():
+            logger.debug('Up-linking instance for %s with Given %s value of %s',
+                         self.clazz, self.destination, instance)
 
-        mods = [modifiers]
+        if self.reuser:
+            return self.reuser.doSteps(modifiers, **dict(instance=instance, **kwargs))
 
+        # the destination gives ``instance`` back when the owner is built, see ``onBuild``
         if isinstance(self.destination, Collection):
-            mods.append(modifiers_package.HavingIn(self.destination, instance))
-        else:
-            mods.append(modifiers_package.Given(self.destination, instance))
-
-        if self.reuser:
-            return self.reuser.doBuild(modifiers, **dict(instance=instance, **kwargs))
-        else:
-            return builder.Builder(self.clazz).withA(*mods).build()
+            self.destination.add(instance)
+        return builder.Builder(self.clazz).withA(modifiers).steps()
 
     def linksTo(self, clazz, destination):
+        """
+        Links this uplink to ``destination`` construct of ``clazz``, see :py:func:`builders.plan.link`.
+
+        :raises ValueError: if the link is invalid.
+        """
+        plan.link(self, clazz, destination)
         if self.reuser:
             self.reuser.type = clazz
         self.setDestination(clazz, destination)
@@ -284,6 +548,8 @@ class Random(Construct):
 
     A construct that results in a random integer or random string.
     If ``pattern`` is present, it is formatted with the random value.
+
+    Values are drawn from the random source of the build, see :py:mod:`builders.rng`.
     """
     def __init__(self, start=1, end=100500, pattern=None):
         self.start = start
@@ -291,22 +557,157 @@ class Random(Construct):
         self.pattern = pattern
 
     def doBuild(self, *args, **kwargs):
-        value = random.randint(self.start, self.end)
+        build_context = context.current()
+        if build_context is None or build_context.random is None:
+            value = random.randint(self.start, self.end)
+        else:
+            value = build_context.random.randint(self.start, self.end)
         if self.pattern:
             return self.pattern % value
         else:
             return value
 
 
+def _uid_string(value):
+    digits = '%032x' % value
+    return '%s-%s-%s-%s-%s' % (digits[:8], digits[8:12], digits[12:16], digits[16:20], digits[20:])
+
+
+_uid_forms = {
+    'str': _uid_string,
+    'hex': lambda value: '%032x' % value,
+    'int': lambda value: value,
+    'bytes': lambda value: binascii.unhexlify('%032x' % value),
+    'uuid': lambda value: uuid.UUID(int=value),
+}
+
+
 class Uid(Construct):
     """
-    Builds to a string with a fresh :py:func:`uuid.uuid4`
+    :arg form: ``'str'`` (like ``str(uuid.uuid4())``), ``'hex'``, ``'int'``, ``'bytes'`` or ``'uuid'`` for :py:class:`uuid.UUID` objects
+    :arg ordered: build time-ordered (version 7) UUIDs instead of random (version 4) ones
+
+    Builds to a fresh random UUID. Random bits come from the random source of the build if it has one,
+    from :py:data:`builders.rng.entropy` otherwise, see :py:mod:`builders.rng`.
+
+    Ordered UUIDs start with the build time, so they keep database indexes append-only, but are not reproducible.
     """
+    def __init__(self, form='str', ordered=False):
+        if form not in _uid_forms:
+            raise ValueError('Unknown UUID form %r, should be one of %s' % (form, ', '.join(sorted(_uid_forms))))
+        self.form = form
+        self.ordered = ordered
+
     def doBuild(self, *args, **kwargs):
-        return str(uuid.uuid4())
+        source = getattr(context.current(), 'random', None) or rng.entropy
+        value = rng.uuid7(source) if self.ordered else rng.uuid4(source)
+        return _uid_forms[self.form](value)
 
 
-key_storage = {}
+class RangeShuffle(object):
+    """
+    Iterates over integers from ``start`` to ``end`` (inclusive) in a random order, yielding each of them once.
+
+    That is a lazy Fisher-Yates shuffle: every step takes constant time and memory is proportional
+    to the amount of values drawn rather than to the range size. Steps are thread-safe.
+    """
+    def __init__(self, start, end):
+        self.start = start
+        self.size = end - start + 1
+        self.drawn = 0
+        self.swaps = {}
+        self.lock = threading.Lock()
+
+    def __iter__(self):
+        return self
+
+    def __len__(self):
+        return self.size - self.drawn
+
+    def next(self):
+        with self.lock:
+            if self.drawn >= self.size:
+                raise StopIteration
+            i = self.drawn
+            j = i + rng.current().below(self.size - i)
+            value = self.swaps.get(j, j)
+            head = self.swaps.pop(i, i)
+            if j != i:
+                self.swaps[j] = head
+            self.drawn += 1
+            return self.start + value
+
+
+class KeyStorage(object):
+    """
+    Values issued by :py:class:`Key` constructs, per model class.
+
+    Module-level ``key_storage`` is shared by all the builds, i.e. lives for the whole session.
+    :py:meth:`clear` it to start over (e.g. for each test) or give a builder its own storage
+    with :py:meth:`builders.builder.Builder.withKeyStorage`.
+
+    ``partition`` is ``(index, count)`` to draw :py:class:`Random` keys from the ``index``-th of ``count`` equal parts
+    of their ranges only, so that processes with different indexes never issue the same keys
+    (see :py:mod:`builders.pytest_plugin`). It is set for all the storages at once, ranges smaller than ``count`` are not split.
+    """
+    partition = None
+
+    def __init__(self):
+        self.issued = {}
+        self.shuffles = {}
+        self.lock = threading.Lock()
+
+    def clear(self, clazz=None):
+        """
+        Forgets values issued for ``clazz`` or for all the classes if no ``clazz`` given.
+        """
+        with self.lock:
+            if clazz is None:
+                self.issued.clear()
+                self.shuffles.clear()
+            else:
+                self.issued.pop(clazz, None)
+                for key in [key for key in self.shuffles if key[0] is clazz]:
+                    del self.shuffles[key]
+
+    def bounds(self, start, end):
+        """
+        Returns ``(start, end)`` of the part of the range to draw keys from, see ``partition``.
+        """
+        if self.partition is None:
+            return start, end
+        index, count = self.partition
+        size = end - start + 1
+        if size < count:
+            return start, end
+        return start + size * index // count, start + size * (index + 1) // count - 1
+
+    def shuffle(self, clazz, start, end, pattern=None):
+        """
+        Returns :py:class:`RangeShuffle` of ``start`` to ``end`` integers (their part, see ``partition``) for keys of ``clazz``
+        formatted with ``pattern``.
+        """
+        key = (clazz, start, end, pattern)
+        return self.shuffles.get(key) or self.shuffles.setdefault(key, RangeShuffle(*self.bounds(start, end)))
+
+    def issue(self, clazz, candidates):
+        """
+        Returns the first of ``candidates`` not issued for ``clazz`` yet and records it as issued.
+
+        Candidates are drawn without holding ``lock``, so they may build models with keys of their own.
+
+        :raises Exception: if ``candidates`` are exhausted.
+        """
+        for value in candidates:
+            with self.lock:
+                issued = self.issued.setdefault(clazz, set())
+                if value not in issued:
+                    issued.add(value)
+                    return value
+        raise Exception("Can't get unique key value! All the possible values are used.")
+
+
+key_storage = KeyStorage()
 
 
 class Key(Construct):
@@ -319,8 +720,17 @@ class Key(Construct):
 
       class MyFoo:
         id = Key(Random())
+
+    Plain :py:class:`Random` values are drawn from a :py:class:`RangeShuffle` of its range, so they never collide
+    and the only limit is the range size.
+
+    Values are stored in :py:class:`KeyStorage` of the builder, ``key_storage`` by default.
+
+    In a seeded build (see :py:meth:`builders.builder.Builder.build`) the first candidate is drawn from the position
+    of the key in the tree, so the key does not depend on the keys built before it unless they collide.
     """
     def __init__(self, value_construct):
+        self.value_construct = value_construct
 
         def value_generator(*args, **kwargs):
             MAX_ATTEMPTS = 1000
@@ -331,9 +741,20 @@ class Key(Construct):
 
     def doBuild(self, *args, **kwargs):
         cls = kwargs['instance'].__class__
-        if cls not in key_storage.keys():
-            key_storage[cls] = []
+        build_context = context.current()
+        storage = getattr(build_context, 'keys', None)
+        if storage is None:
+            storage = key_storage
+
+        values = self.value_construct
+        if type(values) is Random:
+            candidates = storage.shuffle(cls, values.start, values.end, values.pattern)
+            source = getattr(build_context, 'random', None)
+            if type(source) is rng.TreeSource:
+                candidates = itertools.chain([source.randint(*storage.bounds(values.start, values.end))], candidates)
+            if values.pattern:
+                candidates = (values.pattern % value for value in candidates)
+        else:
+            candidates = self.value_generator(*args, **kwargs)
 
-        value = next(itertools.dropwhile(lambda x: x in key_storage[cls], self.value_generator(*args, **kwargs)))
-        key_storage[cls].append(value)
-        return value
+        return storage.issue(cls, candidates)
@@ -0,0 +1,134 @@
+'''
+Per-build state of constructs.
+
+Constructs are class attributes shared by all the builds of a model, so the values modifiers set on them
+for one particular build (:py:class:`builders.modifiers.Given` values, :py:class:`builders.construct.Collection`
+sizes and so on) are kept in a :py:class:`BuildContext` of the current thread instead.
+Thus concurrent builds of the same model do not interfere.
+'''
+
+import threading
+
+from contextlib import contextmanager
+
+from builders import profiler
+
+
+_local = threading.local()
+
+
+class BuildContext(object):
+    """
+    Holds transient construct attributes for a single top-level build.
+
+    ``keys`` is a :py:class:`builders.construct.KeyStorage` and ``reused`` is a :py:class:`builders.cache.ReuseCache`
+    to use instead of the global ones, if any. ``profiler`` is a :py:class:`builders.profiler.BuildProfiler` to report to,
+    the one active in this thread by default. ``random`` is a :py:class:`builders.rng.RandomSource` to draw from, if any.
+    ``lazy`` is a :py:class:`builders.lazy.Laziness` telling which constructs to defer, if any.
+    """
+    def __init__(self):
+        self.state = {}
+        self.keys = None
+        self.reused = None
+        self.profiler = profiler.active()
+        self.random = None
+        self.lazy = None
+
+    def derive(self):
+        """
+        Returns new empty :py:class:`BuildContext` sharing ``keys``, ``reused``, ``profiler``, ``random`` and ``lazy`` with this one.
+        """
+        derived = BuildContext()
+        derived.keys = self.keys
+        derived.reused = self.reused
+        derived.profiler = self.profiler
+        derived.random = self.random
+        derived.lazy = self.lazy
+        return derived
+
+    def valuesOf(self, construct):
+        """
+        Returns ``dict`` of transient attributes of ``construct`` within this build.
+        """
+        try:
+            return self.state[construct]
+        except KeyError:
+            return self.state.setdefault(construct, {})
+
+
+def current():
+    """
+    Returns :py:class:`BuildContext` of the build running in this thread or ``None``.
+    """
+    return getattr(_local, 'context', None)
+
+
+def reset():
+    """
+    Forgets the context bound to this thread, e.g. the one inherited by a forked process.
+    """
+    _local.context = None
+
+
+@contextmanager
+def building():
+    """
+    Context manager that runs a build within the current :py:class:`BuildContext`, starting a new one if there is none.
+    """
+    context = current()
+    if context is not None:
+        yield context
+        return
+
+    _local.context = context = BuildContext()
+    try:
+        yield context
+    finally:
+        _local.context = None
+
+
+@contextmanager
+def within(build_context):
+    """
+    Context manager that binds ``build_context`` to this thread, restoring the previous one on exit.
+    """
+    previous = current()
+    _local.context = build_context
+    try:
+        yield build_context
+    finally:
+        _local.context = previous
+
+
+class transient(object):
+    """
+    Construct attribute that is kept in the current :py:class:`BuildContext`.
+
+    Out of a build it works as a plain attribute and provides the initial value for the builds.
+    ``list`` initial values are copied into the context on the first access.
+    """
+    def __init__(self, name, default=None):
+        self.name = name
+        self.default = default
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+
+        context = current()
+        if context is not None:
+            values = context.valuesOf(instance)
+            if self.name in values:
+                return values[self.name]
+
+        initial = instance.__dict__.get(self.name, self.default)
+        if context is not None and isinstance(initial, list):
+            initial = values[self.name] = list(initial)
+        return initial
+
+    def __set__(self, instance, value):
+        context = current()
+        if context is None:
+            instance.__dict__[self.name] = value
+        else:
+            context.valuesOf(instance)[self.name] = value
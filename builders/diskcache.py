@@ -0,0 +1,225 @@
+'''
+On-disk cache of built trees, so that expensive fixtures are not rebuilt on every run.
+
+See :py:meth:`builders.builder.Builder.withDiskCache`. A tree is stored with :py:mod:`pickle` under a key that is
+a fingerprint of
+
+* the source code and construct definitions of the model class and every model class reachable from it,
+* the pickled modifiers of the builder (so they should be picklable, i.e. free of lambdas) and the code
+  of the functions they call (e.g. ``InstanceModifier(...).thatDoes(...)`` actions), see :py:func:`describe`,
+* the seed of the builder random source, if any, and the version of ``builders``.
+
+Changing any of them makes a new key, so stale trees are never loaded. They are not removed either,
+:py:meth:`DiskCache.clear` the cache for that.
+
+Keys of a loaded tree are recorded in the key storage of the builder, so that trees built afterwards do not repeat them.
+Deferred attributes (see :py:mod:`builders.lazy`) of a tree are built before it is stored.
+'''
+
+import cPickle as pickle
+import errno
+import glob
+import hashlib
+import inspect
+import os
+import tempfile
+import types
+
+import construct
+import lazy
+import modifiers as modifiers_package
+import plan
+from builders.info import __version__
+from builders.logger import logger
+
+
+_scalars = (basestring, int, long, float, bool, type(None))
+
+
+def _name(clazz):
+    return '%s.%s' % (clazz.__module__, clazz.__name__)
+
+
+def _source(clazz):
+    try:
+        return inspect.getsource(clazz)
+    except (IOError, TypeError):
+        return ''
+
+
+def describe(value, seen=None):
+    """
+    Returns a string describing ``value`` definition: constructs and modifiers with their attributes, functions
+    with their code, closures and the globals they refer to.
+
+    Unlike ``repr`` it does not depend on object addresses, so it is the same for the same definitions in every run.
+    """
+    seen = set() if seen is None else seen
+    if isinstance(value, _scalars):
+        return repr(value)
+    if inspect.isclass(value):
+        return _name(value)
+    if isinstance(value, (list, tuple)):
+        return '[%s]' % ', '.join(describe(item, seen) for item in value)
+    if isinstance(value, dict):
+        return '{%s}' % ', '.join(sorted('%s: %s' % (describe(k, seen), describe(v, seen)) for k, v in value.items()))
+    if isinstance(value, types.MethodType):
+        return describe(value.im_func, seen)
+    if isinstance(value, types.CodeType):
+        return 'code %s %s' % (value.co_code.encode('hex'), describe(list(value.co_consts), seen))
+    if isinstance(value, types.FunctionType):
+        if id(value) in seen:
+            return value.__name__
+        seen.add(id(value))
+        closure = [_contents(cell) for cell in value.func_closure or ()]
+        refers = ['%s=%s' % (name, describe(value.func_globals[name], seen))
+                  for name in sorted(_names(value.func_code)) if name in value.func_globals]
+        return 'function(%s, %s, %s)' % (describe(value.func_code, seen), describe(closure, seen), ', '.join(refers))
+    if isinstance(value, (construct.Construct, modifiers_package.Modifier)) or callable(value) and hasattr(value, '__dict__'):
+        if id(value) in seen:
+            return value.__class__.__name__
+        seen.add(id(value))
+        attributes = ['%s=%s' % (name, describe(attribute, seen)) for name, attribute in sorted(vars(value).items())]
+        return '%s(%s)' % (value.__class__.__name__, ', '.join(attributes))
+    return type(value).__name__
+
+
+def _contents(cell):
+    try:
+        return cell.cell_contents
+    except ValueError:
+        return None
+
+
+def _names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            names.update(_names(const))
+    return names
+
+
+def fingerprint(builder):
+    """
+    Returns the cache key of the tree ``builder`` builds or ``None`` if its modifiers can not be pickled.
+
+    Plans are compiled first, so that the modifiers pickle constructs by reference rather than by value.
+    """
+    digest = hashlib.sha256(__version__)
+    classes = plan.compile_graph(builder.clazz)
+    try:
+        digest.update(pickle.dumps(builder.modifiers, pickle.HIGHEST_PROTOCOL))
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        logger.warning('Not caching %s, its modifiers can not be pickled: %s', builder.clazz, e)
+        return None
+    digest.update(describe(builder.modifiers.items()))
+    digest.update(repr(getattr(builder.randomSource, 'seed', None)))
+
+    for clazz in sorted(classes, key=_name):
+        digest.update(_name(clazz))
+        for base in inspect.getmro(clazz):
+            if base is not object:
+                digest.update(_source(base))
+        for name, value in sorted(plan.get_plan(clazz).members.items()):
+            digest.update('%s=%s' % (name, describe(value)))
+    return digest.hexdigest()
+
+
+def record_keys(tree, storage):
+    """
+    Records :py:class:`builders.construct.Key` values of all the instances in ``tree`` as issued in ``storage``.
+    """
+    seen = set()
+    pending = [tree]
+    with storage.lock:
+        while pending:
+            node = pending.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            if isinstance(node, (list, tuple)):
+                pending.extend(node)
+            elif plan.is_model(node):
+                members = plan.get_plan(node.__class__).members
+                for name, value in members.items():
+                    if isinstance(value, construct.Key) and name in node.__dict__:
+                        storage.issued.setdefault(node.__class__, set()).add(node.__dict__[name])
+                pending.extend(node.__dict__.values())
+
+
+class DiskCache(object):
+    """
+    :arg directory: where to keep the trees, ``BUILDERS_CACHE`` environment variable or ``.builders_cache`` by default
+
+    Counts ``hits`` and ``misses``.
+    """
+    def __init__(self, directory=None):
+        self.directory = directory or os.environ.get('BUILDERS_CACHE') or '.builders_cache'
+        self.hits = 0
+        self.misses = 0
+
+    def pathOf(self, key):
+        return os.path.join(self.directory, '%s.pickle' % key)
+
+    def load(self, key):
+        """
+        Returns the tree stored for ``key`` or ``None`` if there is no such (or it can not be loaded).
+        """
+        try:
+            with open(self.pathOf(key), 'rb') as stored:
+                return pickle.load(stored)
+        except IOError as e:
+            if e.errno != errno.ENOENT:
+                logger.warning('Can not read cached tree %s: %s', key, e)
+        except Exception as e:
+            logger.warning('Can not load cached tree %s: %s', key, e)
+        return None
+
+    def store(self, key, tree):
+        """
+        Stores ``tree`` for ``key``. The file is replaced at once, so concurrent runs never see a partial one.
+        """
+        try:
+            os.makedirs(self.directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        handle, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as stored:
+                pickle.dump(tree, stored, pickle.HIGHEST_PROTOCOL)
+            os.rename(temporary, self.pathOf(key))
+        except Exception:
+            os.remove(temporary)
+            raise
+
+    def build(self, builder):
+        """
+        Returns the tree of ``builder`` loaded from the disk, building and storing it on a miss.
+        """
+        key = fingerprint(builder)
+        if key is None:
+            return builder._prepared().build()
+
+        tree = self.load(key)
+        if tree is not None:
+            self.hits += 1
+            record_keys(tree, builder.keyStorage if builder.keyStorage is not None else construct.key_storage)
+            return tree
+
+        self.misses += 1
+        tree = builder._prepared().build()
+        if builder.lazy is not None:
+            lazy.materialize(tree)
+        try:
+            self.store(key, tree)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.warning('Not caching %s, the tree can not be pickled: %s', builder.clazz, e)
+        return tree
+
+    def clear(self):
+        """
+        Removes all the stored trees.
+        """
+        for path in glob.glob(os.path.join(self.directory, '*.pickle')):
+            os.remove(path)
@@ -0,0 +1,175 @@
+'''
+Constructs built on the first read of their attribute rather than along with the model.
+
+See :py:meth:`builders.builder.Builder.withLazy`. Fixtures that build a large tree, but touch a couple of its branches only,
+skip building (and keeping) the rest of it::
+
+  player = Builder(Player).withLazy().withA(NumberOf(Player.squads, 100)).build()
+  player.name        # built already
+  player.squads[0]   # squads are built right now
+
+A deferred attribute keeps the modifiers of the build, its :py:class:`builders.context.BuildContext` settings (keys,
+reuse cache, profiler and random source -- its position in a seeded tree included) and the transient construct
+attributes set by the modifiers. So it builds to what it would have built along with the model, except for
+the values drawn from sequential random sources and the global :py:mod:`random`, which depend on the order of builds.
+
+Until read, deferred attributes are missing in the instance ``__dict__``, so :py:func:`materialize` the tree before
+pickling or copying it. Setting the attribute (e.g. with ``InstanceModifier(...).thatSets(...)``) skips the build.
+'''
+
+import threading
+import weakref
+
+import builder
+import construct
+import plan
+from builders import context
+
+
+_pending = {}
+_lock = threading.RLock()
+
+
+class Deferred(object):
+    """
+    Build of ``construct`` into ``name`` attribute of a ``clazz`` instance, postponed till the attribute is read.
+
+    Takes the transient attributes of ``construct`` out of ``build_context``, so that the rest of the build
+    sees them as if the construct was built already.
+
+    ``lock`` is held while it is built, ``building`` tells if it is being built.
+    """
+    def __init__(self, clazz, name, construct, modifiers, build_context):
+        self.clazz = clazz
+        self.name = name
+        self.construct = construct
+        self.modifiers = modifiers
+        self.lock = threading.RLock()
+        self.building = False
+        self.context = build_context.derive()
+        values = build_context.state.pop(construct, None)
+        if values:
+            self.context.state[construct] = values
+
+    def build(self, instance):
+        """
+        Returns the attribute value for ``instance`` built within the postponed context.
+        """
+        with context.within(self.context) as build_context:
+            if build_context.profiler is not None:
+                return build_context.profiler.construct(self.clazz, self.name, self.construct, self.modifiers, instance=instance)
+            if self.construct.iterative:
+                return builder.run(self.construct.steps(self.modifiers, instance=instance))
+            return self.construct.build(self.modifiers, instance=instance)
+
+
+class Laziness(object):
+    """
+    :arg constructs: constructs to defer, all the model building ones (:py:class:`builders.construct.Unique` and
+      its subclasses, :py:class:`builders.construct.Maybe`) if none given
+
+    Tells which constructs of a build to defer, see :py:meth:`builders.builder.Builder.withLazy`.
+    """
+    def __init__(self, constructs=()):
+        self.constructs = frozenset(constructs)
+
+    def covers(self, value):
+        """
+        Tells if ``value`` construct should be deferred.
+        """
+        if self.constructs:
+            return value in self.constructs
+        return isinstance(value, (construct.Unique, construct.Maybe))
+
+    def defer(self, instance, name, value, build_plan, modifiers, build_context):
+        """
+        Defers ``value`` construct of ``instance`` if it should and can be, returns ``False`` if it has to be built now.
+
+        Constructs set by the model ``__init__``, held in several attributes or given prebuilt values
+        (with :py:class:`builders.modifiers.Given`, :py:class:`builders.modifiers.HavingIn` or an :py:class:`builders.construct.Uplink`)
+        are built right away, as are the attributes of instances that can not be referenced weakly.
+        """
+        if not self.covers(value) or build_plan.members.get(name) is not value or len(build_plan.byConstruct[value]) > 1:
+            return False
+        if value.value or isinstance(value, construct.Collection) and value.items:
+            return False
+
+        with _lock:
+            key = id(instance)
+            entry = _pending.get(key)
+            if entry is None:
+                try:
+                    reference = weakref.ref(instance, lambda _: _pending.pop(key, None))
+                except TypeError:
+                    return False
+                entry = _pending[key] = (reference, {})
+            entry[1][value] = Deferred(instance.__class__, name, value, modifiers, build_context)
+        return True
+
+
+def resolve(value, instance):
+    """
+    Returns ``value`` construct attribute of ``instance``, building it if it is deferred and ``value`` itself otherwise.
+
+    Reads of an attribute that is being built at the moment (e.g. from its own :py:class:`builders.construct.Lambda`-s)
+    get the construct, just like they do while the model is built. Reads from other threads wait for it to be built,
+    and it stays deferred if its build fails.
+    """
+    if not _pending:
+        return value
+    with _lock:
+        entry = _pending.get(id(instance))
+        deferred = entry[1].get(value) if entry is not None else None
+    if deferred is None:
+        return _built(value, instance)
+
+    with deferred.lock:
+        if deferred.building:
+            return value
+        with _lock:
+            if entry[1].get(value) is not deferred:
+                return _built(value, instance)
+        deferred.building = True
+        try:
+            result = deferred.build(instance)
+        finally:
+            deferred.building = False
+        setattr(instance, deferred.name, result)
+        with _lock:
+            del entry[1][value]
+            if not entry[1] and _pending.get(id(instance)) is entry:
+                del _pending[id(instance)]
+        return result
+
+
+def _built(value, instance):
+    names = plan.attributes_of(value, instance.__class__)
+    return instance.__dict__.get(names[0], value) if names else value
+
+
+def pending(instance):
+    """
+    Returns sorted names of the deferred attributes of ``instance`` that were not read yet.
+    """
+    entry = _pending.get(id(instance))
+    return sorted(deferred.name for deferred in entry[1].values()) if entry is not None else []
+
+
+def materialize(tree):
+    """
+    Builds all the deferred attributes of the models in ``tree``, including the models they build. Returns ``tree``.
+    """
+    seen = set()
+    nodes = [tree]
+    while nodes:
+        node = nodes.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if isinstance(node, (list, tuple)):
+            nodes.extend(node)
+        elif plan.is_model(node):
+            for name in pending(node):
+                getattr(node, name)
+            nodes.extend(node.__dict__.values())
+    return tree
@@ -15,3 +15,14 @@ handler = logging.StreamHandler()
 handler.setLevel(logging.WARN)
 
 logger.addHandler(handler)
+
+
+def debugging():
+    """
+    Tells whether ``builders`` debug messages are emitted at all.
+
+    Build hot paths check this once and skip composing debug messages altogether, so disabled debug logging costs nothing.
+    """
+    if logger.manager.disable >= logging.DEBUG:
+        return False
+    return (logger.level or logger.getEffectiveLevel()) <= logging.DEBUG
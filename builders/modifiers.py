@@ -1,8 +1,13 @@
+import abc
+import inspect
+
+import builder
 import construct
-from builders.logger import logger
+from builders.logger import logger, debugging
+import plan
 
 
-__all__ = ['Modifier', 'InstanceModifier', 'ValuesMixin', 'ClazzModifier', 'ConstructModifier', 'Given', 'NumberOf', 'HavingIn', 'OneOf', 'Enabled', 'Disabled', 'LambdaModifier', 'Another']
+__all__ = ['Modifier', 'InstanceModifier', 'ValuesMixin', 'ClazzModifier', 'ConstructModifier', 'Given', 'NumberOf', 'HavingIn', 'OneOf', 'Enabled', 'Disabled', 'LambdaModifier', 'Another', 'InParallel', 'ModifierIndex', 'ModifierChain']
 
 
 class Modifier(object):
@@ -121,19 +126,25 @@ class ConstructModifier(ClazzModifier):
     Base class for :py:class:`ClazzModifier` that work on a particular ``construct`` object within a class
 
     Siblings should implement ``doApply`` method.
+
+    Classes holding the ``construct`` are found via :py:func:`builders.plan.attributes_of` index
+    rather than by scanning the class attributes.
     """
 
     def __init__(self, construct):
         self.construct = construct
 
+    def shouldRun(self, clazz=None, **kwargs):
+        return bool(clazz) and bool(plan.attributes_of(self.construct, clazz))
+
     def do(self, clazz):
-        logger.debug('%s applied to %s' % (self, clazz))
-        for name, value in classvars(clazz).items():
-            logger.debug('Checking %s attr <%s> of value %s' %
-                         (clazz, name, value))
-            if value == self.construct:
-                logger.debug('Applying %s to the clazz %s attr <%s> with value %s' % (self, clazz, name, self.value))
-                self.doApply(value)
+        debug = debugging()
+        if debug:
+            logger.debug('%s applied to %s', self, clazz)
+        for name in plan.attributes_of(self.construct, clazz):
+            if debug:
+                logger.debug('Applying %s to the clazz %s attr <%s> with value %s', self, clazz, name, self.value)
+            self.doApply(self.construct)
 
 
 class Given(ConstructModifier):
@@ -182,6 +193,23 @@ class HavingIn(ConstructModifier):
             construct.add(i)
 
 
+class InParallel(ConstructModifier):
+    """
+    Builds :py:class:`builders.construct.Collection` items in a pool of ``workers`` processes.
+
+    See :py:mod:`builders.parallel` for the restrictions.
+    """
+    def __init__(self, what, workers):
+        assert isinstance(what, construct.Collection)
+        assert isinstance(workers, (int, long))
+
+        ConstructModifier.__init__(self, what)
+        self.value = workers
+
+    def doApply(self, construct):
+        construct.parallel(self.value)
+
+
 class OneOf(ConstructModifier):
     """
     Applies given ``modifiers`` to one of objects build by :py:class:`builders.construct.Collection`.
@@ -250,6 +278,215 @@ class ValuesMixin(object):
         return InstanceModifier(clz).thatCarefullySets(**kw)
 
 
+def resolve_attribute(clazz, name, modifiers):
+    """
+    Tells the value ``name`` attribute of a ``clazz`` instance would have if built with ``modifiers``, without building it.
+
+    Only class attributes, :py:class:`builders.construct.Predefined`, :py:class:`Given` values and ``thatSets`` modifiers are considered.
+    Returns ``(True, value)`` if the value is known for sure and ``(False, None)`` if any other construct or modifier may affect it.
+    """
+    unknown = (False, None)
+
+    init = getattr(clazz, '__init__', None)
+    if getattr(init, 'im_func', None) is not None:
+        return unknown
+
+    attribute = plan.get_plan(clazz).members.get(name)
+    if attribute is None:
+        result = (True, getattr(clazz, name)) if hasattr(clazz, name) else unknown
+    else:
+        given = [m for m in modifiers if isinstance(m, ConstructModifier) and m.construct is attribute]
+        if given and isinstance(given[-1], Given) and all(isinstance(m, Given) for m in given) and given[-1].value:
+            result = (True, given[-1].value)
+        elif not given and isinstance(attribute, construct.Predefined):
+            result = (True, attribute.predefined)
+        else:
+            result = unknown
+
+    for modifier in modifiers:
+        if isinstance(modifier, _ParticularClassModifier):
+            if not issubclass(clazz, modifier.classToRunOn):
+                continue
+            action = modifier.action
+            if not isinstance(action, _setter) or action.careful and not hasattr(clazz, name):
+                return unknown
+            if name in action.kwargs:
+                result = (True, action.kwargs[name])
+        elif isinstance(modifier, ConstructModifier):
+            continue
+        elif not isinstance(modifier, ClazzModifier) or modifier.shouldRun(clazz=clazz):
+            return unknown
+    return result
+
+
+def _stock(modifier, base):
+    return getattr(type(modifier).shouldRun, 'im_func', None) is base.shouldRun.im_func
+
+
+def _plain_class(target):
+    return inspect.isclass(target) and not isinstance(target, abc.ABCMeta)
+
+
+class ModifierIndex(object):
+    """
+    :arg modifiers: flat list of modifiers
+    :arg base: :py:class:`ModifierIndex` of the modifiers going before ``modifiers``, if any
+
+    ``modifiers`` partitioned by the classes they can apply to, so that a build polls only the relevant ones for each node:
+    :py:class:`ConstructModifier`-s by their ``construct`` and ``InstanceModifier`` ones by ``classToRunOn``.
+    Other modifiers (including the ones overriding ``shouldRun`` or running on abstract classes) are polled for every node as before.
+    Selected modifiers keep their order, the ones of ``base`` go first.
+
+    Partitions of ``base`` are shared, only the ones ``modifiers`` add to are copied.
+    """
+    def __init__(self, modifiers, base=None):
+        offset = base.size if base is not None else 0
+        self.size = offset + len(modifiers)
+        self.general = base.general if base is not None else []
+        self.byConstruct = base.byConstruct if base is not None else {}
+        self.byClass = base.byClass if base is not None else {}
+        copied = set()
+        for position, modifier in enumerate(modifiers, offset):
+            entry = (position, modifier)
+            if isinstance(modifier, ConstructModifier) and _stock(modifier, ConstructModifier):
+                try:
+                    self._partition('byConstruct', modifier.construct, copied).append(entry)
+                    continue
+                except TypeError:
+                    pass
+            elif isinstance(modifier, _ParticularClassModifier) and _stock(modifier, _ParticularClassModifier) \
+                    and _plain_class(modifier.classToRunOn):
+                self._partition('byClass', modifier.classToRunOn, copied).append(entry)
+                continue
+            if 'general' not in copied:
+                self.general = list(self.general)
+                copied.add('general')
+            self.general.append(entry)
+        self.classes = {}
+        self.instances = {}
+
+    def _partition(self, table, key, copied):
+        if (table, key) not in copied:
+            if table not in copied:
+                setattr(self, table, dict(getattr(self, table)))
+                copied.add(table)
+            partitions = getattr(self, table)
+            partitions[key] = list(partitions.get(key, ()))
+            copied.add((table, key))
+        return getattr(self, table)[key]
+
+    def forClass(self, build_plan):
+        """
+        Returns modifiers that may run for the class of ``build_plan`` (a :py:class:`builders.plan.BuildPlan`).
+        """
+        selected = self.classes.get(build_plan)
+        if selected is None:
+            entries = list(self.general)
+            for value in build_plan.byConstruct:
+                entries.extend(self.byConstruct.get(value, ()))
+            selected = self.classes[build_plan] = [modifier for position, modifier in sorted(entries)]
+        return selected
+
+    def forInstance(self, clazz):
+        """
+        Returns modifiers that may run for ``clazz`` instances.
+        """
+        selected = self.instances.get(clazz)
+        if selected is None:
+            entries = list(self.general)
+            for base in inspect.getmro(clazz):
+                entries.extend(self.byClass.get(base, ()))
+            selected = self.instances[clazz] = [modifier for position, modifier in sorted(set(entries))]
+        return selected
+
+
+class ModifierChain(object):
+    """
+    :arg modifiers: flat modifiers to follow ``base`` ones
+    :arg base: :py:class:`ModifierChain` to extend, if any
+
+    Immutable flat sequence of modifiers. Builders of all the nodes of a tree share one chain instead of
+    flattening and copying the modifiers for each node. :py:meth:`extend` links new modifiers to the chain
+    rather than copying it, and so does the :py:class:`ModifierIndex` of the chain with the one of ``base``.
+
+    Pickled as a plain sequence of its modifiers.
+    """
+    def __init__(self, modifiers=(), base=None):
+        self.own = tuple(modifiers)
+        self.base = base if base else None
+        self.size = len(self.own) + (self.base.size if self.base is not None else 0)
+        self._items = None
+        self._index = None
+
+    def extend(self, *modifiers):
+        """
+        Returns a chain of these modifiers followed by ``modifiers``, flattened like by :py:meth:`builders.builder.Builder.withA`.
+        """
+        if not self.size and len(modifiers) == 1 and isinstance(modifiers[0], ModifierChain):
+            return modifiers[0]
+        own = []
+        for mod in builder.flatten(modifiers):
+            try:
+                own += list(mod)
+            except TypeError:
+                own.append(mod)
+        if not own:
+            return self
+        return ModifierChain(own, self)
+
+    def items(self):
+        """
+        Returns ``tuple`` of all the modifiers of the chain.
+        """
+        if self.base is None:
+            return self.own
+        if self._items is None:
+            parts = []
+            chain = self
+            while chain is not None:
+                parts.append(chain.own)
+                chain = chain.base
+            self._items = tuple(modifier for part in reversed(parts) for modifier in part)
+        return self._items
+
+    @property
+    def index(self):
+        """
+        :py:class:`ModifierIndex` of the chain.
+        """
+        if self._index is None:
+            pending = []
+            chain = self
+            while chain is not None and chain._index is None:
+                pending.append(chain)
+                chain = chain.base
+            base = chain._index if chain is not None else None
+            for chain in reversed(pending):
+                base = chain._index = ModifierIndex(chain.own, base) if chain.own or base is None else base
+        return self._index
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        return iter(self.items())
+
+    def __getitem__(self, position):
+        return self.items()[position]
+
+    def __add__(self, other):
+        return self.extend(other)
+
+    def __radd__(self, other):
+        return ModifierChain().extend(other, self)
+
+    def __reduce__(self):
+        return ModifierChain, (self.items(),)
+
+    def __repr__(self):
+        return 'ModifierChain(%r)' % (list(self.items()),)
+
+
 def Another(collection, *modifiers):
     """
     Add another instance to given ``collection`` with given ``mod``
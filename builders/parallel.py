@@ -0,0 +1,195 @@
+'''
+Building model trees with a process pool.
+
+Model classes, modifiers and partially built owners are sent to the worker processes with :py:mod:`pickle`,
+so all of them should be importable (i.e. defined on a module level) and free of lambdas.
+Constructs of importable model classes are pickled by reference, thus modifiers keep pointing
+to the same constructs in the workers.
+
+Workers do not fan out any further: nested parallel collections are built sequentially within a worker.
+
+Every chunk of work built with a :py:class:`builders.rng.RandomSource` gets its own source derived from it,
+so parallel builds are reproducible for a given seed and number of workers. Items of a seeded build
+(see :py:meth:`builders.builder.Builder.build`) draw from their own positional sources, so they are the same
+however they are built. Workers reseed the global :py:mod:`random` otherwise, so that they do not repeat each other's values.
+
+Every chunk of work also gets its own :py:class:`builders.construct.KeyStorage` ``partition`` (within the one of the
+building process, if any), holding the keys issued before the build, so workers never issue the same
+:py:class:`builders.construct.Key` values. Keys they issue are recorded in the storage of the build once received.
+Thus :py:class:`builders.construct.Random` keys of the items of a seeded build differ from the ones built sequentially,
+and a chunk may run out of keys in its part of a nearly exhausted range.
+
+.. warning::
+  :py:class:`builders.construct.Reused` caches are per-process, so instances reused by different workers are not shared.
+  Keys that are not :py:class:`builders.construct.Random` are not partitioned, so they are only checked against the keys
+  issued before the build.
+'''
+import multiprocessing
+import random
+
+import builder
+import construct
+import context
+import plan
+
+
+def in_worker():
+    """
+    Tells if the current process is a pool worker.
+    """
+    return multiprocessing.current_process().daemon
+
+
+def _chunks(items, parts):
+    size = max(1, -(-len(items) // parts))
+    return [items[i:i + size] for i in xrange(0, len(items), size)]
+
+
+def _init_worker():
+    context.reset()
+    random.seed()
+
+
+def _derive(source, kind, amount):
+    if source is None:
+        return [None] * amount
+    salt = source.getrandbits(64)
+    return [source.derive(kind, salt, i) for i in xrange(amount)]
+
+
+def _keys(storage, classes, amount):
+    """
+    Returns ``(issued, partition)`` for each of ``amount`` tasks: keys of ``classes`` issued in ``storage``
+    and a partition of its own.
+    """
+    with storage.lock:
+        issued = dict((clazz, set(storage.issued[clazz])) for clazz in classes if clazz in storage.issued)
+    index, count = construct.KeyStorage.partition or (0, 1)
+    return [(issued, (index * amount + i, count * amount)) for i in xrange(amount)]
+
+
+def _worker_storage(keys):
+    issued, partition = keys
+    construct.KeyStorage.partition = partition
+    storage = construct.KeyStorage()
+    storage.issued = dict((clazz, set(values)) for clazz, values in issued.items())
+    return storage
+
+
+def _issued(storage, keys):
+    before = keys[0]
+    return dict((clazz, values - before.get(clazz, set())) for clazz, values in storage.issued.items())
+
+
+def _record(storage, issued):
+    with storage.lock:
+        for clazz, values in issued.items():
+            storage.issued.setdefault(clazz, set()).update(values)
+
+
+def _map(function, tasks, workers):
+    pool = multiprocessing.Pool(workers, initializer=_init_worker)
+    try:
+        result = pool.map(function, tasks)
+    except BaseException:
+        pool.terminate()
+        raise
+    else:
+        pool.close()
+    finally:
+        pool.join()
+    return result
+
+
+def _build_trees(task):
+    clazz, modifiers, number, source, keys = task
+    storage = _worker_storage(keys)
+    worker_builder = builder.Builder(clazz).withA(modifiers).withKeyStorage(storage)
+    worker_builder.randomSource = source
+    return worker_builder.buildMany(number), _issued(storage, keys)
+
+
+def build_trees(clazz, modifiers, number, workers, source=None, keys=None):
+    """
+    Builds ``number`` independent ``clazz`` trees in a pool of ``workers`` processes,
+    drawing random values from ``source`` derivatives if given and issuing keys within ``keys`` storage
+    (``builders.construct.key_storage`` by default).
+    """
+    classes = plan.compile_graph(clazz)
+    storage = keys if keys is not None else construct.key_storage
+    counts = [len(chunk) for chunk in _chunks(range(number), workers)]
+    sources = _derive(source, 'trees', len(counts))
+    tasks = [(clazz, modifiers, count, s, k) for count, s, k in zip(counts, sources, _keys(storage, classes, len(counts)))]
+    trees = []
+    for chunk, issued in _map(_build_trees, tasks, workers):
+        _record(storage, issued)
+        trees.extend(chunk)
+    return trees
+
+
+def _build_items(task):
+    collection, owner, items, source, keys = task
+    with context.building() as build_context:
+        build_context.keys = storage = _worker_storage(keys)
+        built = []
+        for modifiers, item_source in items:
+            build_context.random = item_source or source
+            built.append(collection.buildItem(owner, modifiers))
+        return owner, built, _issued(storage, keys)
+
+
+def build_items(collection, owner, items_modifiers, workers, sources=None):
+    """
+    Builds :py:class:`builders.construct.Collection` items in a pool of ``workers`` processes,
+    one item per ``items_modifiers`` entry, drawing from the ``sources`` of the items of a seeded build if given.
+
+    ``owner`` is the instance holding the collection. Workers get a copy of it,
+    all the references to that copy are pointed back to ``owner`` once items are received.
+    """
+    classes = plan.compile_graph(collection.type)
+    build_context = context.current()
+    chunks = _chunks(zip(items_modifiers, sources or [None] * len(items_modifiers)), workers * 4)
+    if sources is None:
+        chunk_sources = _derive(getattr(build_context, 'random', None), 'items', len(chunks))
+    else:
+        chunk_sources = [None] * len(chunks)
+    storage = getattr(build_context, 'keys', None)
+    if storage is None:
+        storage = construct.key_storage
+    items = []
+    tasks = [(collection, owner, chunk, source, keys) for chunk, source, keys in zip(chunks, chunk_sources, _keys(storage, classes, len(chunks)))]
+    for owner_copy, built, issued in _map(_build_items, tasks, workers):
+        _record(storage, issued)
+        if owner is not None:
+            rewire(built, owner_copy, owner)
+        items.extend(built)
+    return items
+
+
+def rewire(tree, old, new):
+    """
+    Replaces all the references to ``old`` object within ``tree`` with ``new`` one.
+
+    Walks model instance attributes and ``list`` items, descending into ``tuple``-s too (but not replacing within them).
+    """
+    seen = set([id(old)])
+    pending = [tree]
+    while pending:
+        node = pending.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        if isinstance(node, list):
+            for i, value in enumerate(node):
+                if value is old:
+                    node[i] = new
+                else:
+                    pending.append(value)
+        elif isinstance(node, tuple):
+            pending.extend(node)
+        elif hasattr(node, '__dict__'):
+            for name, value in node.__dict__.items():
+                if value is old:
+                    setattr(node, name, new)
+                else:
+                    pending.append(value)
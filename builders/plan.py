@@ -0,0 +1,250 @@
+'''
+Compiled build plans for model classes.
+
+A plan lists the :py:class:`builders.construct.Construct` attributes of a model class in the order
+:py:class:`builders.builder.Builder` populates them, so that the class is not reflected upon
+for every single instance built.
+
+Plans are cached per class and recompiled when the class (or any of its bases) is changed.
+Compiled plans also maintain a reverse index from construct objects to the classes and attributes
+holding them, see :py:func:`attributes_of`.
+
+:py:class:`builders.construct.Uplink`-s are validated once, when linked (see :py:func:`link`), and every plan
+holds a table of the uplinks its instances get the owner for directly when built by a linked construct.
+'''
+
+import inspect
+import threading
+import types
+
+import construct
+
+
+class BuildPlan(object):
+    """
+    :arg clazz: model class to compile the plan for
+
+    Holds ``constructs`` and ``uplinks`` -- sorted lists of ``(name, construct)`` pairs.
+    Ordinary constructs are built first, :py:class:`builders.construct.Uplink`-s follow them.
+
+    ``backrefs`` maps the constructs ``uplinks`` are linked to onto the names of those uplinks.
+    """
+    def __init__(self, clazz):
+        self.clazz = clazz
+        self.snapshot = [(k, k.__bases__, dict(vars(k))) for k in inspect.getmro(clazz) if k is not object]
+
+        self.members = {}
+        for _, _, attrs in reversed(self.snapshot):
+            self.members.update(attrs)
+        self.members = dict((name, value) for name, value in self.members.items() if isinstance(value, construct.Construct))
+
+        self.constructs, self.uplinks = _split(self.members)
+
+        self.backrefs = {}
+        for name, value in self.uplinks:
+            if value.destination is not None:
+                self.backrefs.setdefault(value.destination, []).append(name)
+
+        self.byConstruct = {}
+        for name, value in sorted(self.members.items()):
+            self.byConstruct.setdefault(value, []).append(name)
+
+    def isValid(self):
+        """
+        Checks that neither ``clazz`` nor its bases were changed since the plan was compiled.
+        """
+        try:
+            for clazz, bases, attrs in self.snapshot:
+                if clazz.__bases__ is not bases or vars(clazz) != attrs:
+                    return False
+        except Exception:
+            return False
+        return True
+
+    def forInstance(self, instance):
+        """
+        Returns ``(constructs, uplinks)`` pair for a fresh ``instance`` of ``clazz``.
+
+        Respects attributes set by the model ``__init__``, if any.
+        """
+        own = getattr(instance, '__dict__', None)
+        if not own:
+            return self.constructs, self.uplinks
+
+        members = dict(self.members)
+        for name, value in own.items():
+            if isinstance(value, construct.Construct):
+                members[name] = value
+            else:
+                members.pop(name, None)
+        return _split(members)
+
+
+def _split(members):
+    constructs = []
+    uplinks = []
+    for name, value in sorted(members.items()):
+        if isinstance(value, construct.Uplink):
+            uplinks.append((name, value))
+        else:
+            constructs.append((name, value))
+    return constructs, uplinks
+
+
+_plans = {}
+_owners = {}
+_lock = threading.RLock()
+
+
+def _forget(plan):
+    for value in plan.byConstruct:
+        owners = _owners.get(value)
+        if owners is not None:
+            owners.pop(plan.clazz, None)
+            if not owners:
+                del _owners[value]
+
+
+def get_plan(clazz):
+    """
+    Returns a valid :py:class:`BuildPlan` for ``clazz``, compiling it if needed.
+    """
+    plan = _plans.get(clazz)
+    if plan is None or not plan.isValid():
+        with _lock:
+            plan = _plans.get(clazz)
+            if plan is None or not plan.isValid():
+                if plan is not None:
+                    _forget(plan)
+                plan = _plans[clazz] = BuildPlan(clazz)
+                for value, names in plan.byConstruct.items():
+                    _owners.setdefault(value, {})[clazz] = names
+    return plan
+
+
+def compile_graph(clazz):
+    """
+    Compiles plans for ``clazz`` and every model class reachable from it via constructs.
+
+    Returns the list of reached classes, ``clazz`` first.
+    """
+    reached = []
+    seen = set()
+    pending = [clazz]
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        reached.append(current)
+        for value in get_plan(current).members.values():
+            pending.extend(_targets(value))
+    return reached
+
+
+def _targets(value):
+    while isinstance(value, construct.Maybe):
+        value = value.construct
+    candidates = [getattr(value, 'type', None), getattr(value, 'clazz', None)]
+    return [c for c in candidates if inspect.isclass(c)]
+
+
+def fields_of(clazz):
+    """
+    Returns sorted names of ``clazz`` data attributes: its constructs and public class attributes holding
+    numbers, strings or ``None``.
+    """
+    names = set(get_plan(clazz).members)
+    for k in inspect.getmro(clazz):
+        if k is object:
+            continue
+        for name, value in vars(k).items():
+            if not name.startswith('_') and isinstance(value, _scalars):
+                names.add(name)
+    return sorted(names)
+
+
+_scalars = (basestring, int, long, float, bool, type(None))
+_kinds = {}
+
+
+def is_model(value):
+    """
+    Tells if ``value`` is a model instance, i.e. an object with attributes that is not a number, a string, a class,
+    a function or a module. Cached per type.
+    """
+    kind = type(value)
+    model = _kinds.get(kind)
+    if model is None:
+        model = _kinds[kind] = hasattr(value, '__dict__') and not issubclass(
+            kind, _scalars + (type, types.ClassType, types.FunctionType, types.MethodType, types.ModuleType))
+    return model
+
+
+def attributes_of(value, clazz):
+    """
+    Returns names of ``clazz`` attributes holding ``value`` construct.
+
+    Looks ``value`` up in the reverse index without re-validating the plan of ``clazz``,
+    as :py:class:`builders.builder.Builder` does that once per built instance.
+    """
+    if clazz not in _plans:
+        get_plan(clazz)
+    try:
+        return _owners.get(value, {}).get(clazz, ())
+    except TypeError:
+        return ()
+
+
+def owners_of(value):
+    """
+    Returns ``{class: attribute names}`` dict of the compiled classes holding ``value`` construct.
+    """
+    return dict(_owners.get(value, {}))
+
+
+_parents = {}
+
+
+def link(uplink, clazz, destination):
+    """
+    Validates and records ``uplink`` to ``clazz`` instances holding the models built by ``destination``.
+
+    :raises ValueError: if ``clazz`` does not hold ``destination``, ``destination`` does not build models, is linked
+      to another uplink already or the models it builds are among the ancestors of ``clazz`` via uplinks,
+      so that building them from the bottom would never end.
+    """
+    if not isinstance(destination, construct.Construct) or not attributes_of(destination, clazz):
+        raise ValueError('Can not link %s to %r, it is not a construct of %s' % (uplink, destination, clazz))
+    children = _targets(destination)
+    if not children:
+        raise ValueError('Can not link %s to %s, it does not build models' % (uplink, destination))
+    linked = destination.destination
+    if linked and linked not in (uplink, [uplink]):
+        raise ValueError('Can not link %s to %s, it is linked to %s already' % (uplink, destination, linked))
+
+    with _lock:
+        pending, seen = [clazz], set()
+        while pending:
+            ancestor = pending.pop()
+            if any(issubclass(ancestor, child) for child in children):
+                raise ValueError('Can not link %s to %s, uplinks of %s lead back to it' % (uplink, destination, children[0]))
+            if ancestor not in seen:
+                seen.add(ancestor)
+                pending.extend(_parents.get(ancestor, ()))
+        for child in children:
+            _parents.setdefault(child, set()).add(clazz)
+        for owner in owners_of(uplink):
+            invalidate(owner)
+
+
+def invalidate(clazz=None):
+    """
+    Drops cached plan for ``clazz`` or all the cached plans if no ``clazz`` given.
+    """
+    with _lock:
+        if clazz is None:
+            _plans.clear()
+            _owners.clear()
+        elif clazz in _plans:
+            _forget(_plans.pop(clazz))
@@ -0,0 +1,207 @@
+'''
+Opt-in instrumentation of builds.
+
+A :py:class:`BuildProfiler` attached to a build (see :py:meth:`builders.builder.Builder.withProfiler`)
+or active in a ``with`` block records:
+
+* amount and total time of instances built per model class,
+* calls and time of every construct ``build`` per ``(class, attribute)``,
+* calls and time of ``shouldRun`` and ``apply`` per modifier,
+* the deepest level of nested instances.
+
+Results can be dumped as ``pstats`` data or as folded stacks for flame graph tools.
+Profiling costs nothing while no profiler is attached.
+'''
+
+import collections
+import pstats
+import threading
+import timeit
+
+
+_local = threading.local()
+
+
+def active():
+    """
+    Returns :py:class:`BuildProfiler` active in this thread, if any.
+    """
+    return getattr(_local, 'profiler', None)
+
+
+class _Frame(object):
+    def __init__(self):
+        self.calls = 0
+        self.tottime = 0.0
+        self.cumtime = 0.0
+        self.callers = {}
+
+
+class BuildProfiler(object):
+    """
+    Collects timings of the builds it is attached to. Should not be shared by concurrent builds.
+
+    Gathered data:
+
+    ``instances``
+        ``Counter`` of built instances per model class
+    ``constructs``
+        ``{(clazz, name): [calls, seconds]}`` of the construct builds
+    ``modifiers``
+        ``{(modifier, 'shouldRun' or 'apply'): [calls, seconds]}``
+    ``maxDepth``
+        the deepest level of nested instances, the built tree root being at ``1``
+
+    Can be used as a context manager that profiles all the builds started within it in this thread::
+
+      with BuildProfiler() as profiler:
+          Builder(Foo).build()
+      profiler.printStats()
+    """
+    def __init__(self, timer=timeit.default_timer):
+        self.timer = timer
+        self.instances = collections.Counter()
+        self.constructs = {}
+        self.modifiers = {}
+        self.maxDepth = 0
+        self.depth = 0
+        self.frames = {}
+        self.folded = collections.defaultdict(float)
+        self.stack = []
+        self.children = []
+        self.previous = []
+
+    def __enter__(self):
+        self.previous.append(active())
+        _local.profiler = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _local.profiler = self.previous.pop()
+
+    def measure(self, label, func, *args, **kwargs):
+        """
+        Calls ``func`` with the given arguments, accounting the time spent to the ``label`` frame.
+        """
+        self.stack.append(label)
+        self.children.append(0.0)
+        started = self.timer()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = self.timer() - started
+            own = elapsed - self.children.pop()
+            self.folded[tuple(self.stack)] += own
+            self.stack.pop()
+            if self.children:
+                self.children[-1] += elapsed
+
+            caller = self.stack[-1] if self.stack else None
+            frame = self.frames.get(label)
+            if frame is None:
+                frame = self.frames[label] = _Frame()
+            frame.calls += 1
+            frame.tottime += own
+            if label not in self.stack:
+                frame.cumtime += elapsed
+            if caller is not None:
+                calls = frame.callers.setdefault(caller, [0, 0.0, 0.0])
+                calls[0] += 1
+                calls[1] += own
+                calls[2] += elapsed
+
+    def instance(self, clazz, func, *args, **kwargs):
+        """
+        Measures ``func`` building an instance of ``clazz``.
+        """
+        self.instances[clazz] += 1
+        self.depth += 1
+        self.maxDepth = max(self.maxDepth, self.depth)
+        try:
+            return self.measure(clazz.__name__, func, *args, **kwargs)
+        finally:
+            self.depth -= 1
+
+    def construct(self, clazz, name, value, *args, **kwargs):
+        """
+        Measures ``value`` construct build for attribute ``name`` of ``clazz``.
+        """
+        started = self.timer()
+        try:
+            return self.measure('%s.%s' % (clazz.__name__, name), value.build, *args, **kwargs)
+        finally:
+            self._account(self.constructs, (clazz, name), started)
+
+    def modifier(self, modifier, phase, **kwargs):
+        """
+        Measures ``phase`` method of ``modifier`` called with ``kwargs``.
+        """
+        started = self.timer()
+        try:
+            return self.measure('%s.%s' % (type(modifier).__name__, phase), getattr(modifier, phase), **kwargs)
+        finally:
+            self._account(self.modifiers, (modifier, phase), started)
+
+    def applyModifiers(self, modifiers, **kwargs):
+        """
+        Measured counterpart of applying ``modifiers`` that should run with ``kwargs``.
+        """
+        for modifier in modifiers:
+            if self.modifier(modifier, 'shouldRun', **kwargs):
+                self.modifier(modifier, 'apply', **kwargs)
+
+    def _account(self, table, key, started):
+        stats = table.get(key)
+        if stats is None:
+            stats = table[key] = [0, 0.0]
+        stats[0] += 1
+        stats[1] += self.timer() - started
+
+    def create_stats(self):
+        """
+        Fills ``stats`` in the format of ``pstats``, so that the profiler can be loaded with ``pstats.Stats(profiler)``.
+
+        Model classes, construct attributes and modifier methods become functions of the ``builders`` "file".
+        """
+        def key(label):
+            return ('builders', 0, label)
+
+        self.stats = {}
+        for label, frame in self.frames.items():
+            callers = dict((key(caller), tuple(calls[:1] * 2 + calls[1:])) for caller, calls in frame.callers.items())
+            self.stats[key(label)] = (frame.calls, frame.calls, frame.tottime, frame.cumtime, callers)
+
+    def getStats(self):
+        """
+        Returns ``pstats.Stats`` of the profiled builds.
+        """
+        return pstats.Stats(self)
+
+    def printStats(self, sort='cumulative', limit=None):
+        """
+        Prints ``pstats``-style report sorted by ``sort`` key, restricted to ``limit`` lines if given.
+        """
+        stats = self.getStats().sort_stats(sort)
+        if limit is None:
+            stats.print_stats()
+        else:
+            stats.print_stats(limit)
+
+    def dumpStats(self, path):
+        """
+        Saves ``pstats`` data to ``path``, e.g. for ``snakeviz`` or ``gprof2dot``.
+        """
+        self.getStats().dump_stats(path)
+
+    def foldedStacks(self):
+        """
+        Returns list of ``frame;frame;frame microseconds`` lines, the input format of ``flamegraph.pl`` and ``speedscope``.
+        """
+        return ['%s %d' % (';'.join(stack), round(seconds * 1e6)) for stack, seconds in sorted(self.folded.items())]
+
+    def dumpFolded(self, path):
+        """
+        Saves :py:meth:`foldedStacks` to ``path``.
+        """
+        with open(path, 'w') as output:
+            output.write('\n'.join(self.foldedStacks()) + '\n')
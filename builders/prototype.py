@@ -0,0 +1,195 @@
+'''
+Cloning built trees instead of building them anew.
+
+See :py:meth:`builders.builder.Builder.prototype`. A :py:class:`Prototype` builds its template tree once,
+every :py:meth:`Prototype.clone` copies the model instances of the tree and points the references between them
+(:py:class:`builders.construct.Uplink`-s included) to the copies. Attribute values that are not model instances
+are shared with the template, ``list``-s and ``tuple``-s of them are copied.
+
+Only :py:class:`builders.construct.Key`, :py:class:`builders.construct.Uid` and :py:class:`builders.construct.Random`
+attributes are built again for each clone, so clones have fresh keys. Attributes set by modifiers
+(:py:class:`builders.modifiers.Given`, ``InstanceModifier(...).thatSets(...)`` and such) keep the template values,
+and nothing is built again for the classes with ``InstanceModifier(...).thatDoes(...)`` modifiers, as it is unknown
+what they do. :py:class:`builders.construct.Lambda` values are copied, not computed again.
+
+:py:class:`builders.construct.Reused` instances are shared with the template, as they are when built.
+Deferred attributes of the template (see :py:mod:`builders.lazy`) are built along with it.
+'''
+
+import itertools
+import types
+
+import construct
+import lazy
+import modifiers as modifiers_package
+import plan
+from builders import context
+
+
+_plain = (basestring, int, long, float, bool, type(None))
+
+
+def _shell(instance):
+    clazz = instance.__class__
+    if isinstance(clazz, types.ClassType):
+        return types.InstanceType(clazz, dict(instance.__dict__))
+    clone = clazz.__new__(clazz)
+    clone.__dict__.update(instance.__dict__)
+    return clone
+
+
+def _is_reused(value):
+    while isinstance(value, construct.Maybe):
+        value = value.construct
+    return isinstance(value, construct.Reused) or (isinstance(value, construct.Uplink) and value.reuser is not None)
+
+
+def _models(value):
+    if plan.is_model(value):
+        return [value]
+    if isinstance(value, (list, tuple)):
+        return [item for item in value if plan.is_model(item)] + [
+            model for item in value if isinstance(item, (list, tuple)) for model in _models(item)]
+    return []
+
+
+def _remap(value, copies):
+    if isinstance(value, list):
+        return [_remap(item, copies) for item in value]
+    if isinstance(value, tuple):
+        return tuple(_remap(item, copies) for item in value)
+    return copies.get(id(value), value)
+
+
+class _Layout(object):
+    """
+    What to do with ``clazz`` attributes when cloning: ``kept`` names to share, ``fresh`` ``(name, construct)`` to build again.
+    """
+    def __init__(self, clazz, overridden, frozen):
+        self.kept = set()
+        self.fresh = []
+        for name, value in sorted(plan.get_plan(clazz).members.items()):
+            if _is_reused(value):
+                self.kept.add(name)
+            elif type(value) in (construct.Key, construct.Uid, construct.Random) and not frozen \
+                    and value not in overridden and name not in overridden:
+                self.fresh.append((name, value))
+
+
+class Prototype(object):
+    """
+    :arg builder: :py:class:`builders.builder.Builder` to build the template with
+
+    Builds the template tree once and makes its copies, see :py:mod:`builders.prototype`.
+    Later changes of the ``builder`` do not affect the prototype. The ``template`` should not be changed either,
+    as the way to copy it is worked out on the first :py:meth:`clone`.
+    """
+    def __init__(self, builder):
+        self.clazz = builder.clazz
+        self.modifiers = list(builder.modifiers)
+        self.keyStorage = builder.keyStorage
+        self.randomSource = builder.randomSource
+        self.template = builder.build()
+        if builder.lazy is not None:
+            lazy.materialize(self.template)
+        self.nodes = self.recipes = None
+        self.layouts = {}
+        self.given = set()
+        self.sets = []
+        self.frozen = []
+        for modifier in self.modifiers:
+            if isinstance(modifier, modifiers_package.ConstructModifier):
+                self.given.add(modifier.construct)
+            elif isinstance(modifier, modifiers_package._ParticularClassModifier):
+                if isinstance(modifier.action, modifiers_package._setter):
+                    self.sets.append((modifier.classToRunOn, modifier.action.kwargs))
+                else:
+                    self.frozen.append(modifier.classToRunOn)
+
+    def layoutOf(self, clazz):
+        layout = self.layouts.get(clazz)
+        if layout is None:
+            overridden = set(self.given)
+            for target, values in self.sets:
+                if issubclass(clazz, target):
+                    overridden.update(values)
+            frozen = any(issubclass(clazz, target) for target in self.frozen)
+            layout = self.layouts[clazz] = _Layout(clazz, overridden, frozen)
+        return layout
+
+    def compile(self):
+        """
+        Walks the template tree once and returns its instances along with the recipes of their copies:
+        ``(references, lists, others, fresh)`` -- attributes to point to copies of other instances (by their index),
+        lists of instances to rebuild from the copies, other values to copy and constructs to build again.
+        """
+        nodes = []
+        index = {}
+        pending = [self.template]
+        while pending:
+            instance = pending.pop()
+            if id(instance) in index:
+                continue
+            index[id(instance)] = len(nodes)
+            nodes.append(instance)
+            kept = self.layoutOf(instance.__class__).kept
+            for name, value in instance.__dict__.iteritems():
+                if name not in kept:
+                    pending.extend(_models(value))
+
+        recipes = []
+        for instance in nodes:
+            layout = self.layoutOf(instance.__class__)
+            references, lists, others = [], [], []
+            for name, value in sorted(instance.__dict__.items()):
+                if name in layout.kept or isinstance(value, _plain):
+                    continue
+                if id(value) in index:
+                    references.append((name, index[id(value)]))
+                elif type(value) in (list, tuple) and value and all(id(item) in index for item in value):
+                    lists.append((name, type(value) is tuple, [index[id(item)] for item in value]))
+                else:
+                    others.append((name, value))
+            fresh = [(name, value) for name, value in layout.fresh if name in instance.__dict__]
+            recipes.append((references, lists, others, fresh))
+        return nodes, recipes
+
+    def clone(self, **attributes):
+        """
+        Returns a copy of the template tree with fresh keys and random values, with ``attributes`` of the root set.
+        """
+        if self.recipes is None:
+            self.nodes, self.recipes = self.compile()
+
+        copies = [_shell(instance) for instance in self.nodes]
+        mapping = None
+        with context.building() as build_context:
+            if self.keyStorage is not None and build_context.keys is None:
+                build_context.keys = self.keyStorage
+            if self.randomSource is not None and build_context.random is None:
+                build_context.random = self.randomSource
+            for copy, (references, lists, others, fresh) in itertools.izip(copies, self.recipes):
+                values = copy.__dict__
+                for name, i in references:
+                    values[name] = copies[i]
+                for name, is_tuple, indexes in lists:
+                    items = [copies[i] for i in indexes]
+                    values[name] = tuple(items) if is_tuple else items
+                if others:
+                    if mapping is None:
+                        mapping = dict(itertools.izip(itertools.imap(id, self.nodes), copies))
+                    for name, value in others:
+                        values[name] = _remap(value, mapping)
+                for name, value in fresh:
+                    values[name] = value.doBuild(self.modifiers, instance=copy)
+
+        root = copies[0]
+        for name, value in attributes.items():
+            setattr(root, name, value)
+        return root
+
+    def cloneMany(self, number):
+        """
+        Returns a ``list`` of ``number`` clones.
+        """
+        return [self.clone() for _ in xrange(number)]
@@ -0,0 +1,144 @@
+'''
+pytest plugin, enable it with ``-p builders.pytest_plugin`` or ``pytest_plugins = ['builders.pytest_plugin']``
+in a ``conftest.py``.
+
+It provides ``builders_session_trees``, ``builders_module_trees`` and ``builders_trees`` fixtures -- :py:class:`ScopedTrees`
+that build a tree once per session, module or test and return the same tree for the same models and modifiers afterwards::
+
+  def test_checkout(builders_session_trees):
+      shop = builders_session_trees.build(Builder(Shop).withA(NumberOf(Shop.goods, 1000)))
+
+The ``builders_reset`` ini option tells when to forget the global :py:class:`builders.construct.Key` values
+and :py:class:`builders.construct.Reused` instances: ``session``, ``module``, ``function`` or ``none`` (the default).
+Keys of the trees kept by the broader scopes are recorded again after a reset, so new keys do not collide with them.
+
+Under ``pytest-xdist`` every worker draws :py:class:`builders.construct.Random` keys from its own part of their ranges
+(see :py:class:`builders.construct.KeyStorage` ``partition``), so workers never issue the same keys.
+'''
+import os
+
+import pytest
+
+from builders import construct, diskcache
+
+
+SCOPES = ['session', 'module', 'function']
+
+_live = {}
+
+
+def pytest_addoption(parser):
+    parser.addini('builders_reset', 'when to reset Key and Reused state of builders: none, session, module or function',
+                  default='none')
+
+
+def worker_partition(environ=os.environ):
+    """
+    Returns ``(index, count)`` of the current ``pytest-xdist`` worker or ``None`` out of one.
+    """
+    worker, count = environ.get('PYTEST_XDIST_WORKER'), environ.get('PYTEST_XDIST_WORKER_COUNT')
+    if not worker or not count:
+        return None
+    return int(worker.lstrip('gw')), int(count)
+
+
+def pytest_configure(config):
+    partition = worker_partition()
+    if partition is not None:
+        construct.KeyStorage.partition = partition
+
+
+def pytest_unconfigure(config):
+    if worker_partition() is not None:
+        construct.KeyStorage.partition = None
+
+
+def reset(scope):
+    """
+    Forgets global keys and reused instances, then records the keys of the trees kept by the scopes broader than ``scope``.
+    """
+    construct.key_storage.clear()
+    construct.reused_cache.clear()
+    for broader in SCOPES[:SCOPES.index(scope)]:
+        if broader in _live:
+            for tree in _live[broader].trees.values():
+                diskcache.record_keys(tree, construct.key_storage)
+
+
+class ScopedTrees(object):
+    """
+    Trees built within a pytest ``scope``, one per distinct model and modifiers (see :py:func:`builders.diskcache.fingerprint`).
+    """
+    def __init__(self, scope):
+        self.scope = scope
+        self.trees = {}
+
+    def build(self, builder):
+        """
+        Returns the tree built by ``builder`` in this scope before, building it now if there is none.
+
+        Builders with modifiers that can not be pickled are told apart by identity only.
+        """
+        key = diskcache.fingerprint(builder)
+        if key is None:
+            key = builder
+        tree = self.trees.get(key)
+        if tree is None:
+            tree = self.trees[key] = builder.build()
+        return tree
+
+
+def _open(scope):
+    _live[scope] = ScopedTrees(scope)
+    return _live[scope]
+
+
+def _close(scope):
+    _live.pop(scope).trees.clear()
+
+
+def _reset(request, scope):
+    if request.config.getini('builders_reset') == scope:
+        reset(scope)
+
+
+@pytest.fixture(scope='session')
+def builders_session_trees():
+    """
+    :py:class:`ScopedTrees` kept for the whole session.
+    """
+    yield _open('session')
+    _close('session')
+
+
+@pytest.fixture(scope='module')
+def builders_module_trees():
+    """
+    :py:class:`ScopedTrees` kept for a test module.
+    """
+    yield _open('module')
+    _close('module')
+
+
+@pytest.fixture
+def builders_trees():
+    """
+    :py:class:`ScopedTrees` kept for a test.
+    """
+    yield _open('function')
+    _close('function')
+
+
+@pytest.fixture(scope='session', autouse=True)
+def _builders_session_reset(request):
+    _reset(request, 'session')
+
+
+@pytest.fixture(scope='module', autouse=True)
+def _builders_module_reset(request):
+    _reset(request, 'module')
+
+
+@pytest.fixture(autouse=True)
+def _builders_function_reset(request):
+    _reset(request, 'function')
@@ -0,0 +1,278 @@
+'''
+Random numbers for the constructs.
+
+By default constructs draw from the module-level :py:mod:`random` functions, sharing their state with everything else.
+A build can be given its own :py:class:`RandomSource` instead (see :py:meth:`builders.builder.Builder.withRandom`),
+which is seedable, independent of :py:mod:`random` and prefetches values in blocks, so it is also faster.
+
+Builds with a seed (see :py:meth:`builders.builder.Builder.build`) use a :py:class:`TreeSource` instead:
+every construct draws from a source derived from the seed and its position in the tree, so a subtree gets the same values
+however and whenever it is built.
+
+Random UUIDs are made of :py:data:`entropy` bytes, read from :py:func:`os.urandom` in large blocks.
+'''
+
+import hashlib
+import os
+import random
+import struct
+import threading
+import time
+
+from builders import context
+
+
+class GlobalRandom(object):
+    """
+    Draws from the module-level :py:mod:`random` functions, so ``random.seed`` works for it.
+    """
+    seed = None
+
+    def __init__(self):
+        self.randint = random.randint
+        self.below = random.randrange
+        self.getrandbits = random.getrandbits
+
+
+global_random = GlobalRandom()
+
+_PRECISE = 2 ** 48
+
+
+class RandomSource(object):
+    """
+    :arg seed: integer seed, a random one if not given
+    :arg block: amount of values to prefetch at once per range
+
+    Seedable random numbers generator independent from the global :py:mod:`random` state.
+
+    :py:meth:`randint` values are prefetched ``block`` at a time per ``(start, end)`` range, so the same seed gives
+    the same values for the same sequence of calls. ``seed`` is kept to report and reproduce a build.
+    """
+    def __init__(self, seed=None, block=256):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        self.seed = seed
+        self.block = block
+        self.generator = random.Random(seed)
+        self.blocks = {}
+
+    def randint(self, start, end):
+        """
+        Returns random integer from ``start`` to ``end`` inclusive.
+        """
+        try:
+            return self.blocks[start, end].pop()
+        except (KeyError, IndexError):
+            values = self.blocks[start, end] = self.prefetch(start, end)
+            return values.pop()
+
+    def prefetch(self, start, end):
+        size = end - start + 1
+        if size > _PRECISE:
+            return [self.generator.randint(start, end) for _ in xrange(self.block)]
+        draw = self.generator.random
+        return [start + int(draw() * size) for _ in xrange(self.block)]
+
+    def below(self, number):
+        """
+        Returns random integer from ``0`` to ``number - 1``.
+        """
+        if number > _PRECISE:
+            return self.generator.randrange(number)
+        return int(self.generator.random() * number)
+
+    def getrandbits(self, bits):
+        return self.generator.getrandbits(bits)
+
+    def derive(self, *path):
+        """
+        Returns new :py:class:`RandomSource` with a seed derived from this one's ``seed`` and ``path``,
+        e.g. an independent stream for a worker: ``source.derive('worker', 3)``.
+        """
+        digest = hashlib.sha256(repr((self.seed,) + path)).hexdigest()
+        return RandomSource(int(digest[:16], 16), self.block)
+
+
+_MASK = 2 ** 64 - 1
+_GOLDEN = 0x9e3779b97f4a7c15
+
+_codes = {}
+
+
+def _mix(value):
+    value = (value ^ (value >> 30)) * 0xbf58476d1ce4e5b9 & _MASK
+    value = (value ^ (value >> 27)) * 0x94d049bb133111eb & _MASK
+    return value ^ (value >> 31)
+
+
+def _code(key):
+    if isinstance(key, (int, long)) and 0 <= key <= _MASK:
+        return _mix((key + _GOLDEN) & _MASK)
+    code = _codes.get(key)
+    if code is None:
+        code = _codes[key] = int(hashlib.sha256(repr(key)).hexdigest()[:16], 16)
+    return code
+
+
+class TreeSource(object):
+    """
+    :arg seed: integer seed, a random one if not given
+
+    Random numbers generator for a tree position (a SplitMix64 sequence). :py:meth:`child` sources are derived from ``seed``
+    alone, not from the values drawn so far, so ``TreeSource(42).child('bars', 3)`` is the same wherever it is made.
+
+    ``seed`` of a derived source reproduces it: ``TreeSource(source.seed)`` draws the same values as ``source``.
+    """
+    def __init__(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(64)
+        elif not isinstance(seed, (int, long)) or not 0 <= seed <= _MASK:
+            seed = _code(seed)
+        self.seed = seed
+        self.drawn = 0
+
+    @classmethod
+    def of(cls, seed):
+        """
+        Returns ``seed`` if it is a :py:class:`TreeSource` already, a new one seeded with it otherwise.
+        """
+        return seed if isinstance(seed, TreeSource) else cls(seed)
+
+    def child(self, *path):
+        """
+        Returns the source of ``path`` (attribute names and collection indexes) under this one.
+        """
+        seed = self.seed
+        for key in path:
+            seed = _mix(seed ^ _code(key))
+        derived = TreeSource.__new__(TreeSource)
+        derived.seed = seed
+        derived.drawn = 0
+        return derived
+
+    derive = child
+
+    def next64(self):
+        """
+        Returns next random 64-bit integer.
+        """
+        self.drawn += 1
+        return _mix((self.seed + self.drawn * _GOLDEN) & _MASK)
+
+    def below(self, number):
+        """
+        Returns random integer from ``0`` to ``number - 1``.
+        """
+        if number <= _PRECISE:
+            return int((self.next64() >> 11) * number >> 53)
+        bits = number.bit_length()
+        while True:
+            value = self.getrandbits(bits)
+            if value < number:
+                return int(value)
+
+    def randint(self, start, end):
+        """
+        Returns random integer from ``start`` to ``end`` inclusive.
+        """
+        return start + self.below(end - start + 1)
+
+    def getrandbits(self, bits):
+        value = 0
+        for _ in xrange(-(-bits // 64)):
+            value = value << 64 | self.next64()
+        return value >> (-bits % 64)
+
+
+class EntropyPool(object):
+    """
+    :arg block: amount of bytes to read at once
+
+    Random bits from :py:func:`os.urandom`, read ``block`` bytes at a time per thread rather than per value.
+    The buffer is dropped in a forked process, so that processes do not share values.
+    """
+    def __init__(self, block=64 * 1024):
+        self.block = block
+        self.local = threading.local()
+
+    def words(self, amount):
+        """
+        Returns list of at least ``amount`` random 64-bit integers to pop from.
+        """
+        local = self.local
+        words = getattr(local, 'words', None)
+        if words is None or len(words) < amount or local.pid != os.getpid():
+            size = max(self.block // 8, amount)
+            words = local.words = list(struct.unpack('>%dQ' % size, os.urandom(size * 8)))
+            local.pid = os.getpid()
+        return words
+
+    def next64(self):
+        """
+        Returns next random 64-bit integer.
+        """
+        return self.words(1).pop()
+
+    def getrandbits(self, bits):
+        amount = -(-bits // 64)
+        words = self.words(amount)
+        value = words.pop()
+        for _ in xrange(amount - 1):
+            value = value << 64 | words.pop()
+        return value >> (-bits % 64)
+
+
+entropy = EntropyPool()
+
+_V4_CLEAR = ~(0xf000 << 64 | 0xc000 << 48)
+_V4_SET = 0x4000 << 64 | 0x8000 << 48
+
+_clock = threading.Lock()
+_last = [0, 0]
+
+
+def uuid4(source=entropy):
+    """
+    Returns random (version 4) UUID as a 128-bit integer, made of ``source`` bits.
+    """
+    return source.getrandbits(128) & _V4_CLEAR | _V4_SET
+
+
+def uuid7(source=entropy):
+    """
+    Returns time-ordered (version 7) UUID as a 128-bit integer: 48 bits of Unix time in milliseconds,
+    12 bits of a counter and 62 random bits of ``source``.
+
+    Values are strictly increasing within a process, so they are inserted at the end of database indexes.
+    """
+    bits = source.getrandbits(74)
+    now = int(time.time() * 1000)
+    with _clock:
+        millis, counter = _last
+        if now > millis:
+            millis, counter = now, bits >> 62 & 0x7ff
+        else:
+            counter += 1
+            if counter > 0xfff:
+                millis, counter = millis + 1, 0
+        _last[:] = millis, counter
+    return millis << 80 | 0x7 << 76 | counter << 64 | 0x2 << 62 | bits & (2 ** 62 - 1)
+
+
+def tree():
+    """
+    Returns :py:class:`TreeSource` of the construct being built in this thread or ``None`` if the build is not seeded.
+    """
+    source = getattr(context.current(), 'random', None)
+    return source if type(source) is TreeSource else None
+
+
+def current():
+    """
+    Returns the random source of the build running in this thread, :py:data:`global_random` by default.
+    """
+    build_context = context.current()
+    if build_context is None or build_context.random is None:
+        return global_random
+    return build_context.random
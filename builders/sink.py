@@ -0,0 +1,331 @@
+'''
+Sinks that write built trees as rows, batched per model class.
+
+A :py:class:`Sink` walks the trees it is fed (a ``list``, :py:meth:`builders.builder.Builder.iterBuild` generator
+or anything iterable, :py:class:`builders.construct.Stream` items included) and turns every model instance into a row
+of its class table:
+
+* :py:class:`builders.construct.Unique`, :py:class:`builders.construct.Reused`, :py:class:`builders.construct.Maybe`
+  and :py:class:`builders.construct.Uplink` attributes become ``<name>_id`` columns referencing the rows of their values,
+* :py:class:`builders.construct.Collection` attributes are not columns -- items refer to the owner via their ``Uplink``-s,
+* other constructs and plain class attributes become columns as they are.
+
+Every row has an ``id`` -- the ``id`` attribute of the instance if the model has one, or a generated number.
+Rows are buffered and written ``batch_size`` at a time. Tables are written in dependency order,
+i.e. rows of the referenced classes before the rows referring to them. A full batch waits while rows of the classes
+it refers to are buffered (up to ``wait_batches`` batches, then they are written as they are), so that those are written
+in full batches too.
+
+Use :py:class:`SQLiteSink` or implement :py:meth:`Sink.write` for other databases.
+'''
+
+import inspect
+import itertools
+import types
+import weakref
+
+import construct
+import plan
+
+
+_scalars = (basestring, int, long, float, bool, type(None))
+_plain = frozenset([str, unicode, int, long, float, bool, type(None)])
+
+
+class _Reference(weakref.ref):
+    __slots__ = ('identity', 'key', 'written')
+
+
+class _Strong(object):
+    __slots__ = ('instance', 'identity', 'key', 'written')
+
+    def __init__(self, instance):
+        self.instance = instance
+
+
+class Table(object):
+    """
+    Row layout of ``clazz`` instances: ``columns`` names and ``(attribute, is_reference)`` pairs to fetch them from.
+
+    ``collections`` are names of the attributes holding items that have rows of their own.
+    """
+    def __init__(self, clazz, name):
+        self.clazz = clazz
+        self.name = name
+        self.keyed = False
+        self.dependencies = set()
+        self.fields = []
+        self.collections = []
+
+        members = plan.get_plan(clazz).members
+        for attribute in plan.fields_of(clazz):
+            value = members.get(attribute)
+            if attribute == 'id':
+                self.keyed = True
+            elif isinstance(value, construct.Collection):
+                self.collections.append(attribute)
+            elif isinstance(value, (construct.Unique, construct.Maybe, construct.Uplink)):
+                self.dependencies.update(_references(value))
+                self.fields.append((attribute, True))
+            else:
+                self.fields.append((attribute, False))
+
+        self.columns = ['id'] + ['%s_id' % field if reference else field for field, reference in self.fields]
+
+
+def _references(value):
+    if isinstance(value, construct.Uplink):
+        return [value.clazz] if inspect.isclass(getattr(value, 'clazz', None)) else []
+    while isinstance(value, construct.Maybe):
+        value = value.construct
+    return [value.type] if inspect.isclass(getattr(value, 'type', None)) else []
+
+
+class Sink(object):
+    """
+    :arg batch_size: amount of rows per class to buffer before writing them
+    :arg tables: ``{clazz: table name}`` overrides, class ``__name__`` is the table name by default
+    :arg wait_batches: amount of full batches to keep buffered while the rows they refer to are not written
+
+    Base class for sinks, subclasses should implement :py:meth:`write`.
+    """
+    def __init__(self, batch_size=1000, tables=None, wait_batches=10):
+        self.batch_size = batch_size
+        self.wait_batches = wait_batches
+        self.awaited = {}
+        self.names = dict(tables or {})
+        self.tables = {}
+        self.buffers = {}
+        self.keys = {}
+        self.counters = {}
+        self.rows = 0
+
+    def write(self, table, rows):
+        """
+        Writes ``rows`` -- a list of tuples of :py:class:`Table` ``columns`` values.
+        """
+        raise NotImplementedError('This is not implemented')
+
+    def tableOf(self, clazz):
+        table = self.tables.get(clazz)
+        if table is None:
+            table = self.tables[clazz] = Table(clazz, self.names.get(clazz, clazz.__name__))
+        return table
+
+    def keyOf(self, instance):
+        """
+        Returns the ``id`` of the ``instance`` row, assigning a new one if needed.
+        """
+        return self._known(instance).key
+
+    def _known(self, instance):
+        known = self.keys.get(id(instance))
+        if known is not None:
+            return known
+
+        table = self.tableOf(instance.__class__)
+        try:
+            known = _Reference(instance, self._forget)
+        except TypeError:
+            known = _Strong(instance)
+        known.identity = id(instance)
+        known.written = False
+        if table.keyed:
+            known.key = instance.id
+        else:
+            known.key = self.counters[table] = self.counters.get(table, 0) + 1
+        self.keys[known.identity] = known
+        return known
+
+    def _forget(self, reference):
+        if self.keys.get(reference.identity) is reference:
+            del self.keys[reference.identity]
+
+    def consume(self, trees):
+        """
+        Walks ``trees`` and buffers a row per model instance found, writing full batches on the way.
+
+        Instances an instance refers to are buffered before it, its collections -- after it.
+        Returns amount of rows buffered. Call :py:meth:`flush` to write the rest.
+        """
+        before = self.rows
+        stack = [(iter(trees), None)]
+        while stack:
+            nodes, pending = stack[-1]
+            try:
+                node = next(nodes)
+            except StopIteration:
+                stack.pop()
+                if pending is not None:
+                    collections = self.buffer(*pending)
+                    if collections:
+                        stack.append((iter(collections), None))
+                continue
+
+            if isinstance(node, (list, tuple, types.GeneratorType)):
+                stack.append((iter(node), None))
+            elif plan.is_model(node):
+                row = self.add(node)
+                if row is not None:
+                    stack.append((iter(row[2]), row[:2]))
+        return self.rows - before
+
+    def add(self, instance):
+        """
+        Takes the row of ``instance`` unless it is taken already.
+
+        Returns ``(instance, row, references)``, where ``references`` are the model instances the row refers to that
+        are not taken yet. :py:meth:`buffer` the row once they are.
+        """
+        known = self.keys.get(id(instance)) or self._known(instance)
+        if known.written:
+            return None
+        known.written = True
+
+        keys = self.keys
+        table = self.tables.get(instance.__class__) or self.tableOf(instance.__class__)
+        row = [known.key]
+        references = []
+        for name, _ in table.fields:
+            value = getattr(instance, name, None)
+            if type(value) in _plain:
+                pass
+            elif plan.is_model(value):
+                reference = keys.get(id(value)) or self._known(value)
+                if not reference.written:
+                    references.append(value)
+                if value.__class__ not in table.dependencies:
+                    table.dependencies.add(value.__class__)
+                    self.awaited.clear()
+                value = reference.key
+            else:
+                value = self.adapt(value)
+            row.append(value)
+        return instance, tuple(row), references
+
+    def buffer(self, instance, row):
+        """
+        Buffers ``row`` of ``instance``, writing the batch if it is full.
+
+        Returns the collections of ``instance`` to walk further.
+        """
+        table = self.tables.get(instance.__class__) or self.tableOf(instance.__class__)
+        buffer = self.buffers.get(table)
+        if buffer is None:
+            buffer = self.buffers[table] = []
+        buffer.append(row)
+        self.rows += 1
+        if len(buffer) % self.batch_size == 0:
+            self._drain(table)
+        return [value for value in (getattr(instance, name, None) for name in table.collections) if value is not None]
+
+    def adapt(self, value):
+        """
+        Converts ``value`` that is neither a number, a string, ``None`` nor a model instance to a storable one.
+        Returns it as is by default.
+        """
+        return value
+
+    def _drain(self, table):
+        """
+        Writes full batches of ``table`` unless it waits for buffered rows of other tables, then the ones waiting for it.
+        """
+        rows = self.buffers.get(table)
+        awaited = [other for other in self._awaited(table) if self.buffers.get(other)]
+        if awaited:
+            if len(rows) < self.batch_size * self.wait_batches:
+                return
+            done = set([table])
+            for other in awaited:
+                self._flush(other, done)
+        batches = len(rows) // self.batch_size * self.batch_size
+        for start in xrange(0, batches, self.batch_size):
+            self.write(table, rows[start:start + self.batch_size])
+        del rows[:batches]
+        for other, waiting in self.buffers.items():
+            if other is not table and len(waiting) >= self.batch_size and table in self._awaited(other):
+                self._drain(other)
+
+    def _awaited(self, table):
+        """
+        Returns tables ``table`` refers to, except for the ones referring back to it.
+        """
+        awaited = self.awaited.get(table)
+        if awaited is not None:
+            return awaited
+        awaited = self.awaited[table] = []
+        for dependency in table.dependencies:
+            other = self.tableOf(dependency)
+            seen, pending = set(), [other]
+            while pending and table not in seen:
+                current = pending.pop()
+                if current not in seen:
+                    seen.add(current)
+                    pending.extend(self.tableOf(clazz) for clazz in current.dependencies)
+            if table not in seen:
+                awaited.append(other)
+        return awaited
+
+    def flush(self, clazz=None):
+        """
+        Writes buffered rows of ``clazz`` (all the buffered rows if not given), preceded by the rows of classes it refers to.
+        """
+        tables = [self.tableOf(clazz)] if clazz is not None else list(self.buffers)
+        done = set()
+        for table in tables:
+            self._flush(table, done)
+
+    def _flush(self, table, done):
+        if table in done:
+            return
+        done.add(table)
+        for dependency in sorted(table.dependencies, key=lambda clazz: clazz.__name__):
+            self._flush(self.tableOf(dependency), done)
+        rows = self.buffers.pop(table, None)
+        for start in xrange(0, len(rows or ()), self.batch_size):
+            self.write(table, rows[start:start + self.batch_size])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *args):
+        if exc_type is None:
+            self.flush()
+
+
+class SQLiteSink(Sink):
+    """
+    :arg connection: ``sqlite3`` connection to write to
+    :arg create: create missing tables with untyped columns
+
+    Writes rows with ``executemany``, one statement per batch. Values other than numbers, strings and ``None`` are written as strings.
+    Commits are up to the caller.
+
+    For example::
+
+      with SQLiteSink(sqlite3.connect('fixtures.db')) as sink:
+          sink.consume(Builder(Foo).withA(NumberOf(Foo.bars, 100)).iterBuild(10000))
+    """
+    def __init__(self, connection, batch_size=1000, tables=None, create=True):
+        Sink.__init__(self, batch_size, tables)
+        self.connection = connection
+        self.create = create
+        self.statements = {}
+
+    def statementFor(self, table):
+        statement = self.statements.get(table)
+        if statement is None:
+            columns = ', '.join('"%s"' % column for column in table.columns)
+            if self.create:
+                self.connection.execute('CREATE TABLE IF NOT EXISTS "%s" (%s)' % (table.name, columns))
+            statement = self.statements[table] = 'INSERT INTO "%s" (%s) VALUES (%s)' % (
+                table.name, columns, ', '.join(itertools.repeat('?', len(table.columns))))
+        return statement
+
+    def write(self, table, rows):
+        self.connection.executemany(self.statementFor(table), rows)
+
+    def adapt(self, value):
+        if isinstance(value, _scalars + (buffer,)):
+            return value
+        return str(value)
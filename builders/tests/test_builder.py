@@ -208,3 +208,34 @@ def test_new_style_classes():
     assert isinstance(b, object)
     assert isinstance(b.a_s[0], A)
     assert isinstance(b.a_s[0], object)
+
+
+def test_build_many():
+    modifier = InstanceModifier(B).thatSets(value=3)
+    bs = Builder(D).withA(modifier).buildMany(3)
+
+    assert len(bs) == 3
+    assert len(set(bs)) == 3
+    assert len(set(d.bs[0] for d in bs)) == 3
+    assert all(d.bs[0].value == 3 for d in bs)
+
+
+def test_iter_build_is_unlimited():
+    from itertools import islice
+
+    cs = list(islice(Builder(C).iterBuild(), 5))
+
+    assert len(cs) == 5
+    assert all(isinstance(c.b.a, A) for c in cs)
+
+
+def test_iter_build_keeps_modifiers():
+    builder = Builder(B)
+    trees = builder.iterBuild(2)
+
+    first = next(trees)
+    builder.withA(InstanceModifier(B).thatSets(value=1))
+    second = next(trees)
+
+    assert first.value == second.value == 0
+    assert builder.build().value == 1
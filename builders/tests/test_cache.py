@@ -0,0 +1,185 @@
+'''
+Tests for :py:mod:`builders.cache` and :py:class:`builders.construct.Reused` caching policies
+'''
+import gc
+
+from builders.builder import Builder
+from builders.cache import ReuseCache, LRUCache, WeakCache
+from builders.construct import Reused, Uplink, Collection, Unique, Predefined, reused_cache
+from builders.modifiers import InstanceModifier, Given
+
+
+class Value(object):
+    pass
+
+
+def test_reuse_cache():
+    cache = ReuseCache()
+    value = Value()
+
+    assert cache.get('a') is None
+    assert cache.add('a', value) is value
+    assert cache.add('a', Value()) is value
+    assert cache.get('a') is value
+
+    assert cache.stats() == dict(hits=2, misses=2, evictions=0, size=1)
+
+    cache.clear()
+    assert cache.stats() == dict(hits=0, misses=0, evictions=0, size=0)
+
+
+def test_lru_cache():
+    cache = LRUCache(2)
+    a, b, c = Value(), Value(), Value()
+
+    cache.add('a', a)
+    cache.add('b', b)
+    cache.get('a')
+    cache.add('c', c)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is a
+    assert cache.get('c') is c
+    assert cache.stats()['evictions'] == 1
+    assert len(cache) == 2
+
+
+def test_weak_cache():
+    cache = WeakCache()
+    value = Value()
+
+    assert cache.add('a', value) is value
+    assert cache.get('a') is value
+
+    del value
+    gc.collect()
+
+    assert cache.get('a') is None
+    assert cache.stats() == dict(hits=1, misses=2, evictions=1, size=0)
+
+
+class Tenant(object):
+    name = 'default'
+
+
+class Account(object):
+    tenant = Reused(Tenant, keys=['name'])
+
+
+class BoundedAccount(object):
+    tenant = Reused(Tenant, keys=['name'], cache=LRUCache(1))
+
+
+def named(name):
+    return InstanceModifier(Tenant).thatSets(name=name)
+
+
+def test_reused_with_lru_cache():
+    first = Builder(BoundedAccount).withA(named('a')).build()
+    second = Builder(BoundedAccount).withA(named('a')).build()
+    Builder(BoundedAccount).withA(named('b')).build()
+    third = Builder(BoundedAccount).withA(named('a')).build()
+
+    assert first.tenant is second.tenant
+    assert third.tenant is not first.tenant
+    assert BoundedAccount.tenant.instances.stats() == dict(hits=1, misses=3, evictions=2, size=1)
+
+
+def test_reused_per_builder_cache():
+    reused_cache.clear()
+    cache = ReuseCache()
+
+    builder = Builder(Account).withReuseCache(cache)
+    first, second = builder.buildMany(2)
+    other = Builder(Account).withReuseCache().build()
+
+    assert first.tenant is second.tenant
+    assert other.tenant is not first.tenant
+    assert cache.stats()['hits'] == 1
+    assert len(reused_cache) == 0
+
+
+def test_reused_global_cache():
+    reused_cache.clear()
+
+    first = Builder(Account).build()
+    second = Builder(Account).build()
+
+    assert first.tenant is second.tenant
+    assert reused_cache.stats() == dict(hits=1, misses=1, evictions=0, size=1)
+
+
+class Down(object):
+    up = Uplink(reusing_by=['name'], cache=LRUCache(1))
+
+
+class Up(object):
+    name = 'up'
+    downs = Collection(Down)
+
+
+Down.up.linksTo(Up, Up.downs)
+
+
+def test_uplink_reusing_cache():
+    first = Builder(Down).build()
+    second = Builder(Down).build()
+
+    assert first.up is second.up
+    assert Down.up.reuser.instances.stats()['hits'] == 1
+
+
+class Expensive(object):
+    built = 0
+
+    def __init__(self):
+        Expensive.built += 1
+
+
+class Dictionary(object):
+    name = 'default'
+    code = Predefined('code')
+    payload = Unique(Expensive)
+
+
+class Document(object):
+    dictionary = Reused(Dictionary, keys=['name', 'code'], cache=ReuseCache(), keys_first=True)
+
+
+def test_reused_keys_first_skips_building_on_hits():
+    Document.dictionary.instances.clear()
+    Expensive.built = 0
+
+    first = Builder(Document).withA(InstanceModifier(Dictionary).thatSets(name='a')).buildMany(3)
+    second = Builder(Document).withA(Given(Dictionary.code, 'other')).build()
+
+    assert first[0].dictionary is first[1].dictionary is first[2].dictionary
+    assert first[0].dictionary.name == 'a'
+    assert second.dictionary.code == 'other'
+    assert second.dictionary is not first[0].dictionary
+    assert Expensive.built == 2
+    assert Document.dictionary.instances.stats() == dict(hits=2, misses=2, evictions=0, size=2)
+
+
+def test_reused_keys_first_falls_back():
+    Document.dictionary.instances.clear()
+    Expensive.built = 0
+
+    modifier = InstanceModifier(Dictionary).thatDoes(lambda d: setattr(d, 'name', 'b'))
+    first, second = Builder(Document).withA(modifier).buildMany(2)
+
+    assert first.dictionary is second.dictionary
+    assert first.dictionary.name == 'b'
+    assert Expensive.built == 2
+
+
+def test_get_or_build_race():
+    cache = ReuseCache()
+    value, other = Value(), Value()
+
+    def build():
+        cache.add('a', other)
+        return value
+
+    assert cache.getOrBuild('a', build) is other
+    assert cache.get('a') is other
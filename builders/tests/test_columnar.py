@@ -0,0 +1,185 @@
+'''
+Tests for :py:mod:`builders.columnar`
+'''
+import random
+import sys
+import uuid
+
+import pytest
+
+from builders.builder import Builder
+from builders.construct import Collection, Key, KeyStorage, Lambda, Predefined, Random, Uid
+from builders.modifiers import Given, InstanceModifier, LambdaModifier, NumberOf
+from builders.columnar import vectorized, Unsupported
+
+
+numpy = pytest.importorskip('numpy')
+
+
+class Record(object):
+    id = Key(Random(1, 1000))
+    code = Key(Random(1, 50, pattern='code-%s'))
+    amount = Random(10, 20)
+    label = Random(pattern='label %s')
+    uid = Uid()
+    kind = Predefined('plain')
+    flag = True
+    twice = Lambda(lambda record: record.amount * 2)
+
+
+class Holder(object):
+    records = Collection(Record)
+    name = Random(pattern='holder %s')
+
+
+def test_columns():
+    columns = Builder(Record).withKeyStorage().buildColumns(50)
+
+    assert sorted(columns) == ['amount', 'code', 'flag', 'id', 'kind', 'label', 'twice', 'uid']
+    assert all(len(column) == 50 for column in columns.values())
+    assert columns['amount'].min() >= 10 and columns['amount'].max() <= 20
+    assert all(label.startswith('label ') for label in columns['label'])
+    assert all(uuid.UUID(value).version == 4 for value in columns['uid'])
+    assert len(set(columns['uid'])) == 50
+    assert set(columns['kind']) == set(['plain'])
+    assert columns['flag'].all()
+    assert (columns['twice'] == columns['amount'] * 2).all()
+    assert len(set(columns['id'])) == 50
+    assert sorted(columns['code']) == sorted('code-%s' % i for i in range(1, 51))
+
+
+def test_keys_respect_storage():
+    storage = KeyStorage()
+    builder = Builder(Record).withKeyStorage(storage)
+
+    built = builder.build()
+    columns = builder.buildColumns(49)
+
+    assert built.code not in columns['code']
+    assert built.id not in columns['id']
+    assert len(storage.issued[Record]) == 2 * 50
+
+    with pytest.raises(Exception):
+        builder.buildColumns(1)
+    assert len(storage.issued[Record]) == 2 * 50
+
+
+def test_keys_from_sparse_range():
+    class Sparse(object):
+        id = Key(Random(1, 10 ** 9))
+
+    storage = KeyStorage()
+    ids = Builder(Sparse).withKeyStorage(storage).buildColumns(1000)['id']
+
+    assert len(set(ids)) == 1000
+    assert storage.issued[Sparse] == set(ids)
+
+
+def test_modifiers():
+    columns = Builder(Record).withKeyStorage().withA(
+        Given(Record.amount, 15),
+        Given(Record.label, ''),
+        LambdaModifier(Record.twice, lambda record: -record.amount),
+        InstanceModifier(Record).thatSets(kind='special'),
+        NumberOf(Holder.records, 100)).buildColumns(3)
+
+    assert columns['amount'].tolist() == [15] * 3
+    assert all(label.startswith('label ') for label in columns['label'])
+    assert columns['twice'].tolist() == [-15] * 3
+    assert columns['kind'].tolist() == ['special'] * 3
+
+
+def test_reproducible():
+    random.seed(1)
+    first = Builder(Record).withKeyStorage().buildColumns(10)
+    random.seed(1)
+    second = Builder(Record).withKeyStorage().buildColumns(10)
+
+    for name in ['id', 'code', 'amount', 'label']:
+        assert first[name].tolist() == second[name].tolist()
+
+
+def test_reproducible_with_random_source():
+    def columns():
+        return Builder(Record).withKeyStorage().withRandom(3).buildColumns(10)
+    first = columns()
+
+    assert all(first[name].tolist() == columns()[name].tolist() for name in first)
+    assert all(uuid.UUID(value).version == 4 for value in first['uid'])
+    assert first['uid'].tolist() != Builder(Record).withKeyStorage().withRandom(4).buildColumns(10)['uid'].tolist()
+
+
+def test_structured():
+    records = Builder(Record).withKeyStorage().buildColumns(5, structured=True)
+
+    assert len(records) == 5
+    assert records.dtype.names == ('amount', 'code', 'flag', 'id', 'kind', 'label', 'twice', 'uid')
+    assert (records.twice == records.amount * 2).all()
+
+
+def test_no_keys_wasted_on_fallback():
+    class Scarce(object):
+        id = Key(Random(1, 3))
+        records = Collection(Record)
+
+    storage = KeyStorage()
+    columns = Builder(Scarce).withKeyStorage(storage).buildColumns(3)
+
+    assert sorted(columns['id']) == [1, 2, 3] and storage.issued[Scarce] == set([1, 2, 3])
+
+
+def test_fallback():
+    columns = Builder(Holder).withKeyStorage().buildColumns(3)
+
+    assert sorted(columns) == ['name', 'records']
+    assert columns['records'].dtype == object
+    assert all(isinstance(records[0], Record) for records in columns['records'])
+    assert all(name.startswith('holder ') for name in columns['name'])
+
+
+@pytest.mark.parametrize('model, modifiers', [
+    (Record, [InstanceModifier(Record).thatDoes(lambda record: None)]),
+    (Record, [lambda: None]),
+    (Holder, []),
+    (type('Ordered', (object,), {'uid': Uid(ordered=True)}), []),
+    (Record, [InstanceModifier(Record).thatCarefullySets(missing=1)]),
+])
+def test_unsupported(model, modifiers):
+    with pytest.raises(Unsupported):
+        vectorized(model, modifiers, 1, KeyStorage())
+
+
+def test_careful_setters():
+    def careful(**kwargs):
+        return Builder(Record).withKeyStorage().withA(InstanceModifier(Record).thatCarefullySets(**kwargs))
+
+    assert careful(kind='careful').buildColumns(2)['kind'].tolist() == ['careful'] * 2
+    with pytest.raises(AssertionError):
+        careful(missing=1).buildColumns(2)
+
+
+def test_given_objects():
+    record = Record()
+    columns = Builder(Holder).withA(Given(Holder.records, record)).buildColumns(2)
+
+    assert columns['records'].tolist() == [record, record]
+
+
+def test_custom_init():
+    class Initialized(object):
+        value = Random()
+
+        def __init__(self):
+            self.value = 'set'
+
+    with pytest.raises(Unsupported):
+        vectorized(Initialized, [], 1, KeyStorage())
+    assert Builder(Initialized).buildColumns(2)['value'].tolist() == ['set', 'set']
+
+
+def test_numpy_required(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'numpy', None)
+
+    with pytest.raises(ImportError) as e:
+        Builder(Record).buildColumns(1)
+    assert 'pip install numpy' in str(e.value)
@@ -5,8 +5,14 @@ Created on Apr 12, 2013
 
 @author: pupssman
 '''
+import os
+import threading
+import time
+import uuid
+
 from builders.builder import Builder
-from builders.construct import Random, Uid, Key, Lambda
+from builders.construct import Random, Uid, Key, Lambda, KeyStorage, RangeShuffle, key_storage
+from builders.rng import entropy
 import pytest
 
 
@@ -52,6 +58,47 @@ def test_uid_is_random():
     assert sorted(list(set(values))) == sorted(values)
 
 
+@pytest.mark.parametrize('form, kind', [('str', str), ('hex', str), ('int', long), ('bytes', str), ('uuid', uuid.UUID)])
+def test_uid_forms(form, kind):
+    class A:
+        a = Uid(form=form)
+
+    value = Builder(A).build().a
+
+    assert isinstance(value, kind)
+    assert uuid.UUID(**{'str': {'hex': value}, 'hex': {'hex': value}, 'int': {'int': value},
+                        'bytes': {'bytes': value}, 'uuid': {'hex': str(value)}}[form]).version == 4
+
+
+def test_uid_ordered():
+    class A:
+        a = Uid(ordered=True)
+
+    values = [Builder(A).build().a for _ in xrange(5000)]
+
+    assert values == sorted(values)
+    assert len(set(values)) == len(values)
+    assert all(uuid.UUID(value).version == 7 for value in values)
+    assert abs((uuid.UUID(values[0]).int >> 80) - time.time() * 1000) < 60000
+
+
+def test_uid_form_is_checked():
+    with pytest.raises(ValueError):
+        Uid(form='oct')
+
+
+def test_entropy_is_not_shared_with_forks():
+    entropy.next64()
+    read, write = os.pipe()
+    pid = os.fork()
+    if not pid:
+        os.write(write, str(entropy.next64()))
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    assert long(os.read(read, 100)) != entropy.next64()
+
+
 def test_key_is_unique():
     class A:
         a = Key(Random(start=1, end=100))
@@ -81,3 +128,112 @@ def test_class_passed_to_lambda():
         a = Lambda(check_instance_passed)
 
     Builder(A).build()
+
+
+def test_key_exhausts_range_without_retries():
+    class A:
+        a = Key(Random(start=1, end=50))
+
+    values = Builder(A).buildMany(50)
+
+    assert sorted(a.a for a in values) == range(1, 51)
+    with pytest.raises(Exception):
+        Builder(A).build()
+
+
+def test_key_with_pattern():
+    class A:
+        a = Key(Random(start=1, end=3, pattern='a%s'))
+
+    assert sorted(a.a for a in Builder(A).buildMany(3)) == ['a1', 'a2', 'a3']
+
+
+def test_key_over_other_construct():
+    from itertools import count
+    gen = count()
+
+    class A:
+        a = Key(Lambda(lambda _: gen.next() // 2))
+
+    assert [a.a for a in Builder(A).buildMany(3)] == [0, 1, 2]
+
+
+def test_key_attempts_are_limited():
+    class A:
+        a = Key(Lambda(lambda _: 1))
+
+    Builder(A).build()
+    with pytest.raises(Exception) as e:
+        Builder(A).build()
+
+    assert 'Max attempts' in str(e.value)
+
+
+def test_key_storage_per_builder():
+    class A:
+        a = Key(Random(start=1, end=3))
+
+    storage = KeyStorage()
+    first = Builder(A).withKeyStorage(storage).buildMany(3)
+    second = Builder(A).withKeyStorage().buildMany(3)
+
+    assert sorted(a.a for a in first) == sorted(a.a for a in second) == [1, 2, 3]
+    assert storage.issued[A] == set([1, 2, 3])
+    assert A not in key_storage.issued
+
+
+def test_key_storage_clear():
+    class A:
+        a = Key(Random(start=1, end=2))
+
+    class B:
+        b = Key(Random(start=1, end=2))
+
+    Builder(A).buildMany(2)
+    Builder(B).buildMany(2)
+
+    key_storage.clear(A)
+    assert len(Builder(A).buildMany(2)) == 2
+    with pytest.raises(Exception):
+        Builder(B).build()
+
+    key_storage.clear()
+    assert len(Builder(B).buildMany(2)) == 2
+
+
+def test_keys_with_different_patterns():
+    class A:
+        a = Key(Random(start=1, end=100, pattern='a%s'))
+        b = Key(Random(start=1, end=100, pattern='b%s'))
+
+    built = Builder(A).withKeyStorage().buildMany(100)
+
+    assert len(set(a.a for a in built)) == len(set(a.b for a in built)) == 100
+
+
+def test_nested_keyed_builds():
+    class Code:
+        id = Key(Random(start=1, end=10 ** 6))
+
+    class Order:
+        ref = Key(Lambda(lambda _: 'ORD-%s' % Builder(Code).build().id))
+
+    refs = []
+    builder = threading.Thread(target=lambda: refs.append(Builder(Order).withKeyStorage().build().ref))
+    builder.daemon = True
+    builder.start()
+    builder.join(5)
+
+    assert len(refs) == 1 and refs[0].startswith('ORD-')
+
+
+def test_range_shuffle():
+    shuffle = RangeShuffle(10, 1009)
+
+    assert len(shuffle) == 1000
+    values = list(shuffle)
+
+    assert sorted(values) == range(10, 1010)
+    assert values != sorted(values)
+    assert len(shuffle) == 0
+    assert shuffle.swaps == {}
@@ -0,0 +1,112 @@
+'''
+Tests for :py:mod:`builders.context` and concurrent builds
+'''
+import sys
+import threading
+
+from builders import context
+from builders.builder import Builder
+from builders.construct import Collection, Unique, Maybe, Lambda, Predefined, Uplink
+from builders.modifiers import NumberOf, Given, Enabled, LambdaModifier, OneOf, InstanceModifier
+
+
+class Leaf(object):
+    value = 0
+    node = Uplink()
+
+
+class Plain(object):
+    pass
+
+
+class Node(object):
+    leaves = Collection(Leaf)
+    leaf = Unique(Plain)
+    maybe = Maybe(Unique(Plain))
+    function = Lambda(lambda node: 'default')
+    constant = Predefined('constant')
+
+
+Leaf.node.linksTo(Node, Node.leaves)
+
+
+def test_transient_out_of_build():
+    assert Node.leaves.overrides == []
+    assert Node.leaf.value is None
+    assert Node.maybe.enabled is False
+
+
+def test_transient_within_build():
+    with context.building() as build_context:
+        Node.leaf.value = 1
+        Node.leaves.items.append(2)
+
+        assert Node.leaf.value == 1
+        assert Node.leaves.items == [2]
+        assert build_context.valuesOf(Node.leaf) == {'value': 1}
+
+    assert Node.leaf.value is None
+    assert Node.leaves.items == []
+
+
+def test_nested_builds_share_context():
+    with context.building() as outer:
+        with context.building() as inner:
+            assert inner is outer
+            assert context.current() is outer
+
+    assert context.current() is None
+
+
+def test_reset():
+    with context.building():
+        context.reset()
+        assert context.current() is None
+
+
+def test_state_does_not_leak_between_builds():
+    Builder(Leaf).withA(Given(Node.leaf, 5), NumberOf(Node.leaves, 3)).build()
+    node = Builder(Node).build()
+
+    assert isinstance(node.leaf, Plain)
+    assert len(node.leaves) == 1
+
+
+def test_predefined_builds_repeatedly():
+    nodes = Builder(Node).buildMany(2)
+
+    assert [n.constant for n in nodes] == ['constant', 'constant']
+
+
+def test_concurrent_builds():
+    errors = []
+
+    def build(number):
+        try:
+            for _ in range(20):
+                node = Builder(Node).withA(NumberOf(Node.leaves, number),
+                                           Given(Node.leaf, number),
+                                           Enabled(Node.maybe),
+                                           LambdaModifier(Node.function, lambda node: number),
+                                           OneOf(Node.leaves, InstanceModifier(Leaf).thatSets(value=number))).build()
+                assert len(node.leaves) == number
+                assert all(leaf.node is node for leaf in node.leaves)
+                assert [leaf.value for leaf in node.leaves].count(number) == 1
+                assert node.leaf == number
+                assert isinstance(node.maybe, Plain)
+                assert node.function == number
+        except Exception as e:
+            errors.append(e)
+
+    interval = sys.getcheckinterval()
+    sys.setcheckinterval(1)
+    try:
+        threads = [threading.Thread(target=build, args=(number,)) for number in range(2, 10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setcheckinterval(interval)
+
+    assert errors == []
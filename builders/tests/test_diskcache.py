@@ -0,0 +1,159 @@
+'''
+Tests for :py:mod:`builders.diskcache`
+
+Models live on the module level, so that the trees can be pickled.
+'''
+from builders.builder import Builder
+from builders.construct import Collection, Key, KeyStorage, Lambda, Random, Uplink
+from builders.diskcache import DiskCache, describe, fingerprint
+from builders.modifiers import InstanceModifier, LambdaModifier, NumberOf
+
+
+class Line(object):
+    id = Key(Random(1, 10 ** 6))
+    amount = Random(1, 100)
+    invoice = Uplink()
+
+
+class Invoice(object):
+    id = Key(Random(1, 10 ** 6))
+    lines = Collection(Line)
+    total = Lambda(lambda invoice: sum(line.amount for line in invoice.lines))
+
+
+Line.invoice.linksTo(Invoice, Invoice.lines)
+
+
+def values(invoice):
+    return (invoice.id, invoice.total, [(line.id, line.amount) for line in invoice.lines])
+
+
+def test_hit(tmpdir):
+    cache = DiskCache(str(tmpdir))
+    builder = Builder(Invoice).withKeyStorage().withA(NumberOf(Invoice.lines, 3)).withDiskCache(cache)
+
+    first = builder.build()
+    second = builder.build()
+
+    assert values(first) == values(second)
+    assert second is not first
+    assert all(line.invoice is second for line in second.lines)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert len(tmpdir.listdir()) == 1
+
+
+def test_loaded_keys_are_recorded(tmpdir):
+    Builder(Invoice).withDiskCache(str(tmpdir)).build()
+    storage = KeyStorage()
+
+    loaded = Builder(Invoice).withKeyStorage(storage).withDiskCache(str(tmpdir)).build()
+
+    assert storage.issued[Invoice] == set([loaded.id])
+    assert storage.issued[Line] == set([loaded.lines[0].id])
+
+
+def test_modifiers_change_the_key(tmpdir):
+    cache = DiskCache(str(tmpdir))
+
+    Builder(Invoice).withA(NumberOf(Invoice.lines, 2)).withDiskCache(cache).build()
+    built = Builder(Invoice).withA(NumberOf(Invoice.lines, 3)).withDiskCache(cache).build()
+
+    assert len(built.lines) == 3
+    assert cache.misses == 2
+
+
+def test_definitions_change_the_key():
+    builder = Builder(Invoice)
+    before = fingerprint(builder)
+    Line.amount.end = 1000
+    try:
+        assert fingerprint(builder) != before
+    finally:
+        Line.amount.end = 100
+    assert fingerprint(builder) == before
+    assert fingerprint(Builder(Invoice).withRandom(1)) != before
+
+
+def discount(amount):
+    return amount // 2
+
+
+def discounted(invoice):
+    return discount(sum(line.amount for line in invoice.lines))
+
+
+def apply_discount(invoice):
+    invoice.total = discounted(invoice)
+
+
+def test_functions_change_the_key():
+    builders = [Builder(Invoice).withA(InstanceModifier(Invoice).thatDoes(apply_discount)),
+                Builder(Invoice).withA(LambdaModifier(Invoice.total, discounted))]
+    before = [fingerprint(builder) for builder in builders]
+
+    for function, changed in [(discounted, lambda invoice: 0), (discount, lambda amount: amount // 3)]:
+        original = function.func_code
+        function.func_code = changed.func_code
+        try:
+            assert all(fingerprint(builder) != key for builder, key in zip(builders, before))
+        finally:
+            function.func_code = original
+    assert [fingerprint(builder) for builder in builders] == before
+
+
+def test_describe():
+    assert describe(Random(1, 2)) == describe(Random(1, 2))
+    assert describe(Random(1, 2)) != describe(Random(1, 3))
+    assert describe(Lambda(lambda x: x + 1)) != describe(Lambda(lambda x: x + 2))
+    assert describe(Line.invoice) == describe(Line.invoice)
+    assert describe(object()) == 'object'
+
+    def adding(number):
+        return lambda x: x + number
+    assert describe(adding(1)) == describe(adding(1)) != describe(adding(2))
+    assert describe(InstanceModifier(Line).thatSets(amount=1)) != describe(InstanceModifier(Line).thatSets(amount=2))
+
+
+def test_unpicklable_modifiers_are_not_cached(tmpdir):
+    cache = DiskCache(str(tmpdir))
+    builder = Builder(Invoice).withA(InstanceModifier(Invoice).thatDoes(lambda invoice: None)).withDiskCache(cache)
+
+    builder.build()
+    builder.build()
+
+    assert (cache.hits, cache.misses) == (0, 0)
+    assert not tmpdir.listdir()
+
+
+def test_unpicklable_trees_are_not_cached(tmpdir):
+    class Local(object):
+        value = Random()
+
+    cache = DiskCache(str(tmpdir))
+
+    assert Builder(Local).withDiskCache(cache).build().value
+    assert cache.misses == 1
+    assert not tmpdir.listdir()
+
+
+def test_broken_files_are_rebuilt(tmpdir):
+    cache = DiskCache(str(tmpdir))
+    builder = Builder(Invoice).withDiskCache(cache)
+    builder.build()
+    tmpdir.listdir()[0].write('broken')
+
+    assert builder.build().lines
+    assert cache.misses == 2
+    assert builder.build().lines
+    assert cache.hits == 1
+
+
+def test_clear(tmpdir, monkeypatch):
+    monkeypatch.setenv('BUILDERS_CACHE', str(tmpdir.join('cache')))
+    cache = DiskCache()
+    Builder(Invoice).withDiskCache(cache).build()
+
+    cache.clear()
+
+    assert cache.directory == str(tmpdir.join('cache'))
+    assert tmpdir.join('cache').listdir() == []
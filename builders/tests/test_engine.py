@@ -0,0 +1,216 @@
+'''
+Tests for the iterative build engine, see :py:func:`builders.builder.run`.
+
+Profiled builds take the recursive path, so seeded builds with and without a profiler should give the same trees.
+'''
+import sys
+
+import pytest
+
+from builders import builder
+from builders.builder import Builder, BuildTooDeep, Result, done, flatten, run
+from builders.cache import ReuseCache
+from builders.construct import Collection, Construct, Key, Lambda, Maybe, Random, Reused, Uid, Unique, Uplink
+from builders.modifiers import Another, Enabled, Given, InstanceModifier, NumberOf, OneOf
+from builders.plan import is_model
+from builders.tests.test_regression import Hero, Player, Squad, Unit
+
+
+class Tag(object):
+    name = Random(1, 10, pattern='tag%s')
+
+
+class Address(object):
+    city = Random(pattern='city %s')
+
+
+class Item(object):
+    id = Key(Random(1, 10 ** 6))
+    price = Random(1, 100)
+    order = Uplink()
+    tag = Reused(Tag, keys=['name'], keys_first=True)
+
+
+class Order(object):
+    uid = Uid()
+    items = Collection(Item)
+    address = Maybe(Unique(Address))
+    total = Lambda(lambda order: sum(item.price for item in order.items))
+
+
+Item.order.linksTo(Order, Order.items)
+
+
+def snapshot(tree):
+    """
+    Returns a comparable structure of ``tree``, with shared instances replaced by references to their first occurrence.
+    """
+    seen = {}
+
+    def walk(value):
+        if isinstance(value, list):
+            return [walk(item) for item in value]
+        if is_model(value):
+            if id(value) in seen:
+                return ('see', seen[id(value)])
+            seen[id(value)] = len(seen)
+            return (type(value).__name__, sorted((name, walk(attribute)) for name, attribute in vars(value).items()))
+        return value
+    return walk(tree)
+
+
+def build_both(clazz, *modifiers):
+    iterative = Builder(clazz).withA(*modifiers).withReuseCache(ReuseCache()).build(seed=7)
+    recursive = Builder(clazz).withA(*modifiers).withReuseCache(ReuseCache()).withProfiler().build(seed=7)
+    return iterative, recursive
+
+
+def test_run():
+    def failing():
+        raise KeyError('failing')
+        yield
+
+    def outer():
+        try:
+            yield failing()
+        except KeyError:
+            pass
+        first = yield done(2)
+        yield Result(first + (yield done(3)))
+
+    def empty():
+        return
+        yield
+
+    assert run(outer()) == 5
+    assert run(empty()) is None
+    with pytest.raises(KeyError):
+        run(failing())
+
+
+@pytest.mark.parametrize('clazz, modifiers', [
+    (Player, []),
+    (Player, [NumberOf(Player.squads, 3), NumberOf(Squad.units, 4)]),
+    (Unit, []),
+    (Hero, [NumberOf(Squad.units, 2)]),
+    (Order, [NumberOf(Order.items, 5), Enabled(Order.address)]),
+    (Order, [OneOf(Order.items, Given(Item.price, 1000)), Another(Order.items, InstanceModifier(Item).thatSets(price=0))]),
+    (Item, [Given(Item.price, 5)]),
+    (Item, [NumberOf(Order.items, 3)]),
+])
+def test_equivalent_to_recursive_builds(clazz, modifiers):
+    iterative, recursive = build_both(clazz, modifiers)
+
+    assert snapshot(iterative) == snapshot(recursive)
+
+
+def test_uplinks_and_reuse():
+    order, _ = build_both(Order, NumberOf(Order.items, 20), Enabled(Order.address))
+
+    assert all(item.order is order for item in order.items)
+    assert len(set(id(item.tag) for item in order.items)) == len(set(item.tag.name for item in order.items))
+    assert order.total == sum(item.price for item in order.items)
+    assert isinstance(order.address, Address)
+
+
+def chain(depth, link=Unique):
+    clazz = type('Level%s' % depth, (object,), {'value': Random()})
+    for level in reversed(range(depth)):
+        clazz = type('Level%s' % level, (object,), {'value': Random(), 'child': link(clazz)})
+    return clazz
+
+
+def depth_of(node, attribute='child'):
+    depth = 0
+    while hasattr(node, attribute):
+        node = getattr(node, attribute)
+        node = node[0] if isinstance(node, list) else node
+        depth += 1
+    return depth
+
+
+@pytest.mark.parametrize('link', [Unique, Collection, lambda clazz: Maybe(Unique(clazz), enabled=True)])
+def test_deeper_than_recursion_limit(link):
+    depth = sys.getrecursionlimit() + 100
+
+    assert depth_of(Builder(chain(depth, link)).build()) == depth
+
+
+def test_deep_uplinks():
+    depth = sys.getrecursionlimit() + 100
+    root = chain(depth, Collection)
+    clazz = root
+    while 'child' in vars(clazz):
+        parent, clazz = clazz, clazz.child.type
+        clazz.parent = Uplink()
+        clazz.parent.linksTo(parent, parent.child)
+
+    leaf = Builder(clazz).build()
+
+    node, hops = leaf, 0
+    while hasattr(node, 'parent'):
+        assert node in node.parent.child
+        node, hops = node.parent, hops + 1
+    assert hops == depth and isinstance(node, root)
+
+
+class Looped(object):
+    value = Random()
+
+
+Looped.child = Maybe(Unique(Looped))
+
+
+@pytest.mark.parametrize('depth', [50, 500])
+def test_cycles_are_too_deep(monkeypatch, depth):
+    monkeypatch.setattr(builder, 'max_depth', depth)
+
+    with pytest.raises(BuildTooDeep) as e:
+        Builder(Looped).withA(Enabled(Looped.child)).build()
+
+    assert str(e.value).endswith(' -> '.join(['Looped.child'] * 10))
+    assert str(e.value).startswith('Build is deeper than %s steps: ... -> ' % depth)
+    assert not Looped.child.enabled
+    assert Builder(Looped).build().child is None
+
+
+class Broken(Construct):
+    def doBuild(self, *args, **kwargs):
+        raise ValueError('broken')
+
+
+def test_exceptions_propagate():
+    clazz = chain(10)
+    clazz.child.type.child.type.broken = Broken()
+    maybe = Maybe(Unique(clazz), enabled=True)
+    Holder = type('Holder', (object,), {'maybe': maybe})
+
+    with pytest.raises(ValueError):
+        Builder(Holder).build()
+
+    assert maybe.enabled
+    assert Builder(type('Other', (object,), {'value': Random(1, 1)})).build().value == 1
+
+
+class Custom(Unique):
+    def doBuild(self, modifiers, **kwargs):
+        return 'custom'
+
+
+def test_overridden_constructs_are_not_iterative():
+    Holder = type('Holder', (object,), {'unique': Unique(Address), 'custom': Custom(Address)})
+
+    built = Builder(Holder).build()
+
+    assert isinstance(built.unique, Address)
+    assert built.custom == 'custom'
+    assert Holder.unique.iterative and not Holder.custom.iterative and not Random().iterative
+
+
+def test_deep_flatten():
+    nested = 1
+    for _ in range(sys.getrecursionlimit() * 2):
+        nested = [nested, lambda: 2]
+
+    assert sum(flatten(nested)) == 1 + 2 * sys.getrecursionlimit() * 2
+    assert list(flatten([[1, (2, 'ab')], lambda: [3], [], 4])) == [1, 2, 'ab', 3, 4]
@@ -0,0 +1,201 @@
+'''
+Tests for :py:mod:`builders.lazy`
+'''
+import gc
+import logging
+import threading
+
+import pytest
+
+from builders import lazy
+from builders.builder import Builder
+from builders.construct import Collection, Lambda, Random, Unique, Uplink
+from builders.logger import logger
+from builders.modifiers import Given, InstanceModifier, NumberOf, OneOf
+from builders.tests.test_engine import Item, Order, snapshot
+from builders.tests.test_regression import Player, Squad, Unit
+
+
+class Leaf(object):
+    value = Random()
+
+
+class Branch(object):
+    leaves = Collection(Leaf)
+    top = Lambda(lambda branch: branch.leaves[0])
+
+
+class Root(object):
+    name = Random(pattern='root %s')
+    left = Unique(Branch)
+    right = Unique(Branch)
+
+
+def counting(clazz, built):
+    return InstanceModifier(clazz).thatDoes(lambda instance: built.append(instance))
+
+
+def test_built_on_read():
+    built = []
+    player = Builder(Player).withLazy().withA(NumberOf(Player.squads, 3), NumberOf(Squad.units, 2), counting(Unit, built)).build()
+
+    assert lazy.pending(player) == ['squads']
+    assert 'squads' not in vars(player)
+    assert not built
+
+    squads = player.squads
+
+    assert len(squads) == 3 and player.squads is squads
+    assert all(squad.player is player for squad in squads)
+    assert not built and lazy.pending(squads[0]) == ['leader', 'units']
+    assert len(squads[1].units) == 2 and all(unit.squad is squads[1] for unit in squads[1].units)
+    assert len(built) == 2
+    assert squads[0].leader.squad is squads[0]
+    assert lazy.pending(player) == []
+
+
+def test_same_tree_as_built_at_once():
+    modifiers = [NumberOf(Order.items, 5), OneOf(Order.items, Given(Item.price, 1000))]
+
+    deferred = lazy.materialize(Builder(Order).withLazy().withA(modifiers).build(seed=3))
+
+    assert snapshot(deferred) == snapshot(Builder(Order).withA(modifiers).build(seed=3))
+    assert [item.price for item in deferred.items].count(1000) == 1
+
+
+def test_modifiers_stay_with_their_instance():
+    root = Builder(Root).withLazy(Root.left, Branch.leaves).withA(NumberOf(Branch.leaves, 3)).build()
+
+    assert lazy.pending(root) == ['left']
+    assert isinstance(vars(root)['right'], Branch)
+    assert len(root.right.leaves) == 3 and len(root.left.leaves) == 3
+    assert root.left.top is root.left.leaves[0]
+    assert lazy.pending(root.left) == []
+
+
+def test_explicit_constructs():
+    root = Builder(Root).withLazy(Root.name).build()
+
+    assert lazy.pending(root) == ['name']
+    assert root.name.startswith('root ')
+    assert isinstance(vars(root)['left'], Branch)
+
+
+def test_set_attributes_are_not_built():
+    built = []
+    squad = Builder(Squad).withLazy().withA(InstanceModifier(Squad).thatSets(units=[]), counting(Unit, built)).build()
+
+    assert squad.units == [] and not built
+
+
+def test_prebuilt_values_are_not_deferred():
+    given = Branch()
+    root = Builder(Root).withLazy().withA(Given(Root.left, given)).build()
+    unit = Builder(Unit).withLazy().build()
+
+    assert vars(root)['left'] is given and lazy.pending(root) == ['right']
+    assert unit in vars(unit.squad)['units']
+
+
+def test_not_weakly_referenced_instances():
+    class Slotted(object):
+        __slots__ = ['__dict__']
+        branch = Unique(Branch)
+
+    slotted = Builder(Slotted).withLazy().build()
+
+    assert isinstance(vars(slotted)['branch'], Branch)
+
+
+def test_profiled():
+    builder = Builder(Root).withLazy().withProfiler()
+    root = builder.build()
+
+    assert (Root, 'left') not in builder.profiler.constructs
+    assert root.left.leaves
+    assert (Root, 'left') in builder.profiler.constructs and builder.profiler.instances[Leaf] == 1
+
+
+def test_forgotten_with_instances(monkeypatch):
+    monkeypatch.setattr(logger, 'level', logging.INFO)  # debug records would keep the instance
+    root = Builder(Root).withLazy().build()
+    key = id(root)
+
+    assert key in lazy._pending
+    del root
+    gc.collect()
+    assert key not in lazy._pending
+
+
+def test_read_while_being_built():
+    class Parent(object):
+        pass
+
+    class Child(object):
+        parent = Uplink()
+
+    Parent.child = Unique(Child)
+    Child.parent.linksTo(Parent, Parent.child)
+    peeked = []
+    peek = InstanceModifier(Child).thatDoes(lambda child: peeked.append(child.parent.child))
+
+    parent = Builder(Parent).withLazy().withA(peek).build()
+
+    assert isinstance(parent.child, Child) and parent.child.parent is parent
+    assert peeked == [Parent.child]
+
+
+def test_failed_builds_stay_deferred():
+    failures = [ValueError('once')]
+
+    def flaky(leaf):
+        if failures:
+            raise failures.pop()
+        return 1
+
+    Flaky = type('Flaky', (object,), {'value': Lambda(flaky)})
+    Holder = type('Holder', (object,), {'flaky': Unique(Flaky)})
+    holder = Builder(Holder).withLazy().build()
+
+    with pytest.raises(ValueError):
+        holder.flaky
+    assert lazy.pending(holder) == ['flaky']
+    assert holder.flaky.value == 1 and lazy.pending(holder) == []
+
+
+def test_concurrent_reads():
+    started, read = threading.Event(), threading.Event()
+
+    def slow(instance):
+        started.set()
+        read.wait(5)
+        return read.is_set()
+
+    Slow = type('Slow', (object,), {'done': Lambda(slow)})
+    Holder = type('Holder', (object,), {'slow': Unique(Slow), 'other': Unique(Leaf)})
+    holder = Builder(Holder).withLazy().build()
+    values = []
+    readers = [threading.Thread(target=lambda: values.append(holder.slow)) for _ in range(2)]
+
+    readers[0].start()
+    started.wait(5)
+    readers[1].start()
+    assert isinstance(holder.other, Leaf)
+    read.set()
+    for reader in readers:
+        reader.join(5)
+
+    assert len(values) == 2 and values[0] is values[1] is holder.slow
+    assert holder.slow.done
+
+
+def test_copies_are_complete(tmpdir):
+    builder = Builder(Order).withLazy().withA(NumberOf(Order.items, 2))
+
+    clone = builder.prototype().clone()
+    stored = builder.withDiskCache(str(tmpdir)).build()
+    loaded = builder.build()
+
+    assert len(vars(clone)['items']) == 2
+    assert len(vars(stored)['items']) == 2
+    assert snapshot(loaded) == snapshot(stored)
@@ -0,0 +1,76 @@
+'''
+Checks that disabled debug logging does not cost message formatting
+'''
+import logging
+
+import pytest
+
+from builders.builder import Builder
+from builders.construct import Collection, Uplink
+from builders.logger import logger, debugging
+from builders.modifiers import NumberOf
+
+
+class Item(object):
+    reprs = 0
+    parent = Uplink()
+
+    def __repr__(self):
+        Item.reprs += 1
+        return '<Item>'
+
+
+class Parent(object):
+    items = Collection(Item)
+
+    def __repr__(self):
+        Item.reprs += 1
+        return '<Parent>'
+
+
+Item.parent.linksTo(Parent, Parent.items)
+
+
+@pytest.fixture
+def info_level():
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    yield
+    logger.setLevel(level)
+
+
+def test_debugging_follows_level(info_level):
+    assert not debugging()
+
+    logger.setLevel(logging.DEBUG)
+
+    assert debugging()
+
+    logging.disable(logging.DEBUG)
+    try:
+        assert not debugging()
+    finally:
+        logging.disable(logging.NOTSET)
+
+
+def test_no_formatting_when_disabled(info_level):
+    Item.reprs = 0
+
+    Builder(Parent).withA(NumberOf(Parent.items, 3)).build()
+    Builder(Item).build()
+
+    assert Item.reprs == 0
+
+
+def test_formatting_when_enabled():
+    handler = logging.Handler()
+    handler.emit = lambda record: record.getMessage()
+    logger.addHandler(handler)
+    Item.reprs = 0
+
+    try:
+        Builder(Parent).withA(NumberOf(Parent.items, 3)).build()
+    finally:
+        logger.removeHandler(handler)
+
+    assert Item.reprs > 0
@@ -1,9 +1,12 @@
+import pickle
+
 import pytest
 
 from builders.builder import Builder
-from builders.construct import Unique, Collection, Uplink, Maybe, Lambda, Random
+from builders.construct import Unique, Collection, Uplink, Maybe, Lambda, Random, Predefined
 from builders.modifiers import Given, InstanceModifier, NumberOf, HavingIn, \
-    OneOf, Enabled, ValuesMixin, LambdaModifier, Another, Disabled
+    OneOf, Enabled, ValuesMixin, LambdaModifier, Another, Disabled, Modifier, ModifierChain, ModifierIndex, resolve_attribute
+from builders.plan import get_plan
 
 
 class A:
@@ -304,3 +307,127 @@ def test_maybe_enabled():
 
     assert b1.a is not None
     assert b2.a is None
+
+
+class Resolved(ValuesMixin):
+    plain = 'plain'
+    predefined = Predefined('predefined')
+    random = Random()
+    lam = Lambda(lambda _: 'lambda')
+
+
+class ResolvedChild(Resolved):
+    pass
+
+
+class WithInit(object):
+    plain = 'plain'
+
+    def __init__(self):
+        self.plain = 'init'
+
+
+@pytest.mark.parametrize(('clazz', 'name', 'modifiers', 'expected'), [
+    (Resolved, 'plain', [], (True, 'plain')),
+    (Resolved, 'missing', [], (False, None)),
+    (Resolved, 'predefined', [], (True, 'predefined')),
+    (Resolved, 'random', [], (False, None)),
+    (Resolved, 'random', [Given(Resolved.random, 5)], (True, 5)),
+    (Resolved, 'random', [Given(Resolved.random, 5), Given(Resolved.random, 0)], (False, None)),
+    (Resolved, 'lam', [Given(Resolved.lam, 5), LambdaModifier(Resolved.lam, lambda _: 1)], (False, None)),
+    (Resolved, 'predefined', [Given(Resolved.lam, 5)], (True, 'predefined')),
+    (Resolved, 'random', [Resolved.values(random=1)], (True, 1)),
+    (ResolvedChild, 'random', [InstanceModifier(Resolved).thatSets(random=1)], (True, 1)),
+    (Resolved, 'plain', [InstanceModifier(Resolved).thatCarefullySets(plain=1), InstanceModifier(Resolved).thatSets(plain=2)], (True, 2)),
+    (Resolved, 'missing', [InstanceModifier(Resolved).thatCarefullySets(missing=1)], (False, None)),
+    (Resolved, 'plain', [InstanceModifier(Resolved).thatDoes(lambda _: None)], (False, None)),
+    (Resolved, 'plain', [InstanceModifier(A).thatDoes(lambda _: None)], (True, 'plain')),
+    (Resolved, 'plain', [Modifier()], (False, None)),
+    (WithInit, 'plain', [], (False, None)),
+])
+def test_resolve_attribute(clazz, name, modifiers, expected):
+    assert resolve_attribute(clazz, name, modifiers) == expected
+
+
+def test_modifier_index():
+    class Sub(A):
+        pass
+
+    class Polled(Modifier):
+        def shouldRun(self, **kwargs):
+            return True
+
+    given, general = Given(B.a, 1), Polled()
+    on_a, on_b, on_sub = InstanceModifier(A).thatSets(value=2), InstanceModifier(B).thatSets(a=3), InstanceModifier(Sub).thatSets(value=4)
+    index = ModifierIndex([on_sub, given, general, on_a, on_b])
+
+    assert index.forClass(get_plan(B)) == [given, general]
+    assert index.forClass(get_plan(A)) == [general]
+    assert index.forInstance(B) == [general, on_b]
+    assert index.forInstance(A) == [general, on_a]
+    assert index.forInstance(Sub) == [on_sub, general, on_a]
+    assert index.forInstance(Sub) is index.forInstance(Sub)
+
+
+def test_modifier_index_keeps_order():
+    class Sub(A):
+        pass
+
+    sub = Builder(Sub).withA(InstanceModifier(Sub).thatSets(value=3), InstanceModifier(A).thatSets(value=2)).build()
+
+    assert sub.value == 2
+
+
+def test_modifier_index_follows_class_changes():
+    class D:
+        value = Random(1, 10)
+
+    modifier = Given(D.value, 100)
+    builder = Builder(D).withA(modifier)
+    assert builder.build().value == 100
+
+    D.value = Random(200, 300)
+    assert 200 <= builder.build().value <= 300
+    assert Builder(D).withA(Given(D.value, 5)).build().value == 5
+
+
+def test_modifier_chain():
+    first, second, third, fourth = Given(B.a, 1), Given(B.a, 2), Given(B.a, 3), Given(B.a, 4)
+    chain = ModifierChain().extend([first, [second]], lambda: third)
+
+    extended = chain + [fourth]
+
+    assert list(chain) == [first, second, third]
+    assert list(extended) == [first, second, third, fourth] and len(extended) == 4
+    assert extended.base is chain and extended[3] is fourth
+    assert chain + [] is chain
+    assert ModifierChain().extend(chain) is chain
+    assert list([fourth] + chain) == [fourth, first, second, third]
+    assert [modifier.value for modifier in pickle.loads(pickle.dumps(extended))] == [1, 2, 3, 4]
+
+
+def test_modifier_chain_index():
+    on_a, on_b = InstanceModifier(A).thatSets(value=2), InstanceModifier(B).thatSets(a=3)
+    chain = ModifierChain([on_b, on_a])
+    for _ in range(5000):
+        chain = chain.extend(InstanceModifier(A).thatSets(value=4))
+
+    assert len(chain.index.forInstance(A)) == 5001
+    assert chain.index.forInstance(A)[0] is on_a
+    assert chain.index.forInstance(B) == [on_b]
+    assert len(chain.items()) == 5002
+
+
+def test_children_share_modifiers(monkeypatch):
+    seen = []
+    buildSteps = Builder._buildSteps
+
+    def recording(self, *args):
+        seen.append(self.modifiers)
+        return buildSteps(self, *args)
+    monkeypatch.setattr(Builder, '_buildSteps', recording)
+
+    c = Builder(C).withA(InstanceModifier(A).thatSets(value=3)).build()
+
+    assert c.b.a.value == 3
+    assert len(seen) == 3 and seen[0] is seen[1] is seen[2]
@@ -0,0 +1,173 @@
+'''
+Tests for :py:mod:`builders.parallel`
+
+Models live on the module level, so that worker processes can unpickle them.
+'''
+import pickle
+
+import pytest
+
+from builders.builder import Builder
+from builders.construct import Collection, Key, KeyStorage, Random
+from builders.modifiers import NumberOf, InParallel, OneOf, InstanceModifier, HavingIn, Given
+from builders.parallel import rewire, in_worker, build_trees
+from builders.tests.test_regression import Player, Squad, Unit, Hero
+
+
+class Item(object):
+    id = Key(Random(1, 40))
+
+
+class Box(object):
+    items = Collection(Item)
+
+
+def check_player(player, squads, units):
+    assert isinstance(player, Player)
+    assert len(player.squads) == squads
+    for squad in player.squads:
+        assert squad.player is player
+        assert squad.leader.squad is squad
+        assert len(squad.units) == units
+        for unit in squad.units:
+            assert unit.squad is squad
+
+
+def test_construct_pickled_by_reference():
+    Builder(Player).build()
+
+    assert pickle.loads(pickle.dumps(Player.squads)) is Player.squads
+    assert pickle.loads(pickle.dumps(NumberOf(Squad.units, 2))).construct is Squad.units
+
+
+def test_local_construct_pickled_by_value():
+    from builders.construct import Random
+
+    class Local:
+        a = Random(1, 5)
+
+    Builder(Local).build()
+    copy = pickle.loads(pickle.dumps(Local.a))
+
+    assert copy is not Local.a
+    assert (copy.start, copy.end) == (1, 5)
+
+
+def test_build_many_in_workers():
+    players = Builder(Player).withA(NumberOf(Player.squads, 2), NumberOf(Squad.units, 3)).buildMany(5, workers=2)
+
+    assert len(players) == 5
+    assert len(set(players)) == 5
+    for player in players:
+        check_player(player, 2, 3)
+
+
+def items_of_boxes(storage):
+    return Builder(Box).withKeyStorage(storage).withA(NumberOf(Box.items, 20), InParallel(Box.items, 4)).build().items
+
+
+def items(storage):
+    return Builder(Item).withKeyStorage(storage).buildMany(20, workers=4)
+
+
+@pytest.mark.parametrize('build', [items, items_of_boxes])
+def test_keys_issued_by_workers(build):
+    storage = KeyStorage()
+
+    ids = set(item.id for item in build(storage))
+
+    assert len(ids) == 20 and storage.issued[Item] == ids
+    assert set(item.id for item in Builder(Item).withKeyStorage(storage).buildMany(20)) == set(range(1, 41)) - ids
+
+
+def test_keys_partitioned_within_process_partition(monkeypatch):
+    monkeypatch.setattr(KeyStorage, 'partition', (1, 2))
+    storage = KeyStorage()
+
+    ids = [item.id for item in Builder(Item).withKeyStorage(storage).buildMany(20, workers=2)]
+
+    assert sorted(ids) == range(21, 41)
+    assert KeyStorage.partition == (1, 2)
+
+
+def test_parallel_collection():
+    player = Builder(Player).withA(NumberOf(Player.squads, 6),
+                                   NumberOf(Squad.units, 3),
+                                   InParallel(Player.squads, 3)).build()
+
+    check_player(player, 6, 3)
+    assert len(set(player.squads)) == 6
+
+
+def test_parallel_collection_is_reset():
+    Builder(Player).withA(InParallel(Player.squads, 2)).build()
+
+    assert Player.squads.workers is None
+
+
+def test_parallel_collection_one_of():
+    player = Builder(Player).withA(NumberOf(Player.squads, 4),
+                                   OneOf(Player.squads, InstanceModifier(Squad).thatSets(name='special')),
+                                   InParallel(Player.squads, 2)).build()
+
+    check_player(player, 4, 1)
+    assert [squad.name for squad in player.squads].count('special') == 1
+
+
+def test_parallel_collection_having():
+    squad = Builder(Squad).build()
+    player = Builder(Player).withA(HavingIn(Player.squads, squad, 2),
+                                   InParallel(Player.squads, 2)).build()
+
+    assert len(player.squads) == 3
+    assert player.squads[0] is squad
+    for squad in player.squads[1:]:
+        assert squad.player is player
+
+
+def test_parallel_collection_from_bottom():
+    unit = Builder(Unit).withA(NumberOf(Player.squads, 3), InParallel(Player.squads, 2)).build()
+    player = unit.squad.player
+
+    assert len(player.squads) == 3
+    assert unit.squad in player.squads
+    assert all(squad.player is player for squad in player.squads)
+
+
+def test_parallel_collection_given_owner():
+    player = Builder(Player).build()
+    squad = Builder(Squad).withA(Given(Squad.player, player), NumberOf(Squad.units, 3), InParallel(Squad.units, 2)).build()
+
+    assert squad.player is player
+    assert all(unit.squad is squad for unit in squad.units)
+
+
+def test_unpicklable_modifiers_fail():
+    with pytest.raises(Exception):
+        Builder(Player).withA(InstanceModifier(Hero).thatDoes(lambda hero: None)).buildMany(2, workers=2)
+
+
+def test_not_in_worker():
+    assert not in_worker()
+
+
+def test_build_trees_empty():
+    assert build_trees(Hero, [], 0, 2) == []
+
+
+def test_rewire():
+    class Node(object):
+        pass
+
+    old, new, root, child = Node(), Node(), Node(), Node()
+    old.back = root
+    root.child = child
+    root.items = [old, child, (old, 1)]
+    child.owner = old
+
+    rewire(root, old, new)
+
+    assert child.owner is new
+    assert root.items[0] is new
+    assert root.items[2] == (old, 1)
+    assert old.back is root
@@ -0,0 +1,283 @@
+'''
+Tests for :py:mod:`builders.plan`
+'''
+from builders.builder import Builder
+import pytest
+
+from builders.construct import Collection, Maybe, Unique, Uplink, Random, Predefined
+from builders.plan import get_plan, invalidate, BuildPlan, attributes_of, owners_of, compile_graph, fields_of
+from builders.modifiers import Given
+
+
+class A:
+    pass
+
+
+class B:
+    z = Unique(A)
+    a = Unique(A)
+    up = Uplink()
+    value = 0
+
+
+def test_plan_order():
+    plan = BuildPlan(B)
+
+    assert [name for name, _ in plan.constructs] == ['a', 'z']
+    assert [name for name, _ in plan.uplinks] == ['up']
+    assert plan.constructs[0][1] is B.a
+
+
+def test_plan_is_cached():
+    assert get_plan(B) is get_plan(B)
+
+
+def test_plan_invalidated_on_class_change():
+    class C:
+        a = Unique(A)
+
+    plan = get_plan(C)
+    C.b = Unique(A)
+
+    assert not plan.isValid()
+    assert [name for name, _ in get_plan(C).constructs] == ['a', 'b']
+    assert isinstance(Builder(C).build().b, A)
+
+
+def test_plan_invalidated_on_base_change():
+    class Base(object):
+        pass
+
+    class C(Base):
+        pass
+
+    assert get_plan(C).constructs == []
+    Base.a = Unique(A)
+
+    assert isinstance(Builder(C).build().a, A)
+
+
+def test_plan_invalidated_on_bases_swap():
+    class Base:
+        a = Unique(A)
+
+    class C:
+        pass
+
+    assert get_plan(C).constructs == []
+    C.__bases__ = (Base,)
+
+    assert isinstance(Builder(C).build().a, A)
+
+
+def test_plan_overridden_attribute():
+    class Base(object):
+        a = Unique(A)
+
+    class C(Base):
+        a = 1
+
+    assert get_plan(C).constructs == []
+    assert Builder(C).build().a == 1
+
+
+def test_plan_respects_init():
+    class C(object):
+        a = Unique(A)
+
+        def __init__(self):
+            self.a = 'not built'
+            self.b = Predefined('built')
+
+    c = Builder(C).build()
+
+    assert c.a == 'not built'
+    assert c.b == 'built'
+
+
+def test_plan_survives_uncomparable_attributes():
+    class Weird(object):
+        def __eq__(self, other):
+            raise ValueError('can not compare')
+
+    class C:
+        weird = Weird()
+        a = Random()
+
+    plan = get_plan(C)
+    plan.snapshot[0][2]['weird'] = Weird()
+
+    assert not plan.isValid()
+
+
+def test_invalidate():
+    class C:
+        a = Unique(A)
+
+    plan = get_plan(C)
+    invalidate(C)
+    assert get_plan(C) is not plan
+
+    plan = get_plan(C)
+    invalidate()
+    assert get_plan(C) is not plan
+
+
+def test_attributes_of():
+    class C:
+        a = Unique(A)
+        b = a
+
+    class D(C):
+        pass
+
+    assert attributes_of(C.a, C) == ['a', 'b']
+    assert attributes_of(C.a, D) == ['a', 'b']
+    assert attributes_of(C.a, B) == ()
+    assert attributes_of([], C) == ()
+
+
+def test_owners_follow_class_changes():
+    class C:
+        a = Unique(A)
+
+    old = C.a
+    get_plan(C)
+    assert owners_of(old) == {C: ['a']}
+
+    C.a = Unique(A)
+    get_plan(C)
+
+    assert owners_of(old) == {}
+    assert owners_of(C.a) == {C: ['a']}
+
+    invalidate(C)
+    assert owners_of(C.a) == {}
+
+
+def test_construct_modifier_uses_index():
+    class C:
+        a = Unique(A)
+
+    class D(C):
+        pass
+
+    modifier = Given(C.a, 1)
+
+    assert modifier.shouldRun(clazz=D)
+    assert not modifier.shouldRun(clazz=B)
+    assert not modifier.shouldRun(clazz=None)
+    assert Builder(D).withA(modifier).build().a == 1
+
+
+def test_compile_graph():
+    from builders.construct import Collection, Maybe, Reused
+    from builders.plan import _plans
+
+    class E:
+        pass
+
+    class F:
+        e = Maybe(Unique(E))
+        up = Uplink()
+
+    class G:
+        fs = Collection(F)
+        a = Reused(A)
+        b = Unique(B)
+
+    F.up.linksTo(G, G.fs)
+
+    reached = compile_graph(F)
+
+    assert reached[0] is F
+    assert set(reached) == set([E, F, G, A, B])
+    assert all(clazz in _plans for clazz in [E, F, G, A, B])
+
+
+def test_fields_of():
+    class Base(object):
+        inherited = 'yes'
+        _private = 1
+
+    class C(Base):
+        a = Unique(A)
+        value = None
+        method = len
+
+        def function(self):
+            pass
+
+    assert fields_of(C) == ['a', 'inherited', 'value']
+
+
+def test_backrefs():
+    class Child(object):
+        first = Uplink()
+        second = Uplink()
+
+    class Parent(object):
+        children = Collection(Child)
+        child = Maybe(Unique(Child))
+
+    assert get_plan(Child).backrefs == {}
+
+    Child.first.linksTo(Parent, Parent.children)
+    Child.second.linksTo(Parent, Parent.child)
+
+    assert get_plan(Child).backrefs == {Parent.children: ['first'], Parent.child: ['second']}
+    assert get_plan(Parent).backrefs == {}
+
+
+def test_invalid_links():
+    class Child(object):
+        up = Uplink()
+        other = Uplink()
+
+    class Parent(object):
+        child = Unique(Child)
+        value = Random()
+
+    class Stranger(object):
+        child = Unique(Child)
+
+    with pytest.raises(ValueError):
+        Child.up.linksTo(Parent, Stranger.child)
+    with pytest.raises(ValueError):
+        Child.up.linksTo(Parent, Parent.value)
+    with pytest.raises(ValueError):
+        Child.up.linksTo(Parent, 'child')
+
+    Child.up.linksTo(Parent, Parent.child)
+    Child.up.linksTo(Parent, Parent.child)
+
+    with pytest.raises(ValueError):
+        Child.other.linksTo(Parent, Parent.child)
+    assert Parent.child.destination is Child.up
+
+
+def test_uplink_cycles():
+    class Node(object):
+        parent = Uplink()
+
+    class First(object):
+        up = Uplink()
+
+    class Second(object):
+        up = Uplink()
+        firsts = Collection(First)
+
+    class Third(object):
+        seconds = Collection(Second)
+        up = Uplink()
+
+    Node.children = Collection(Node)
+    First.thirds = Collection(Third)
+    First.up.linksTo(Second, Second.firsts)
+    Second.up.linksTo(Third, Third.seconds)
+
+    with pytest.raises(ValueError):
+        Node.parent.linksTo(Node, Node.children)
+    with pytest.raises(ValueError):
+        Third.up.linksTo(First, First.thirds)
+    assert not First.thirds.destination
@@ -0,0 +1,103 @@
+'''
+Tests for :py:mod:`builders.profiler`
+'''
+import pstats
+
+from builders.builder import Builder
+from builders.construct import Collection, Random, Unique, Uplink
+from builders.modifiers import Given, NumberOf, InstanceModifier
+from builders.profiler import BuildProfiler, active
+
+
+class Plain(object):
+    value = Random()
+
+
+class Leaf(object):
+    value = Random()
+    parent = Uplink()
+
+
+class Node(object):
+    leaves = Collection(Leaf)
+    extra = Unique(Plain)
+
+
+Leaf.parent.linksTo(Node, Node.leaves)
+
+
+class Root(object):
+    node = Unique(Node)
+    name = ''
+
+
+def test_no_profiler_by_default():
+    assert Builder(Root).profiler is None
+    assert active() is None
+
+
+def test_counts_and_depth():
+    builder = Builder(Root).withProfiler().withA(NumberOf(Node.leaves, 3))
+    builder.build()
+    builder.build()
+
+    profiler = builder.profiler
+    assert profiler.instances == {Root: 2, Node: 2, Leaf: 6, Plain: 2}
+    assert profiler.maxDepth == 3
+    assert profiler.depth == 0
+    assert profiler.constructs[(Node, 'leaves')][0] == 2
+    assert profiler.constructs[(Leaf, 'parent')][0] == 6
+    assert profiler.constructs[(Root, 'node')][1] >= profiler.constructs[(Node, 'leaves')][1]
+
+
+def test_modifier_timings():
+    given = Given(Plain.value, 1)
+    setter = InstanceModifier(Root).thatSets(name='root')
+    profiler = BuildProfiler()
+
+    root = Builder(Root).withA(given, setter).withProfiler(profiler).build()
+
+    assert root.name == 'root'
+    assert root.node.extra.value == 1
+    assert profiler.modifiers[(given, 'apply')][0] == 1
+    assert profiler.modifiers[(given, 'shouldRun')][0] == 1
+    assert profiler.modifiers[(setter, 'shouldRun')][0] == 1
+    assert profiler.modifiers[(setter, 'apply')][0] == 1
+
+
+def test_context_manager():
+    with BuildProfiler() as outer:
+        assert active() is outer
+        with BuildProfiler() as inner:
+            Builder(Node).build()
+        assert active() is outer
+        Builder(Root).buildMany(2)
+    assert active() is None
+
+    assert inner.instances == {Node: 1, Leaf: 1, Plain: 1}
+    assert outer.instances == {Root: 2, Node: 2, Leaf: 2, Plain: 2}
+
+
+def test_reports(tmpdir):
+    builder = Builder(Root).withProfiler().withA(NumberOf(Node.leaves, 2))
+    builder.build()
+    profiler = builder.profiler
+
+    stacks = [line.rsplit(' ', 1)[0] for line in profiler.foldedStacks()]
+    assert 'Root;Root.node;Node;Node.leaves;Leaf;Leaf.parent' in stacks
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in profiler.foldedStacks())
+
+    stats = profiler.getStats()
+    assert stats.stats[('builders', 0, 'Leaf')][:2] == (2, 2)
+    assert ('builders', 0, 'Node.leaves') in stats.stats[('builders', 0, 'Leaf')][4]
+
+    path = str(tmpdir.join('build.prof'))
+    profiler.dumpStats(path)
+    assert ('builders', 0, 'Root') in pstats.Stats(path).stats
+
+    folded = tmpdir.join('build.folded')
+    profiler.dumpFolded(str(folded))
+    assert folded.read().splitlines() == profiler.foldedStacks()
+
+    profiler.printStats(limit=3)
+    profiler.printStats()
@@ -0,0 +1,96 @@
+'''
+Tests for :py:mod:`builders.prototype`
+'''
+from builders.builder import Builder
+from builders.construct import Collection, Key, Lambda, Random, Reused, Uid, Unique, Uplink
+from builders.modifiers import Given, InstanceModifier, NumberOf
+
+
+class Currency(object):
+    code = Random(1, 10 ** 6, pattern='C%s')
+
+
+class Card(object):
+    number = Key(Random(1, 10 ** 9))
+    limit = Random(1, 100)
+    account = Uplink()
+
+
+class Owner:
+    name = Random(pattern='owner %s')
+
+
+class Account(object):
+    id = Key(Random(1, 10 ** 9))
+    uid = Uid()
+    kind = 'debit'
+    cards = Collection(Card)
+    owner = Unique(Owner)
+    currency = Reused(Currency)
+    title = Lambda(lambda account: account.kind.title())
+
+
+Card.account.linksTo(Account, Account.cards)
+
+
+def test_clone():
+    prototype = Builder(Account).withKeyStorage().withA(NumberOf(Account.cards, 3)).prototype()
+    template = prototype.template
+    clone = prototype.clone()
+
+    assert clone is not template and clone.__class__ is Account
+    assert clone.id != template.id and clone.uid != template.uid
+    assert clone.title == 'Debit'
+    assert clone.kind == 'debit'
+    assert len(clone.cards) == 3
+    assert all(card.account is clone for card in clone.cards)
+    assert not set(card.number for card in clone.cards) & set(card.number for card in template.cards)
+    assert clone.cards is not template.cards
+    assert all(card.account is template for card in template.cards)
+    assert clone.owner is not template.owner and isinstance(clone.owner, Owner)
+    assert clone.currency is template.currency
+
+
+def test_modified_attributes_are_kept():
+    prototype = Builder(Account).withA(
+        Given(Account.id, 5),
+        InstanceModifier(Card).thatSets(limit=1000),
+        InstanceModifier(Owner).thatDoes(lambda owner: setattr(owner, 'name', 'fixed'))).prototype()
+
+    clone = prototype.clone()
+
+    assert clone.id == 5
+    assert clone.cards[0].limit == 1000
+    assert clone.owner.name == 'fixed'
+    assert clone.uid != prototype.template.uid
+
+
+def test_other_values_are_copied():
+    prototype = Builder(Account).withA(InstanceModifier(Account).thatDoes(
+        lambda account: setattr(account, 'related', [account.owner, 'note', (account.cards[0],)]))).prototype()
+    template = prototype.template
+
+    clone = prototype.clone()
+
+    assert clone.related == [clone.owner, 'note', (clone.cards[0],)]
+    assert template.related == [template.owner, 'note', (template.cards[0],)]
+    assert clone.id == template.id
+
+
+def test_clone_attributes():
+    prototype = Builder(Account).prototype()
+
+    clones = [prototype.clone(kind=kind) for kind in ['debit', 'credit']]
+
+    assert [clone.kind for clone in clones] == ['debit', 'credit']
+    assert prototype.template.kind == 'debit'
+
+
+def test_clone_many():
+    prototype = Builder(Account).withKeyStorage().withA(NumberOf(Account.cards, 2)).prototype()
+
+    clones = prototype.cloneMany(50)
+
+    assert len(set(clone.id for clone in clones)) == 50
+    assert len(set(card.number for clone in clones for card in clone.cards)) == 100
+    assert len(prototype.keyStorage.issued[Account]) == 51
@@ -0,0 +1,138 @@
+'''
+Tests for :py:mod:`builders.pytest_plugin`
+'''
+import os
+
+import pytest
+
+import builders
+from builders import construct
+from builders.builder import Builder
+from builders.construct import Collection, Key, KeyStorage, Random
+from builders.modifiers import InstanceModifier, NumberOf
+from builders.pytest_plugin import ScopedTrees, reset, worker_partition, _live
+
+
+pytest_plugins = ['pytester']
+
+
+class Item(object):
+    id = Key(Random(1, 1000))
+
+
+class Basket(object):
+    items = Collection(Item)
+
+
+def test_worker_partition():
+    assert worker_partition({}) is None
+    assert worker_partition({'PYTEST_XDIST_WORKER': 'gw3'}) is None
+    assert worker_partition({'PYTEST_XDIST_WORKER': 'gw3', 'PYTEST_XDIST_WORKER_COUNT': '4'}) == (3, 4)
+
+
+def test_partitioned_keys(monkeypatch):
+    monkeypatch.setattr(KeyStorage, 'partition', (1, 4))
+    storage = KeyStorage()
+
+    assert storage.bounds(1, 1000) == (251, 500)
+    assert storage.bounds(1, 3) == (1, 3)
+    assert set(Builder(Item).withKeyStorage(storage).build().id for _ in range(250)) == set(range(251, 501))
+    assert Builder(Item).withKeyStorage(KeyStorage()).build(seed=1).id in range(251, 501)
+
+
+def test_scoped_trees():
+    scoped = ScopedTrees('module')
+
+    first = scoped.build(Builder(Basket).withA(NumberOf(Basket.items, 2)))
+
+    assert scoped.build(Builder(Basket).withA(NumberOf(Basket.items, 2))) is first
+    assert len(scoped.build(Builder(Basket).withA(NumberOf(Basket.items, 3))).items) == 3
+    unpicklable = Builder(Basket).withA(InstanceModifier(Basket).thatDoes(lambda basket: None))
+    assert scoped.build(unpicklable) is scoped.build(unpicklable)
+    assert scoped.build(Builder(Basket).withA(unpicklable.modifiers)) is not scoped.build(unpicklable)
+
+
+def test_reset(monkeypatch):
+    monkeypatch.setattr(construct, 'key_storage', KeyStorage())
+    monkeypatch.setitem(_live, 'session', ScopedTrees('session'))
+    kept = _live['session'].build(Builder(Basket).withA(NumberOf(Basket.items, 3)))
+    Builder(Item).build()
+
+    reset('module')
+
+    assert construct.key_storage.issued[Item] == set(item.id for item in kept.items)
+
+
+@pytest.fixture
+def run(testdir, monkeypatch):
+    monkeypatch.setenv('PYTHONPATH', os.path.dirname(os.path.dirname(os.path.abspath(builders.__file__))))
+    for name in [name for name in os.environ if name.startswith('COV_CORE_')]:
+        monkeypatch.delenv(name)
+    testdir.makepyfile(models='''
+        from builders.construct import Key, Random
+
+        class Tiny(object):
+            id = Key(Random(1, 2))
+
+        class Wide(object):
+            id = Key(Random(1, 1000))
+    ''')
+
+    def run(source, *args):
+        testdir.makepyfile(source)
+        return testdir.runpytest_subprocess('-p', 'builders.pytest_plugin', *args)
+    return run
+
+
+def test_session_trees(run):
+    result = run('''
+        from builders.builder import Builder
+        from models import Wide
+
+        def test_first(builders_session_trees):
+            global first
+            first = builders_session_trees.build(Builder(Wide))
+
+        def test_second(builders_session_trees, builders_trees):
+            assert builders_session_trees.build(Builder(Wide)) is first
+            assert builders_trees.build(Builder(Wide)) is not first
+    ''')
+
+    result.assert_outcomes(passed=2)
+
+
+@pytest.mark.parametrize('mode, passed', [('none', 1), ('function', 3)])
+def test_reset_per_function(run, testdir, mode, passed):
+    testdir.makeini('[pytest]\nbuilders_reset = %s\n' % mode)
+    result = run('''
+        from builders.builder import Builder
+        from models import Tiny
+
+        def test_first():
+            Builder(Tiny).build()
+            Builder(Tiny).build()
+
+        def test_second():
+            Builder(Tiny).build()
+            Builder(Tiny).build()
+
+        def test_kept(builders_session_trees):
+            kept = builders_session_trees.build(Builder(Tiny))
+            assert Builder(Tiny).build().id != kept.id
+    ''')
+
+    result.assert_outcomes(passed=passed, failed=3 - passed)
+
+
+def test_xdist_partition(run, monkeypatch):
+    monkeypatch.setenv('PYTEST_XDIST_WORKER', 'gw1')
+    monkeypatch.setenv('PYTEST_XDIST_WORKER_COUNT', '2')
+    result = run('''
+        from builders.builder import Builder
+        from models import Wide
+
+        def test_upper_half():
+            assert all(Builder(Wide).build().id > 500 for _ in range(500))
+    ''')
+
+    result.assert_outcomes(passed=1)
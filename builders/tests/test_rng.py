@@ -0,0 +1,205 @@
+'''
+Tests for :py:mod:`builders.rng`
+
+Models live on the module level, so that worker processes can unpickle them.
+'''
+import random
+import uuid
+
+from builders.builder import Builder
+from builders.construct import Collection, Key, Random, Stream, Uid, Unique
+from builders.modifiers import InParallel, NumberOf
+from builders.profiler import BuildProfiler
+from builders.rng import RandomSource, TreeSource, global_random, current
+
+
+class Item(object):
+    value = Random(1, 10 ** 9)
+
+
+class Sample(object):
+    id = Key(Random(1, 100))
+    value = Random(1, 10 ** 9)
+    label = Random(1, 5, pattern='label %s')
+    items = Collection(Item)
+
+
+class Detail(object):
+    code = Key(Random(1, 10 ** 6))
+    uid = Uid()
+
+
+class Part(object):
+    value = Random(1, 10 ** 9)
+    detail = Unique(Detail)
+
+
+class Tree(object):
+    id = Key(Random(1, 10 ** 6))
+    parts = Collection(Part, number=4)
+    extra = Stream(Part, number=2)
+
+
+def part(instance):
+    return (instance.value, instance.detail.code, instance.detail.uid)
+
+
+def tree(instance):
+    return (instance.id, [part(p) for p in instance.parts], [part(p) for p in instance.extra])
+
+
+def values(sample):
+    return (sample.id, sample.value, sample.label, [item.value for item in sample.items])
+
+
+def build(seed, number=5, *modifiers):
+    return [values(s) for s in Builder(Sample).withKeyStorage().withRandom(seed).withA(modifiers).buildMany(number)]
+
+
+def test_source_is_reproducible():
+    first, second = RandomSource(42), RandomSource(42)
+
+    assert [first.randint(1, 6) for _ in range(1000)] == [second.randint(1, 6) for _ in range(1000)]
+    assert [first.below(10) for _ in range(10)] == [second.below(10) for _ in range(10)]
+    assert first.getrandbits(64) == second.getrandbits(64)
+    assert [first.randint(1, 6) for _ in range(10)] != [RandomSource(43).randint(1, 6) for _ in range(10)]
+
+
+def test_source_ranges():
+    source = RandomSource(block=10)
+
+    assert set(source.randint(1, 3) for _ in range(300)) == set([1, 2, 3])
+    assert set(source.below(2) for _ in range(100)) == set([0, 1])
+    assert 2 ** 60 <= source.randint(2 ** 60, 2 ** 61) <= 2 ** 61
+    assert 0 <= source.below(2 ** 60) < 2 ** 60
+    assert len(source.blocks[(1, 3)]) < 10
+
+
+def test_source_is_independent_from_global_random():
+    random.seed(1)
+    expected = random.random()
+
+    random.seed(1)
+    RandomSource(5).randint(1, 100)
+    assert random.random() == expected
+
+
+def test_derive():
+    source = RandomSource(7)
+
+    assert source.derive('a', 1).seed == RandomSource(7).derive('a', 1).seed
+    assert source.derive('a', 1).seed != source.derive('a', 2).seed
+    assert source.derive('a').block == source.block
+
+
+def test_builds_are_reproducible():
+    assert build(1) == build(1)
+    assert build(1) != build(2)
+
+
+def test_random_seed_by_default():
+    builder = Builder(Sample).withRandom()
+
+    assert isinstance(builder.randomSource.seed, (int, long))
+    assert builder.withRandom(RandomSource(3)).randomSource.seed == 3
+
+
+def test_global_random_by_default():
+    assert current() is global_random
+
+    random.seed(3)
+    first = [values(s) for s in Builder(Sample).withKeyStorage().buildMany(3)]
+    random.seed(3)
+    assert first == [values(s) for s in Builder(Sample).withKeyStorage().buildMany(3)]
+
+
+def test_parallel_builds_are_reproducible():
+    def samples(seed):
+        builder = Builder(Sample).withKeyStorage().withRandom(seed).withA(NumberOf(Sample.items, 3))
+        return [values(s) for s in builder.buildMany(6, workers=2)]
+
+    assert samples(11) == samples(11)
+    assert len(set(v for sample in samples(11) for v in sample[3])) == 18
+
+
+def test_parallel_items_are_reproducible():
+    def items(seed):
+        builder = Builder(Sample).withRandom(seed).withA(NumberOf(Sample.items, 8), InParallel(Sample.items, 2))
+        return [item.value for item in builder.build().items]
+
+    assert items(5) == items(5)
+    assert len(set(items(5))) == 8
+
+
+def test_workers_reseed_global_random():
+    samples = Builder(Item).buildMany(4, workers=2)
+
+    assert len(set(sample.value for sample in samples)) == 4
+
+
+def test_tree_source():
+    source = TreeSource(42)
+
+    assert source.child('parts', 2).seed == TreeSource(42).child('parts').child(2).seed
+    assert source.child('parts', 2).seed != source.child('parts', 3).seed
+    same = TreeSource(42)
+    assert [source.randint(1, 6) for _ in range(10)] == [same.randint(1, 6) for _ in range(10)]
+    assert TreeSource(source.child('a').seed).getrandbits(100) == source.child('a').getrandbits(100)
+    assert TreeSource('name').seed == TreeSource('name').seed
+    assert TreeSource.of(source) is source
+
+
+def test_tree_source_ranges():
+    source = TreeSource()
+
+    assert set(source.randint(1, 3) for _ in range(300)) == set([1, 2, 3])
+    assert 0 <= source.below(2 ** 70) < 2 ** 70
+    assert 0 <= source.getrandbits(3) < 8
+    assert source.getrandbits(130) < 2 ** 130
+
+
+def test_seeded_builds_are_reproducible():
+    random.seed(1)
+    first = tree(Builder(Tree).build(seed=7))
+    random.seed(2)
+    Builder(Tree).build(seed=8)
+
+    assert tree(Builder(Tree).build(seed=7)) == first
+    assert tree(Builder(Tree).build(seed=8)) != first
+    assert all(uuid.UUID(uid).version == 4 for _, _, uid in first[1])
+    assert len(set(code for _, code, _ in first[1] + first[2])) == 6
+
+
+def test_seeded_values_are_ints():
+    seeded = Builder(Sample).withKeyStorage().build(seed=7)
+
+    assert all(type(value) is int for value in (seeded.id, seeded.value, TreeSource(7).randint(1, 6)))
+
+
+def test_seeded_subtrees():
+    built = tree(Builder(Tree).build(seed=7))
+    more = tree(Builder(Tree).withA(NumberOf(Tree.parts, 6)).build(seed=7))
+
+    assert more[1][:4] == built[1]
+    assert part(Builder(Part).build(seed=TreeSource(7).child('parts', 2))) == built[1][2]
+    assert part(Builder(Part).build(seed=TreeSource(7).child('extra', 1))) == built[2][1]
+
+
+def test_seeded_parallel_items():
+    def parallel():
+        return tree(Builder(Tree).withKeyStorage().withA(InParallel(Tree.parts, 2)).build(seed=3))
+
+    def keyless(built):
+        return [(value, uid) for value, _, uid in built[1] + built[2]]
+
+    built, first = tree(Builder(Tree).build(seed=3)), parallel()
+
+    assert keyless(first) == keyless(built) and first == parallel()
+    assert len(set(code for _, code, _ in first[1])) == 4
+
+
+def test_seeded_profiled_build():
+    profiler = BuildProfiler()
+
+    assert tree(Builder(Tree).withProfiler(profiler).build(seed=5)) == tree(Builder(Tree).build(seed=5))
+    assert profiler.instances[Part] == 6
@@ -0,0 +1,205 @@
+'''
+Tests for :py:mod:`builders.sink`
+'''
+import sqlite3
+
+import pytest
+
+from builders.builder import Builder
+from builders.construct import Collection, Key, Maybe, Random, Reused, Stream, Uid, Unique, Uplink
+from builders.modifiers import NumberOf, Enabled
+from builders.sink import Sink, SQLiteSink
+from builders.tests import test_regression as regression
+
+
+class Country(object):
+    name = 'Narnia'
+
+
+class Player(object):
+    uid = Uid()
+    number = Random(1, 99)
+    team = Uplink()
+    coach = Maybe(Unique(Country))
+
+
+class Team(object):
+    id = Key(Random(1, 10 ** 6))
+    title = Random(pattern='team %s')
+    country = Reused(Country)
+    players = Collection(Player)
+
+
+Player.team.linksTo(Team, Team.players)
+
+
+class Recorder(Sink):
+    def __init__(self, *args, **kwargs):
+        Sink.__init__(self, *args, **kwargs)
+        self.written = []
+
+    def write(self, table, rows):
+        self.written.append((table.name, list(rows)))
+
+
+def test_table_layout():
+    table = Recorder().tableOf(Player)
+
+    assert table.columns == ['id', 'coach_id', 'number', 'team_id', 'uid']
+    assert table.dependencies == set([Team, Country])
+    assert not table.keyed
+
+    team = Recorder().tableOf(Team)
+    assert team.columns == ['id', 'country_id', 'title']
+    assert team.keyed
+
+
+def test_rows_and_references():
+    team = Builder(Team).withA(NumberOf(Team.players, 2), Enabled(Player.coach)).build()
+    sink = Recorder()
+
+    assert sink.consume([team]) == 6
+    sink.flush()
+
+    written = dict(sink.written)
+    assert written['Team'] == [(team.id, 1, team.title)]
+    assert written['Country'] == [(1, 'Narnia'), (2, 'Narnia'), (3, 'Narnia')]
+    assert sorted(written['Player']) == sorted([(sink.keyOf(p), sink.keyOf(p.coach), p.number, team.id, p.uid) for p in team.players])
+    assert set(sink.keyOf(p.coach) for p in team.players) == set([2, 3])
+
+
+def test_dependency_order_and_batches():
+    sink = Recorder(batch_size=3)
+    sink.consume(Builder(Team).withA(NumberOf(Team.players, 2)).iterBuild(3))
+    sink.flush()
+
+    names = [name for name, _ in sink.written]
+    assert names[:3] == ['Country', 'Team', 'Player']
+    assert sum(len(rows) for name, rows in sink.written if name == 'Player') == 6
+    assert all(len(rows) <= 3 for _, rows in sink.written)
+    for name in ['Team', 'Player']:
+        assert names.index('Country') < names.index(name)
+    assert names.index('Team') < names.index('Player')
+
+
+class Address(object):
+    street = Random(pattern='street %s')
+
+
+class Account(object):
+    address = Unique(Address)
+
+
+@pytest.mark.parametrize('wait_batches', [1, 10])
+def test_references_written_first(wait_batches):
+    targets = {'team_id': 'Team', 'coach_id': 'Country', 'country_id': 'Country', 'address_id': 'Address'}
+    sink = Recorder(batch_size=2, wait_batches=wait_batches)
+    sink.consume(Builder(Account).buildMany(3))
+    sink.consume(Builder(Team).withA(NumberOf(Team.players, 3), Enabled(Player.coach)).iterBuild(3))
+    sink.flush()
+
+    columns = dict((table.name, table.columns) for table in sink.tables.values())
+    written = set()
+    for name, rows in sink.written:
+        for row in rows:
+            for column, value in zip(columns[name], row):
+                assert column not in targets or (targets[column], value) in written
+            written.add((name, row[0]))
+    assert len(written) == 3 * 2 + 3 + 1 + 9 * 2
+
+
+def test_full_batches():
+    sink = Recorder(batch_size=3)
+    sink.consume(Builder(regression.Player).withA(NumberOf(regression.Player.squads, 2), NumberOf(regression.Squad.units, 2)).iterBuild(4))
+    sink.flush()
+
+    names = set(name for name, _ in sink.written)
+    for name in names:
+        sizes = [len(rows) for written, rows in sink.written if written == name]
+        assert all(size == 3 for size in sizes[:-1])
+
+
+def test_shared_instances_written_once():
+    country = Country()
+    teams = Builder(Team).withA(NumberOf(Team.players, 0)).buildMany(3)
+    for team in teams:
+        team.country = country
+
+    sink = Recorder()
+    assert sink.consume(teams) == 4
+    assert sink.consume(teams) == 0
+
+
+def test_streams_are_consumed():
+    class Log(object):
+        entries = Stream(Country)
+
+    log = Builder(Log).withA(NumberOf(Log.entries, 4)).build()
+    sink = Recorder(batch_size=2)
+
+    assert sink.consume([log]) == 5
+    assert [name for name, _ in sink.written] == ['Country', 'Country']
+
+
+def test_sqlite_sink():
+    connection = sqlite3.connect(':memory:')
+
+    with SQLiteSink(connection, batch_size=10, tables={Player: 'players'}) as sink:
+        sink.consume(Builder(Team).withA(NumberOf(Team.players, 5)).iterBuild(4))
+
+    assert connection.execute('select count(*) from players').fetchone() == (20,)
+    assert connection.execute('select count(*) from Team').fetchone() == (4,)
+    assert connection.execute('select count(*) from players join Team on players.team_id = Team.id').fetchone() == (20,)
+    assert connection.execute('select count(distinct uid) from players').fetchone() == (20,)
+
+
+class Name(unicode):
+    pass
+
+
+class Odd(object):
+    value = Random()
+    name = Random()
+
+
+def test_sqlite_sink_adapts_values():
+    model = Builder(Odd).build()
+    model.value = complex(1, 2)
+    model.name = Name(u'odd')
+    connection = sqlite3.connect(':memory:')
+
+    with SQLiteSink(connection) as sink:
+        sink.consume([model])
+
+    assert connection.execute('select value, name from Odd').fetchone() == ('(1+2j)', u'odd')
+
+    sink = Recorder()
+    sink.consume([model])
+    sink.flush()
+    assert sink.written == [('Odd', [(1, model.name, model.value)])]
+
+
+def test_unreferenceable_models():
+    class Slotted(object):
+        __slots__ = ('__dict__',)
+        value = Random()
+
+    models = Builder(Slotted).buildMany(2)
+    sink = Recorder()
+
+    assert sink.consume(models + models) == 2
+
+
+def test_nothing_written_on_error():
+    sink = Recorder()
+    with pytest.raises(ValueError):
+        with sink:
+            sink.consume([Builder(Country).build()])
+            raise ValueError()
+    assert sink.written == []
+
+
+def test_write_is_abstract():
+    with pytest.raises(NotImplementedError):
+        with Sink() as sink:
+            sink.consume([Country()])
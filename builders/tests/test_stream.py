@@ -0,0 +1,89 @@
+'''
+Tests for :py:class:`builders.construct.Stream`
+'''
+import types
+
+from builders.builder import Builder
+from builders.construct import Stream, Uplink, Key, Random, KeyStorage, Lambda, Unique
+from builders.modifiers import NumberOf, HavingIn, OneOf, InstanceModifier, InParallel
+
+
+class Entry(object):
+    id = Key(Random(1, 10 ** 6))
+    text = 'plain'
+    log = Uplink()
+
+
+class Log(object):
+    entries = Stream(Entry)
+
+
+Entry.log.linksTo(Log, Log.entries)
+
+
+def test_stream_is_lazy():
+    log = Builder(Log).withA(NumberOf(Log.entries, 3)).build()
+
+    assert isinstance(log.entries, types.GeneratorType)
+
+    first = next(log.entries)
+    assert isinstance(first, Entry)
+    assert first.log is log
+    assert len(list(log.entries)) == 2
+
+
+def test_stream_honours_modifiers():
+    prebuilt = Entry()
+    log = Builder(Log).withA(NumberOf(Log.entries, 3),
+                             HavingIn(Log.entries, prebuilt, 1),
+                             OneOf(Log.entries, InstanceModifier(Entry).thatSets(text='special'))).build()
+
+    entries = list(log.entries)
+
+    assert len(entries) == 4
+    assert entries[0] is prebuilt
+    assert [e.text for e in entries[1:]] == ['special', 'plain', 'plain']
+    assert all(e.log is log for e in entries[1:])
+
+
+def test_stream_ignores_parallel():
+    log = Builder(Log).withA(NumberOf(Log.entries, 2), InParallel(Log.entries, 2)).build()
+
+    assert all(e.log is log for e in log.entries)
+
+
+def test_streams_are_independent():
+    builder = Builder(Log).withA(NumberOf(Log.entries, 2))
+    first, second = builder.build(), builder.build()
+
+    assert len(list(second.entries)) == 2
+    assert len(list(first.entries)) == 2
+
+
+def test_stream_shares_build_settings():
+    storage = KeyStorage()
+    builder = Builder(Log).withA(NumberOf(Log.entries, 10)).withKeyStorage(storage).withProfiler()
+    log = builder.build()
+
+    assert builder.profiler.instances == {Log: 1}
+    assert len(set(e.id for e in log.entries)) == 10
+    assert len(storage.issued[Entry]) == 10
+    assert builder.profiler.instances == {Log: 1, Entry: 10}
+
+
+def test_consumed_within_other_build():
+    log = Builder(Log).withA(NumberOf(Log.entries, 2)).build()
+
+    class Holder(object):
+        entry = Lambda(lambda holder: next(log.entries))
+        log = Unique(Log)
+
+    holder = Builder(Holder).withA(NumberOf(Log.entries, 3)).build()
+
+    assert holder.entry.log is log
+    assert len(list(holder.log.entries)) == 3
+    assert len(list(log.entries)) == 1
+
+
+def test_direct_build():
+    assert list(Log.entries.doBuild([], instance=None)) != []
@@ -1,4 +1,4 @@
-from builders.construct import Unique, Uplink, Collection, Reused
+from builders.construct import Unique, Uplink, Collection, Reused, Maybe
 from builders.modifiers import NumberOf, Given, InstanceModifier, HavingIn
 from builders.builder import Builder
 import pytest
@@ -336,3 +336,62 @@ def test_double_incoming_uplinks_right_branch(clear_state):
     l = Builder(R2).build()
     assert l.d.l.d == l.d
     assert l.d.r.d == l.d
+
+
+def test_set_directly(monkeypatch):
+    def unexpected(*args, **kwargs):
+        raise AssertionError('uplink built')
+
+    monkeypatch.setattr(Uplink, 'build', unexpected)
+    monkeypatch.setattr(Uplink, 'steps', unexpected)
+
+    big = Builder(Big).withA(NumberOf(Big.smalls, 3)).build()
+    b = Builder(B).build()
+
+    checkBig(big, range(3))
+    assert b.a.b is b
+
+
+def test_given_uplink_value():
+    other = Big()
+
+    big = Builder(Big).withA(NumberOf(Big.smalls, 2), Given(Small.big, other)).build()
+
+    assert [small.big for small in big.smalls] == [other, other]
+    assert not Small.big.value
+
+
+def test_from_bottom_without_modifiers(monkeypatch):
+    monkeypatch.setattr(HavingIn, '__init__', None)
+    monkeypatch.setattr(Given, '__init__', None)
+
+    small = Builder(Small).withA(NumberOf(Big.smalls, 2)).build()
+    a = Builder(A).build()
+
+    assert small in small.big.smalls and len(small.big.smalls) == 2
+    assert a.b.a is a
+
+
+def test_custom_construct_links():
+    class Custom(Unique):
+        def doBuild(self, modifiers, **kwargs):
+            return Builder(self.type).withA(modifiers).build()
+
+    class Owned:
+        owner = Uplink()
+
+    class Kept:
+        owner = Uplink()
+
+    class Owner:
+        owned = Custom(Owned)
+        kept = Maybe(Custom(Kept), enabled=True)
+
+    Owned.owner.linksTo(Owner, Owner.owned)
+    Kept.owner.linksTo(Owner, Owner.kept)
+
+    owner = Builder(Owner).build()
+
+    assert owner.owned.owner is owner and owner.kept.owner is owner
+    assert not Owner.owned.linksDirectly and B.a.linksDirectly
+    assert not Owned.owner.value